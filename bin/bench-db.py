@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+"""
+Benchmark the database connection setup done for each web request.
+
+Run this with YARRHARR_CONF and DJANGO_SETTINGS_MODULE=yarrharr.settings set,
+as for django-admin. Each simulated request sends Django's request signals
+around a small query, so connections are opened and closed just as the
+``[db] conn_max_age`` option would have the server do. Three configurations
+are compared:
+
+- A new connection for every request that sets only WAL mode
+- A new connection for every request that also applies the ``[db]`` pragmas
+- A persistent connection (``conn_max_age`` > 0)
+"""
+
+import argparse
+import time
+
+import django
+
+_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+_parser.add_argument("-n", "--requests", type=int, default=2000, help="Requests per configuration")
+
+
+def bench(requests, conn_max_age, pragmas):
+    from django.conf import settings
+    from django.core import signals
+    from django.db import connection
+
+    connection.close()
+    connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+    settings.SQLITE_PRAGMAS = pragmas
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        signals.request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM yarrharr_feed")
+            cursor.fetchall()
+        signals.request_finished.send(sender=None)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed / requests
+
+
+def main():
+    args = _parser.parse_args()
+    django.setup()
+
+    from django.conf import settings
+
+    pragmas = settings.SQLITE_PRAGMAS
+    conn_max_age = settings.DATABASES["default"]["CONN_MAX_AGE"] or 600
+    results = [
+        ("new connection, WAL only", bench(args.requests, 0, {})),
+        ("new connection, [db] pragmas", bench(args.requests, 0, pragmas)),
+        ("persistent connection", bench(args.requests, conn_max_age, pragmas)),
+    ]
+    baseline = results[0][1]
+    for label, per_request in results:
+        print("{:<30} {:8.1f} µs/request  {:5.2f}×".format(label, per_request * 1e6, baseline / per_request))
+
+
+if __name__ == "__main__":
+    main()
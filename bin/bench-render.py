@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+"""
+Benchmark rendering a page of the article list.
+
+Run this with YARRHARR_CONF and DJANGO_SETTINGS_MODULE=yarrharr.settings set,
+as for django-admin, against a database with at least a page of articles
+(``bin/bench-search.py --populate`` will make one). The newest page of
+articles is rendered:
+
+- Row by row in a template loop, as before rows were cached
+- Through the row cache when it is empty
+- Through the row cache when it holds every row
+- Through the row cache after 10% of the articles have been marked read
+"""
+
+import argparse
+import statistics
+import time
+
+import django
+
+_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+_parser.add_argument("-n", "--renders", type=int, default=20, help="Renders of each configuration")
+
+
+def bench(renders, render, prepare=lambda: None):
+    times = []
+    for _ in range(renders):
+        prepare()
+        start = time.perf_counter()
+        render()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    args = _parser.parse_args()
+    django.setup()
+
+    from django.template import engines
+    from django.template.loader import get_template
+
+    from yarrharr.models import Article
+    from yarrharr.templatetags.article_rows import row_cache
+    from yarrharr.views import PAGE_SIZE
+
+    articles = list(Article.objects.order_by("-date", "-id").prefetch_related("feed")[:PAGE_SIZE])
+    print("Rendering {:,d} articles".format(len(articles)))
+
+    with open(get_template("article_row.html").origin.name) as f:
+        loop = engines["django"].from_string("{% for article in articles %}" + f.read() + "{% endfor %}")
+    article_list = get_template("article_list.html")
+    context = {"articles": articles}
+
+    def mark_some_read():
+        row_cache.clear()
+        article_list.render(context)
+        for article in articles[::10]:
+            article.read = not article.read
+
+    results = [
+        ("template loop", bench(args.renders, lambda: loop.render(context))),
+        ("cache empty", bench(args.renders, lambda: article_list.render(context), row_cache.clear)),
+        ("cache full", bench(args.renders, lambda: article_list.render(context))),
+        ("10% marked read", bench(args.renders, lambda: article_list.render(context), mark_some_read)),
+    ]
+    baseline = statistics.median(results[0][1])
+    for label, times in results:
+        median = statistics.median(times)
+        print("{:<18} median {:6.1f} ms  max {:6.1f} ms  {:5.1f}×".format(label, median * 1e3, max(times) * 1e3, baseline / median))
+
+
+if __name__ == "__main__":
+    main()
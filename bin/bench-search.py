@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+"""
+Benchmark full-text search of articles.
+
+Run this with YARRHARR_CONF and DJANGO_SETTINGS_MODULE=yarrharr.settings set,
+as for django-admin, against a scratch database: ``--populate`` adds
+synthetic articles for a user named "bench". The words of their content
+follow a Zipf distribution, like natural language, so that the searches
+range from rare words to ones found in nearly every article:
+
+- A word found in a few articles
+- A word found in about 1% of articles
+- The most common word
+- Two common words together
+- A prefix of the most common word
+
+Each search is run over all of the feeds, a label of a tenth of them, and a
+single feed, with each of the unread, favorite, and all filters. About 5% of
+the articles are unread and 1% are favorites.
+"""
+
+import argparse
+import itertools
+import random
+import statistics
+import time
+
+import django
+
+_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+_parser.add_argument("--populate", type=int, default=0, metavar="N", help="Add N synthetic articles first")
+_parser.add_argument("--feeds", type=int, default=200, help="Number of feeds to spread them over")
+_parser.add_argument("-n", "--searches", type=int, default=50, help="Repetitions of each search")
+
+_VOCABULARY = 50000
+
+
+def _word(rank):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    word = ""
+    rank += 26
+    while rank:
+        rank, i = divmod(rank, 26)
+        word += letters[i]
+    return word
+
+
+def populate(count, feed_count):
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    user, _ = User.objects.get_or_create(username="bench")
+    now = timezone.now()
+    feeds = list(user.feed_set.all()[:feed_count])
+    for i in range(len(feeds), feed_count):
+        feeds.append(user.feed_set.create(url="https://{}.example/feed".format(i), added=now, next_check=None, feed_title=str(i)))
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(_VOCABULARY)))
+    words = [_word(rank) for rank in range(_VOCABULARY)]
+    rng = random.Random(1)
+    sql = (
+        "INSERT INTO yarrharr_article"
+        " (feed_id, read, fave, author, url, date, guid, raw_title, raw_content, title, content, content_snippet, content_text, content_rev)"
+        " VALUES (%s, %s, %s, '', '', %s, '', '', '', %s, '', '', %s, 0)"
+    )
+    start = time.perf_counter()
+    for lo in range(0, count, 10000):
+        rows = []
+        for i in range(lo, min(count, lo + 10000)):
+            text = rng.choices(words, cum_weights=cum_weights, k=150)
+            # Most articles have been read, and a few are favorites.
+            read, fave = rng.random() >= 0.05, rng.random() < 0.01
+            rows.append((rng.choice(feeds).id, read, fave, now, " ".join(text[:6]), " ".join(text[6:])))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        print("Populated {:,d} articles ({:,.0f}/s)".format(lo + len(rows), (lo + len(rows)) / (time.perf_counter() - start)))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("INSERT INTO yarrharr_article_fts(yarrharr_article_fts) VALUES ('optimize')")
+
+
+def bench(feeds, query, filt, searches):
+    from yarrharr.search import search_articles
+
+    times = []
+    for _ in range(searches):
+        start = time.perf_counter()
+        articles, after = search_articles(feeds, query, filt)
+        if after is not None:
+            search_articles(feeds, query, filt, after=after)
+        times.append((time.perf_counter() - start) / 2 if after else time.perf_counter() - start)
+    return len(articles), times
+
+
+def main():
+    args = _parser.parse_args()
+    django.setup()
+
+    from django.contrib.auth.models import User
+
+    from yarrharr.enums import ArticleFilter
+    from yarrharr.models import Article
+
+    if args.populate:
+        populate(args.populate, args.feeds)
+    user = User.objects.get(username="bench")
+    total = Article.objects.filter(feed__user=user).count()
+    print("Searching {:,d} articles".format(total))
+
+    feed_ids = list(user.feed_set.order_by("id").values_list("id", flat=True))
+    label, _ = user.label_set.get_or_create(text="bench")
+    label.feeds.set(feed_ids[: max(1, len(feed_ids) // 10)])
+    scopes = [
+        ("all", user.feed_set.all()),
+        ("label", label.feeds.all()),
+        ("feed", user.feed_set.filter(pk=feed_ids[0])),
+    ]
+    searches = [
+        ("rare word", _word(_VOCABULARY - 1)),
+        ("1% word", _word(900)),
+        ("most common word", _word(0)),
+        ("two common words", "{} {}".format(_word(1), _word(2))),
+        ("prefix", _word(0) + "*"),
+    ]
+    for label, query in searches:
+        for scope, feeds in scopes:
+            for filt in (ArticleFilter.all, ArticleFilter.unread, ArticleFilter.fave):
+                found, times = bench(feeds, query, filt, args.searches)
+                print(
+                    "{:<18} {:<12} {:<6} {:<7} {:4d} results  median {:6.1f} ms  max {:6.1f} ms".format(
+                        label,
+                        repr(query),
+                        scope,
+                        filt.name,
+                        found,
+                        statistics.median(times) * 1e3,
+                        max(times) * 1e3,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -30,16 +30,20 @@ Yarrharr production server via Twisted Web
 import io
 import json
 import logging
+import multiprocessing
 import os
 import re
 import sys
 from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor
 
 import attr
 from django.conf import settings
 from django.dispatch import receiver
 from twisted.internet import defer
 from twisted.internet.endpoints import serverFromString
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
 from twisted.logger import (
     FileLogObserver,
     FilteringLogObserver,
@@ -61,6 +65,7 @@ from zope.interface import implementer
 
 from . import __version__
 from .signals import schedule_changed
+from .writequeue import write_queue
 from .wsgi import application
 
 log = Logger()
@@ -332,11 +337,55 @@ class Root(FallbackResource):
         return super().getChildWithDefault(name, request)
 
 
-def updateFeeds(reactor, max_fetch=5):
+def makeFetcher(reactor, concurrency=None):
+    """
+    Construct a :class:`~yarrharr.fetch.Fetcher` configured by the ``POLL_*``
+    settings.
+
+    :param concurrency:
+        Maximum number of fetches in flight at once. Defaults to the
+        ``POLL_CONCURRENCY`` setting.
+    """
+    from .fetch import Fetcher, known_fingerprints
+
+    if concurrency is None:
+        concurrency = settings.POLL_CONCURRENCY
+    if settings.POLL_SANITIZE_WORKERS:
+        # The workers only import yarrharr.sanitize, so they are spawned
+        # fresh rather than forked from a process with a reactor, threads,
+        # and database connections.
+        executor = ProcessPoolExecutor(
+            settings.POLL_SANITIZE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    else:
+        executor = None
+    return Fetcher(
+        reactor,
+        concurrency=concurrency,
+        per_host=settings.POLL_PER_HOST,
+        host_spacing=settings.POLL_HOST_SPACING,
+        executor=executor,
+        max_size=settings.POLL_MAX_SIZE,
+        known=lambda feed, fingerprints: deferToThread(known_fingerprints, feed, fingerprints),
+    )
+
+
+def updateFeeds(reactor, fetcher, max_fetch=None, schedule=None):
     """
     Poll any feeds due for a check.
+
+    :param fetcher: :class:`~yarrharr.fetch.Fetcher` to poll with
+    :param max_fetch:
+        Maximum number of feeds to check in one pass. Defaults to the
+        ``POLL_MAX_FETCH`` setting.
+    :param schedule:
+        :class:`~yarrharr.scheduler.FeedSchedule` to consult and update. If
+        `None`, the schedule is loaded from the database and limited to the
+        ``POLL_RATE`` setting.
     """
     from .fetch import poll
+    from .scheduler import FeedSchedule
 
     def _failed(reason):
         """
@@ -345,7 +394,13 @@ def updateFeeds(reactor, max_fetch=5):
         log.failure("Unexpected failure polling feeds", failure=reason)
         return 1.0  # seconds until next poll
 
-    d = poll(reactor, max_fetch)
+    if max_fetch is None:
+        max_fetch = settings.POLL_MAX_FETCH
+
+    if schedule is None:
+        schedule = FeedSchedule(settings.POLL_RATE or None)
+
+    d = poll(reactor, max_fetch, fetcher, schedule)
     # Last gasp error handler to avoid terminating the LoopingCall.
     d.addErrback(_failed)
     return d
@@ -531,6 +586,23 @@ class AdaptiveLoopingCall(object):
         d.errback(failure)
 
 
+def writeResanitized():
+    """
+    Write articles re-sanitized on read to the database.
+
+    :returns: `Deferred` which fires when the write completes. It doesn't fail.
+    """
+    from .resanitize import writer
+
+    def written(count):
+        if count:
+            log.debug("Wrote {count} re-sanitized articles", count=count)
+
+    d = write_queue.submit(writer.flush)
+    d.addCallbacks(written, lambda f: log.failure("Failed to write re-sanitized articles", f))
+    return d
+
+
 def run():
     from twisted.internet import reactor
 
@@ -552,25 +624,47 @@ def run():
     endpoint = serverFromString(reactor, settings.SERVER_ENDPOINT)
     reactor.addSystemEventTrigger("before", "startup", endpoint.listen, factory)
 
-    updateLoop = AdaptiveLoopingCall(reactor, lambda: updateFeeds(reactor))
+    # All database writes go through the write queue's thread. It is stopped
+    # once the "before" triggers below have written everything they will.
+    write_queue.start(reactor)
+    reactor.addSystemEventTrigger("during", "shutdown", write_queue.stop)
+
+    from .scheduler import FeedSchedule
+
+    fetcher = makeFetcher(reactor)
+    schedule = FeedSchedule(settings.POLL_RATE or None)
+    updateLoop = AdaptiveLoopingCall(reactor, lambda: updateFeeds(reactor, fetcher, schedule=schedule))
     loopEndD = updateLoop.start()
     loopEndD.addErrback(lambda f: log.failure("Polling loop broke", f))
 
     @receiver(schedule_changed)
     def threadPollNow(sender, **kwargs):
         """
-        When the `schedule_changed` signal is sent poke the polling loop. If it
-        is sleeping this will cause it to poll immediately. Otherwise this will
-        cause it to run the poll function immediately once it returns (running
-        it again protects against races).
+        When the `schedule_changed` signal is sent mark the schedule stale
+        and poke the polling loop. If it is sleeping this will cause it to
+        poll immediately. Otherwise this will cause it to run the poll
+        function immediately once it returns (running it again protects
+        against races).
         """
         log.debug("Immediate poll triggered by {sender}", sender=sender)
+        reactor.callFromThread(schedule.invalidate)
         reactor.callFromThread(updateLoop.poke)
 
     def stopUpdateLoop():
         updateLoop.stop()
-        return loopEndD
+        return loopEndD.addBoth(lambda _: fetcher.close())
 
     reactor.addSystemEventTrigger("before", "shutdown", stopUpdateLoop)
 
+    if settings.RESANITIZE_ON_READ:
+        resanitizeLoop = LoopingCall(writeResanitized)
+        resanitizeLoop.clock = reactor
+        resanitizeLoop.start(5.0, now=False)
+
+        def stopResanitizeLoop():
+            resanitizeLoop.stop()
+            return writeResanitized()
+
+        reactor.addSystemEventTrigger("before", "shutdown", stopResanitizeLoop)
+
     reactor.run()
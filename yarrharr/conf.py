@@ -52,6 +52,12 @@ static_root = /var/lib/yarrharr/static/
 ; URL of the files at static_root.  Normally this should only be overridden in
 ; development mode.
 static_url = /static/
+; How to bring articles up to date after an upgrade changes how content is
+; sanitized. With "offline" old articles display as they were until the
+; updatehtml command is run. With "on-read" articles are sanitized again the
+; first time they are displayed and written back in the background (by the
+; request which fills a batch when not run by the yarrharr server).
+resanitize = offline
 
 [db]
 engine = django.db.backends.sqlite3
@@ -60,6 +66,50 @@ user =
 password =
 host =
 port =
+; Seconds to keep a database connection open for reuse by later requests.
+; 0 closes the connection at the end of each request.
+conn_max_age = 600
+; The remaining options tune SQLite. See https://www.sqlite.org/pragma.html
+; for details. The database is always in WAL mode.
+;
+; Durability of commits: off, normal, full or extra. In WAL mode normal is
+; safe from corruption, but a power loss may roll back the last commits.
+synchronous = normal
+; Page cache size per connection: pages when positive, KiB when negative.
+cache_size = -16000
+; Bytes of the database file to access by memory mapping, or 0 to disable.
+mmap_size = 268435456
+; Where temporary tables and indices are stored: default, file or memory.
+temp_store = memory
+; Milliseconds to wait for a lock held by another connection before failing
+; with "database is locked".
+busy_timeout = 5000
+
+[poll]
+; Maximum number of feeds checked in one polling pass. The results of a pass
+; are written to the database together.
+max_fetch = 50
+; Maximum number of feed fetches in flight at once.
+concurrency = 10
+; Maximum number of feed fetches in flight to any one host. Connections to
+; a host are kept alive and reused between fetches.
+per_host = 2
+; Minimum number of seconds between the start of fetches from the same host.
+host_spacing = 1.0
+; Number of worker processes which sanitize the content of fetched articles.
+; With 0 articles are sanitized as they are written to the database, which
+; holds up database access by the web interface for longer.
+sanitize_workers = 2
+; Maximum size of a feed in bytes, after decompression. Larger feeds are
+; abandoned part way through the download.
+max_size = 67108864
+; Maximum number of feeds fetched per minute, on average. Feeds which come
+; due together are spread out to this rate, with up to a minute's worth
+; fetched at once. 0 means no limit.
+rate = 0
+; Each feed's interval between checks is lengthened by a random fraction of
+; up to this much, so that feeds don't come due in lockstep.
+jitter = 0.1
 
 [secrets]
 ; The secret_key key must be present and non-empty.
@@ -102,6 +152,36 @@ def find_conf_files():
     return files
 
 
+_SQLITE_PRAGMA_CHOICES = {
+    "synchronous": {"off", "normal", "full", "extra"},
+    "temp_store": {"default", "file", "memory"},
+}
+
+
+def _read_sqlite_pragmas(conf):
+    """
+    Read the SQLite tuning options from the ``[db]`` section.
+
+    :returns: :class:`dict` mapping pragma names to their values, which are
+        safe to interpolate into a ``PRAGMA`` statement
+    :raises ValueError: when an option has an invalid value
+    """
+    pragmas = {}
+    for name, choices in _SQLITE_PRAGMA_CHOICES.items():
+        value = conf.get("db", name).strip().lower()
+        if value not in choices:
+            msg = "db {} must be one of {}, not {!r}".format(name, ", ".join(sorted(choices)), value)
+            raise ValueError(msg)
+        pragmas[name] = value
+    pragmas["cache_size"] = conf.getint("db", "cache_size")
+    for name in ("mmap_size", "busy_timeout"):
+        pragmas[name] = conf.getint("db", name)
+        if pragmas[name] < 0:
+            msg = "db {} must not be negative, not {!r}".format(name, pragmas[name])
+            raise ValueError(msg)
+    return pragmas
+
+
 def read_yarrharr_conf(files, namespace):
     """
     Read the given configuration files, mutating the given dictionary to
@@ -127,8 +207,13 @@ def read_yarrharr_conf(files, namespace):
             "PASSWORD": conf.get("db", "password"),
             "HOST": conf.get("db", "host"),
             "PORT": conf.get("db", "port"),
+            "CONN_MAX_AGE": conf.getint("db", "conn_max_age"),
         },
     }
+    if namespace["DATABASES"]["default"]["CONN_MAX_AGE"] < 0:
+        msg = "db conn_max_age must not be negative, not {!r}".format(namespace["DATABASES"]["default"]["CONN_MAX_AGE"])
+        raise ValueError(msg)
+    namespace["SQLITE_PRAGMAS"] = _read_sqlite_pragmas(conf)
     namespace["ATOMIC_REQUESTS"] = True
     namespace["DEFAULT_AUTO_FIELD"] = "django.db.models.AutoField"
 
@@ -151,9 +236,43 @@ def read_yarrharr_conf(files, namespace):
         raise ValueError(msg)
     namespace["USE_X_FORWARDED_HOST"] = proxied == "x-forwarded"
 
+    resanitize = conf.get("yarrharr", "resanitize")
+    if resanitize not in {"offline", "on-read"}:
+        msg = "resanitize must be 'offline' or 'on-read', not {!r}".format(resanitize)
+        raise ValueError(msg)
+    namespace["RESANITIZE_ON_READ"] = resanitize == "on-read"
+
     # Config for the Twisted production server.
     namespace["SERVER_ENDPOINT"] = conf.get("yarrharr", "server_endpoint")
 
+    # Config for the feed poller.
+    namespace["POLL_MAX_FETCH"] = conf.getint("poll", "max_fetch")
+    namespace["POLL_CONCURRENCY"] = conf.getint("poll", "concurrency")
+    if namespace["POLL_CONCURRENCY"] < 1:
+        msg = "poll concurrency must be at least 1, not {!r}".format(namespace["POLL_CONCURRENCY"])
+        raise ValueError(msg)
+    namespace["POLL_PER_HOST"] = conf.getint("poll", "per_host")
+    if namespace["POLL_PER_HOST"] < 1:
+        msg = "poll per_host must be at least 1, not {!r}".format(namespace["POLL_PER_HOST"])
+        raise ValueError(msg)
+    namespace["POLL_HOST_SPACING"] = conf.getfloat("poll", "host_spacing")
+    namespace["POLL_SANITIZE_WORKERS"] = conf.getint("poll", "sanitize_workers")
+    if namespace["POLL_SANITIZE_WORKERS"] < 0:
+        msg = "poll sanitize_workers must not be negative, not {!r}".format(namespace["POLL_SANITIZE_WORKERS"])
+        raise ValueError(msg)
+    namespace["POLL_MAX_SIZE"] = conf.getint("poll", "max_size")
+    if namespace["POLL_MAX_SIZE"] < 1:
+        msg = "poll max_size must be at least 1, not {!r}".format(namespace["POLL_MAX_SIZE"])
+        raise ValueError(msg)
+    namespace["POLL_RATE"] = conf.getfloat("poll", "rate")
+    if namespace["POLL_RATE"] < 0:
+        msg = "poll rate must not be negative, not {!r}".format(namespace["POLL_RATE"])
+        raise ValueError(msg)
+    namespace["POLL_JITTER"] = conf.getfloat("poll", "jitter")
+    if not 0 <= namespace["POLL_JITTER"] <= 1:
+        msg = "poll jitter must be between 0 and 1, not {!r}".format(namespace["POLL_JITTER"])
+        raise ValueError(msg)
+
     namespace["ROOT_URLCONF"] = "yarrharr.urls"
     namespace["LOGIN_URL"] = "login"
     namespace["LOGIN_REDIRECT_URL"] = "home"
@@ -30,9 +30,11 @@ Feed fetcher based on Twisted Web
 
 import hashlib
 import html
-from datetime import datetime
+import zlib
+from datetime import datetime, timedelta
 from datetime import timezone as tz
 from io import BytesIO
+from urllib.parse import urlsplit
 
 import attr
 import feedparser
@@ -40,15 +42,27 @@ import treq
 from django.db import OperationalError, transaction
 from django.utils import timezone
 from feedparser.http import ACCEPT_HEADER
-from twisted.internet import defer, error
+from treq.client import HTTPClient
+from twisted.internet import defer, error, task
+from twisted.internet.interfaces import IProtocol
 from twisted.internet.threads import deferToThread
 from twisted.logger import Logger
+from twisted.python.components import proxyForInterface
 from twisted.python.failure import Failure
-from twisted.web import client
+from twisted.web import client, http
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import IResponse
 
 from . import __version__
-from .models import Feed
-from .sanitize import html_to_text
+from .models import MAX_CHECK_INTERVAL, Article, Feed
+from .sanitize import html_to_text, sanitize_article
+from .scheduler import load_schedule
+from .writequeue import write_queue
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 try:
     # Seriously STFU this is not helpful.
@@ -64,9 +78,54 @@ log = Logger()
 # User-Agent header, so we don't mention Twisted here.
 USER_AGENT_HEADER = "Mozilla/5.0 (Linux x86_64) Yarrharr/{} +https://github.com/twm/yarrharr".format(__version__).encode()
 
+#: Longest delay we accept from a server's Retry-After hint. Anything beyond
+#: this is more likely a misconfiguration than intent.
+MAX_HINT = timedelta(days=7)
+
+#: Longest delay we accept from a response's freshness lifetime. This is a
+#: caching hint, not a promise that the feed won't change: CDNs often send
+#: a year-long max-age for everything. So it can't stretch checks out
+#: beyond the longest interval the scheduler picks itself.
+MAX_FRESHNESS = MAX_CHECK_INTERVAL
+
+#: Bounds on the back-off applied when a throttling response doesn't say
+#: when to retry.
+MIN_BACKOFF = timedelta(hours=1)
+MAX_BACKOFF = timedelta(days=2)
+
 
 @attr.s(slots=True, frozen=True)
-class BadStatus(object):
+class FetchStats(object):
+    """
+    Measurements of a single fetch, recorded on the feed by
+    :meth:`~yarrharr.models.Feed.record_fetch()`.
+
+    :ivar int wire_bytes: Size of the body as received, before any
+        ``Content-Encoding`` was decoded.
+    :ivar int body_bytes: Size of the decoded body.
+    :ivar ttfb: Seconds from issuing the request to receiving the response
+        headers, or `None` if no response was received.
+    """
+
+    wire_bytes = attr.ib(default=0)
+    body_bytes = attr.ib(default=0)
+    ttfb = attr.ib(default=None)
+
+
+@attr.s(slots=True, frozen=True)
+class _Outcome(object):
+    """
+    Base for the outcomes of a poll.
+
+    :ivar stats: :class:`FetchStats` of the fetch, or `None` when the poll
+        didn't get as far as fetching. It doesn't take part in comparisons.
+    """
+
+    stats = attr.ib(default=None, eq=False, repr=False, kw_only=True)
+
+
+@attr.s(slots=True, frozen=True)
+class BadStatus(_Outcome):
     """
     A poll resulted in an unexpected HTTP status code.
 
@@ -83,24 +142,29 @@ class BadStatus(object):
 
 
 @attr.s(slots=True, frozen=True)
-class Unchanged(object):
+class Unchanged(_Outcome):
     """
     A poll determined that the feed has not changed, perhaps due to a HTTP 304 response.
 
     :ivar str reason: String describing how the feed was unchanged.
+    :ivar max_age:
+        Freshness lifetime of the response as a :class:`timedelta`, or
+        `None` (see :func:`extract_max_age()`).
     """
 
     reason = attr.ib()
+    max_age = attr.ib(default=None)
 
     def persist(self, feed):
         feed.last_checked = timezone.now()
         feed.error = ""
+        feed.not_before = _not_before(feed.last_checked, self.max_age)
         feed.schedule()
         feed.save()
 
 
 @attr.s(slots=True, frozen=True)
-class Gone(object):
+class Gone(_Outcome):
     """
     HTTP 410 Gone was returned, so the feed should not be checked anymore.
     """
@@ -113,7 +177,41 @@ class Gone(object):
 
 
 @attr.s(slots=True, frozen=True)
-class EmptyBody:
+class Throttled(_Outcome):
+    """
+    The server refused to serve the feed for now: HTTP 429 Too Many Requests
+    or 503 Service Unavailable.
+
+    The next check waits out the ``Retry-After`` header when there is one.
+    Otherwise the interval since the last check is doubled, between
+    `MIN_BACKOFF` and `MAX_BACKOFF`, so a server that keeps refusing sees
+    less and less of us.
+
+    :ivar int code: HTTP status code
+    :ivar retry_after:
+        Delay requested by the server as a :class:`timedelta`, or `None`
+        (see :func:`extract_retry_after()`).
+    """
+
+    code = attr.ib()
+    retry_after = attr.ib(default=None)
+
+    def persist(self, feed):
+        now = timezone.now()
+        delay = self.retry_after
+        if delay is None:
+            delay = MIN_BACKOFF
+            if feed.last_checked is not None:
+                delay = max(delay, min(2 * (now - feed.last_checked), MAX_BACKOFF))
+        feed.last_checked = now
+        feed.error = "Fetch throttled: HTTP status {}".format(self.code)
+        feed.not_before = _not_before(now, delay)
+        feed.schedule()
+        feed.save()
+
+
+@attr.s(slots=True, frozen=True)
+class EmptyBody(_Outcome):
     """
     The feed content was empty. We didn't pass it to feedparser because
     feedparser doesn't deal well with an empty feed.
@@ -135,7 +233,24 @@ class EmptyBody:
 
 
 @attr.s(slots=True, frozen=True)
-class MaybeUpdated(object):
+class TooLarge(_Outcome):
+    """
+    The feed body exceeded the size limit, so reading it was abandoned.
+
+    :ivar int max_size: The limit, in bytes.
+    """
+
+    max_size = attr.ib()
+
+    def persist(self, feed):
+        feed.last_checked = timezone.now()
+        feed.error = "Feed exceeds the maximum size of {:,d} bytes".format(self.max_size)
+        feed.schedule()
+        feed.save()
+
+
+@attr.s(slots=True, frozen=True)
+class MaybeUpdated(_Outcome):
     """
     The contents of the feed have been retrieved and may have changed. The
     database should be updated to reflect the new content.
@@ -147,11 +262,13 @@ class MaybeUpdated(object):
     etag = attr.ib()
     last_modified = attr.ib()
     digest = attr.ib()
+    max_age = attr.ib(default=None)
     check_time = attr.ib(default=attr.Factory(timezone.now))
 
     def persist(self, feed):
         feed.last_checked = self.check_time
         feed.error = ""
+        feed.not_before = _not_before(self.check_time, self.max_age)
         feed.feed_title = self.feed_title
         feed.site_url = self.site_url
         feed.etag = self.etag
@@ -163,10 +280,7 @@ class MaybeUpdated(object):
             feed=feed,
         )
 
-        changed = False
-        for upsert in self.articles:
-            if self._upsert_article(feed, upsert):
-                changed = True
+        changed = self._upsert_articles(feed)
 
         if changed or feed.last_changed is None:
             feed.last_changed = self.check_time
@@ -186,14 +300,211 @@ class MaybeUpdated(object):
                 "last_modified",
                 "digest",
                 "next_check",
+                "last_arrival",
+                "arrival_interval",
+                "arrival_count",
+                "not_before",
+                "fetch_count",
+                "wire_bytes",
+                "body_bytes",
+                "ttfb",
             ],
         )
 
-    def _match_article(self, feed, upsert):
+    def _upsert_articles(self, feed) -> bool:
+        """
+        Insert or update the articles in the database.
+
+        Entries whose fingerprint matches an article are unchanged, so they
+        are dropped after one query. Candidate matches for the rest are
+        loaded with at most two queries and matched in memory (see
+        :class:`_ArticleIndex`). The changes are then written with one bulk
+        insert and one or two bulk updates.
+
+        :returns: `True` when any article was created or changed
+        """
+        known = known_fingerprints(feed, (upsert.fingerprint for upsert in self.articles))
+        upserts = [upsert for upsert in self.articles if upsert.fingerprint not in known]
+        index = _ArticleIndex.load(feed, upserts)
+        created = []
+        updated = {}
+        fingerprinted = {}
+        for upsert in upserts:
+            match, match_type = index.match(upsert)
+
+            if match is None:
+                article = Article(
+                    feed=feed,
+                    read=False,
+                    fave=False,
+                    author=upsert.author,
+                    url=upsert.url,
+                    # Sometimes feeds lack dates on entries (e.g.
+                    # <http://antirez.com/rss>); in this case default to the
+                    # current date so that they get the date the feed was fetched.
+                    date=upsert.date or self.check_time,
+                    guid=upsert.guid,
+                    fingerprint=upsert.fingerprint,
+                )
+                article.set_content(upsert.raw_title, upsert.raw_content, upsert.sanitized)
+                created.append(article)
+                index.add(article)
+                log.debug(
+                    "  created {created!a} (No match for GUID {guid!r} or URL {url!r})",
+                    created=article,
+                    guid=upsert.guid,
+                    url=upsert.url,
+                )
+                continue
+
+            # Check if we need to update.
+            if (
+                match.author != upsert.author
+                or match.raw_title != upsert.raw_title
+                or match.url != upsert.url
+                or match.guid != upsert.guid
+                or (upsert.date and match.date != upsert.date)
+                or match.raw_content != upsert.raw_content
+            ):
+                index.remove(match)
+                match.author = upsert.author
+                match.url = upsert.url
+                match.guid = upsert.guid
+                if upsert.date:
+                    # The feed may not give a date. In that case leave the date
+                    # that was assigned when the entry was first discovered.
+                    match.date = upsert.date
+                match.set_content(upsert.raw_title, upsert.raw_content, upsert.sanitized)
+                match.fingerprint = upsert.fingerprint
+                index.add(match)
+                if match.pk is not None:
+                    # Otherwise the match is in created and will be inserted
+                    # with the new values.
+                    updated[match.pk] = match
+                    fingerprinted.pop(match.pk, None)
+                log.debug(
+                    "  updated {updated!a} based on {match_type}",
+                    updated=match,
+                    match_type=match_type,
+                )
+            elif match.fingerprint != upsert.fingerprint:
+                # The article predates fingerprints, or the feed gave no date
+                # this time. Record the fingerprint so that the entry is
+                # recognized next time.
+                match.fingerprint = upsert.fingerprint
+                if match.pk is not None and match.pk not in updated:
+                    fingerprinted[match.pk] = match
+
+        if created:
+            # The per-row insert triggers maintain the feed's counts.
+            Article.objects.bulk_create(created)
+            feed.record_arrivals(article.date for article in created)
+        if updated:
+            # The read and fave flags are never updated here, so the count
+            # triggers need not fire.
+            Article.objects.bulk_update(updated.values(), _UPSERT_FIELDS)
+        if fingerprinted:
+            Article.objects.bulk_update(fingerprinted.values(), ["fingerprint"])
+        return bool(created or updated)
+
+
+#: Article fields which may be changed by an upsert.
+_UPSERT_FIELDS = [
+    "author",
+    "url",
+    "guid",
+    "date",
+    "raw_title",
+    "raw_content",
+    "title",
+    "content",
+    "content_snippet",
+    "content_text",
+    "content_rev",
+    "fingerprint",
+]
+
+
+def _http_variant(value):
+    """
+    Return the HTTP equivalent of an HTTPS URL, or `None` when *value* isn't
+    an HTTPS URL.
+    """
+    if value.startswith("https://"):
+        return "http" + value[5:]
+    return None
+
+
+class _ArticleIndex(object):
+    """
+    In-memory index of the articles in a feed which may match a batch of
+    upserts, by GUID and by URL.
+
+    Each key maps to a list of articles in order of ID, so that the first
+    is chosen consistently when there are duplicates. The index is kept up to
+    date as articles are created and changed so that later upserts in the
+    same batch see the effect of earlier ones, just as if each had been
+    written to the database in turn.
+    """
+
+    def __init__(self, articles):
+        self._by_guid = {}
+        self._by_url = {}
+        for article in articles:
+            self.add(article)
+
+    @classmethod
+    def load(cls, feed, upserts):
+        """
+        Load the candidate matches for *upserts* from *feed*.
         """
-        Attempt to match the given upsert to an existing article in the feed.
+        guids = set()
+        urls = set()
+        for upsert in upserts:
+            if upsert.guid:
+                guids.add(upsert.guid)
+                guids.add(_http_variant(upsert.guid))
+            if upsert.url:
+                urls.add(upsert.url)
+                urls.add(_http_variant(upsert.url))
+        guids.discard(None)
+        urls.discard(None)
+        # These are separate queries so that each can use its index
+        # (article_feed_guid and article_feed_url).
+        candidates = {}
+        if guids:
+            candidates.update((a.pk, a) for a in feed.articles.filter(guid__in=guids))
+        if urls:
+            for article in feed.articles.filter(url__in=urls):
+                candidates.setdefault(article.pk, article)
+        return cls(candidates[pk] for pk in sorted(candidates))
+
+    def add(self, article):
+        if article.guid:
+            self._by_guid.setdefault(article.guid, []).append(article)
+        if article.url:
+            self._by_url.setdefault(article.url, []).append(article)
+
+    def remove(self, article):
+        if article.guid:
+            self._remove(self._by_guid, article.guid, article)
+        if article.url:
+            self._remove(self._by_url, article.url, article)
+
+    @staticmethod
+    def _remove(mapping, key, article):
+        articles = mapping[key]
+        for i, a in enumerate(articles):
+            if a is article:
+                del articles[i]
+                break
+        if not articles:
+            del mapping[key]
+
+    def match(self, upsert):
+        """
+        Attempt to match the given upsert to an existing article.
 
-        :param feed: :class:`yarrharr.models.Feed` to match against
         :param upsert: :class:`ArticleUpsert` instance
         :returns: two-tuple (:class:`yarrharr.models.Article`, :class:`str`),
             where the string is ``'guid'`` or ``'url'`` to indicate the nature
@@ -202,111 +513,84 @@ class MaybeUpdated(object):
             If the match fails, returns ``(None, None)``.
         """
         if upsert.guid:
-            try:
-                match = feed.articles.filter(guid=upsert.guid)[0]
-            except IndexError:
-                pass
-            else:
-                return match, "guid"
-
-            if upsert.guid.startswith("https://"):
-                try:
-                    match = feed.articles.filter(guid="http" + upsert.guid[5:])[0]
-                except IndexError:
-                    pass
-                else:
-                    return match, "guid"
+            for guid in (upsert.guid, _http_variant(upsert.guid)):
+                if guid in self._by_guid:
+                    return self._by_guid[guid][0], "guid"
 
         # Fall back to the item link if no GUID is provided.
         # Note that we permit a match by link to match an article with a GUID.
         # This is because of databases migrated from django-yarr, which used
         # the link as a default GUID when one was not present.
         if upsert.url:
-            try:
-                match = feed.articles.filter(url=upsert.url)[0]
-            except IndexError:
-                pass
-            else:
-                return match, "url"
-
             # When the new URL is HTTPS, check if we have the same thing in
             # HTTP.  This heuristic helps cope with sites that are migrated
             # from HTTP to HTTPS but don't use a more stable identifier like
             # tag URIs.
-            if upsert.url.startswith("https://"):
-                try:
-                    match = feed.articles.filter(url="http" + upsert.url[5:])[0]
-                except IndexError:
-                    pass
-                else:
-                    return match, "url"
+            for url in (upsert.url, _http_variant(upsert.url)):
+                if url in self._by_url:
+                    return self._by_url[url][0], "url"
 
         return None, None
 
-    def _upsert_article(self, feed, upsert) -> bool:
-        match, match_type = self._match_article(feed, upsert)
-
-        if not match:
-            created = feed.articles.create(
-                read=False,
-                fave=False,
-                author=upsert.author,
-                url=upsert.url,
-                # Sometimes feeds lack dates on entries (e.g.
-                # <http://antirez.com/rss>); in this case default to the
-                # current date so that they get the date the feed was fetched.
-                date=upsert.date or self.check_time,
-                guid=upsert.guid,
-            )
-            created.set_content(upsert.raw_title, upsert.raw_content)
-            created.save()
-            log.debug(
-                "  created {created!a} (No match for GUID {guid!r} or URL {url!r})",
-                created=created,
-                guid=upsert.guid,
-                url=upsert.url,
-            )
-            return True
-
-        # Check if we need to update.
-        if (
-            match.author != upsert.author
-            or match.raw_title != upsert.raw_title
-            or match.url != match.url
-            or match.guid != match.guid
-            or (upsert.date and match.date != upsert.date)
-            or match.raw_content != upsert.raw_content
-        ):
-            match.author = upsert.author
-            match.url = upsert.url
-            match.guid = upsert.guid
-            if upsert.date:
-                # The feed may not give a date. In that case leave the date
-                # that was assigned when the entry was first discovered.
-                match.date = upsert.date
-            match.set_content(upsert.raw_title, upsert.raw_content)
-            match.save()
-            log.debug(
-                "  updated {updated!a} based on {match_type}",
-                updated=match,
-                match_type=match_type,
-            )
-            return True
-        return False
+
+def entry_fingerprint(author, raw_title, url, guid, date, raw_content):
+    """
+    Digest the fields of a feed entry which are stored in an
+    :class:`~yarrharr.models.Article`.
+
+    :returns: 16 :class:`bytes`
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for value in (author, raw_title, url, guid, date.isoformat() if date else "", raw_content):
+        b = value.encode("utf-8", "surrogatepass")
+        h.update(len(b).to_bytes(8, "big"))
+        h.update(b)
+    return h.digest()
+
+
+def known_fingerprints(feed, fingerprints):
+    """
+    Find which of the given fingerprints match articles in the database.
+
+    :param feed: :class:`~yarrharr.models.Feed` the articles belong to
+    :param fingerprints: iterable of :class:`bytes`
+    :returns: :class:`set` of the fingerprints which match
+    """
+    qs = Article.objects.filter(feed_id=feed.id, fingerprint__in=list(fingerprints))
+    return {bytes(fp) for fp in qs.values_list("fingerprint", flat=True)}
 
 
 @attr.s(slots=True, frozen=True)
 class ArticleUpsert(object):
+    """
+    An article as extracted from a feed.
+
+    :ivar bytes fingerprint:
+        Digest of the other fields (see :func:`entry_fingerprint()`).
+    :ivar sanitized:
+        :class:`~yarrharr.sanitize.SanitizedArticle` derived from `raw_title`
+        and `raw_content` by the :class:`Fetcher`, or `None` if the content is
+        to be sanitized when persisted.
+    """
+
     author = attr.ib()
     raw_title = attr.ib()
     url = attr.ib()
     date = attr.ib()
     guid = attr.ib()
     raw_content = attr.ib()
+    fingerprint = attr.ib(
+        default=attr.Factory(
+            lambda self: entry_fingerprint(self.author, self.raw_title, self.url, self.guid, self.date, self.raw_content),
+            takes_self=True,
+        ),
+        repr=False,
+    )
+    sanitized = attr.ib(default=None, repr=False)
 
 
 @attr.s(slots=True, frozen=True)
-class BozoError(object):
+class BozoError(_Outcome):
     """
     feedparser rejected the feed and wasn't able to extract anything useful.
 
@@ -332,7 +616,7 @@ class BozoError(object):
 
 
 @attr.s(slots=True, frozen=True)
-class NetworkError(object):
+class NetworkError(_Outcome):
     """
     Fetching or processing the feed content failed due to a known networking
     issue. This represents an expected error case (for an unexpected error
@@ -349,7 +633,7 @@ class NetworkError(object):
 
 
 @attr.s(slots=True, frozen=True)
-class PollError(object):
+class PollError(_Outcome):
     """
     Fetching or processing the feed content failed.
 
@@ -367,92 +651,81 @@ class PollError(object):
 
 
 @defer.inlineCallbacks
-def poll(reactor, max_fetch):
+def poll(reactor, max_fetch, fetcher, schedule):
     """
     Fetch any feeds which need checking.
 
     :param int max_fetch:
-        Limit on the number of feeds to fetch concurrently. This is the
+        Limit on the number of feeds to check in one pass. This is the
         increment of batching and aggregation: up to `max_fetch` feeds will be
-        fetched concurrently and any updates applied to the database in
-        a single transaction.
+        fetched and any updates applied to the database in a single batch.
+        The most overdue feeds are checked first.
 
         Increasing this number will increase memory use, as feed content is
         held in memory before commit, but may also make checking feeds faster
         if many require checking.
+
+    :param fetcher:
+        :class:`Fetcher` which retrieves the feeds.
+
+    :param schedule:
+        :class:`~yarrharr.scheduler.FeedSchedule` which determines which
+        feeds are due. It is loaded from the database when necessary, and
+        updated with the outcome of each check.
+
+    :returns: :class:`Deferred` which fires with the number of seconds
+        until the next feed is due
     """
     start = reactor.seconds()
 
-    feeds_to_check = yield deferToThread(
-        lambda: list(Feed.objects.filter(next_check__isnull=False).filter(next_check__lte=timezone.now())[:max_fetch])
-    )
+    if schedule.needs_load(timezone.now()):
+        entries = yield deferToThread(load_schedule)
+        schedule.reset(entries, timezone.now())
+
+    feed_ids = schedule.pop_due(timezone.now(), max_fetch)
+    if feed_ids:
+        order = {feed_id: i for i, feed_id in enumerate(feed_ids)}
+        feeds_to_check = yield deferToThread(
+            lambda: sorted(
+                Feed.objects.filter(id__in=feed_ids, next_check__isnull=False),
+                key=lambda feed: order[feed.id],
+            )
+        )
+    else:
+        feeds_to_check = []
 
     if feeds_to_check:
-        outcomes = []
-        for feed in feeds_to_check:
-            try:
-                outcome = yield poll_feed(feed, reactor)
-                outcomes.append((feed, outcome))
-                log.debug("Polled {feed} -> {outcome}", feed=feed, outcome=outcome)
-            except Exception:
-                log.failure("Failed to poll {feed}", feed=feed)
-                outcomes.append((feed, PollError()))
+        outcomes = yield fetcher.poll_feeds(feeds_to_check)
 
         try:
-            attempt = 0
-            while True:
-                try:
-                    yield deferToThread(persist_outcomes, outcomes)
-                except OperationalError as e:
-                    # We want to retry on SQLITE_BUSY [1], which indicates that
-                    # the connection could not be established because another
-                    # thread had the database locked. Unfortunately pysqlite
-                    # doesn't expose the error code in a structured form, only
-                    # as a string [2]. The sqlite3_errmsg function used to
-                    # retrieve this string doesn't make any promises about the
-                    # stability of the string over releases [3] but it seems
-                    # unlikely to change in practice. So this is a bit gross
-                    # but not really a problem.
-                    #
-                    # Note there is no need for a sleep when we retry because
-                    # sqlite brings its own(default 5 seconds, but this can be
-                    # configured in the Django DATABASES setting [4]).  We
-                    # retry here rather than increasing that setting because
-                    # that setting is global. It's fine for the poller to wait
-                    # a while, but interactive requests should fail fast.
-                    #
-                    # [1]: https://www.sqlite.org/rescode.html#busy
-                    # [2]: https://github.com/ghaering/pysqlite/blob/e728ffbcaeb7bfae1d6b7165369bd0ae/src/util.c#L74-L84
-                    # [3]: https://www.sqlite.org/c3ref/errcode.html
-                    # [4]: https://docs.djangoproject.com/en/2.1/ref/databases/#database-is-locked-errors
-                    if str(e) != "database is locked" or attempt >= 10:
-                        raise
-                    attempt += 1
-                    log.debug(
-                        ("Database lock contention while persisting {count} outcomes:" " will retry (attempt {attempt})"),
-                        count=len(outcomes),
-                        attempt=attempt,
-                    )
-                else:
-                    break
+            next_checks = yield write_queue.submit(persist_outcomes, outcomes)
         except Exception:
             log.failure("Failed to persist {count} outcomes", count=len(outcomes))
-
-    next_pending = yield deferToThread(
-        lambda: Feed.objects.filter(next_check__isnull=False).order_by("next_check").values_list("next_check", flat=True)[:1]
-    )
-    if next_pending:
-        delay = (next_pending[0] - timezone.now()).total_seconds()
+            schedule.invalidate()
+        else:
+            for feed_id, next_check in next_checks.items():
+                schedule.set(feed_id, next_check)
+
+    next_check = schedule.next_check()
+    if next_check is not None:
+        delay = (next_check - timezone.now()).total_seconds()
     else:
         delay = 15 * 60.0  # Default to every 15 minutes
     if delay < 0.0:
         delay = 0.0
     log.info(
-        "Checking {count} feeds took {duration:.2f} sec. Next check in {delay:.2f} sec.",
+        "Checking {count} feeds took {duration:.2f} sec (most overdue by {lateness:.2f} sec). Next check in {delay:.2f} sec.",
         count=len(feeds_to_check),
         duration=reactor.seconds() - start,
+        lateness=schedule.lateness.total_seconds(),
         delay=delay,
     )
+    if fetcher.pool is not None:
+        log.debug(
+            "Connections opened: {opened}, reused: {reused}",
+            opened=fetcher.pool.opened,
+            reused=fetcher.pool.reused,
+        )
     return delay
 
 
@@ -478,6 +751,112 @@ def extract_last_modified(headers):
     return lm
 
 
+def _http_date(value):
+    """
+    Parse a HTTP date.
+
+    :returns: seconds since the epoch, or `None` when *value* is invalid
+    """
+    try:
+        return http.stringToDatetime(value)
+    except (ValueError, IndexError, KeyError):
+        return None
+
+
+def _seconds(value):
+    """
+    Parse delta-seconds, as used by ``max-age`` and ``Retry-After``.
+
+    :returns: :class:`int`, or `None` when *value* is invalid
+    """
+    value = value.strip()
+    if not value.isdigit():
+        return None
+    return int(value)
+
+
+def _hint(seconds, limit):
+    """
+    Convert a hinted delay to a :class:`timedelta`, limited to *limit*.
+
+    :returns: `None` unless *seconds* is positive
+    """
+    if seconds is None or seconds <= 0:
+        return None
+    return min(timedelta(seconds=seconds), limit)
+
+
+def _not_before(now, delay):
+    if delay is None:
+        return None
+    return now + delay
+
+
+def extract_max_age(headers, now):
+    """
+    Determine how long a response stays fresh: the time before the content
+    can have changed, going by the server.
+
+    ``Cache-Control: max-age`` takes precedence over ``Expires``, which is
+    relative to the ``Date`` of the response. ``no-cache`` and ``no-store``
+    mean the response isn't fresh at all. The ``Age`` of the response, as
+    reported by any caches it passed through, is deducted. The result is
+    limited to `MAX_FRESHNESS`.
+
+    :param headers: :class:`twisted.web.http_headers.Headers` of the response
+    :param float now: Current time in seconds since the epoch, used when the
+        response lacks a ``Date`` header.
+
+    :returns: :class:`timedelta` or `None` when there is no useful hint
+    """
+    directives = {}
+    for value in headers.getRawHeaders(b"cache-control", []):
+        for directive in value.split(b","):
+            name, _, arg = directive.partition(b"=")
+            directives[name.strip().lower()] = arg.strip().strip(b'"')
+    if b"no-cache" in directives or b"no-store" in directives:
+        return None
+
+    if b"max-age" in directives:
+        lifetime = _seconds(directives[b"max-age"].decode("latin1"))
+    else:
+        expires = headers.getRawHeaders(b"expires", [])
+        if not expires:
+            return None
+        date = headers.getRawHeaders(b"date", [])
+        date = _http_date(date[-1]) if date else None
+        # An invalid Expires like "0" means the response has already expired.
+        lifetime = (_http_date(expires[-1]) or 0) - (now if date is None else date)
+
+    if lifetime is None:
+        return None
+    age = headers.getRawHeaders(b"age", [])
+    age = _seconds(age[-1].decode("latin1")) if age else None
+    return _hint(lifetime - (age or 0), MAX_FRESHNESS)
+
+
+def extract_retry_after(headers, now):
+    """
+    Parse the ``Retry-After`` header, which is either a number of seconds or
+    a HTTP date.
+
+    :param headers: :class:`twisted.web.http_headers.Headers` of the response
+    :param float now: Current time in seconds since the epoch
+
+    :returns: :class:`timedelta` or `None` if the header is absent or invalid
+    """
+    try:
+        value = headers.getRawHeaders(b"retry-after", [])[-1].decode("latin1")
+    except IndexError:
+        return None
+    seconds = _seconds(value)
+    if seconds is None:
+        date = _http_date(value.encode("latin1"))
+        if date is not None:
+            seconds = date - now
+    return _hint(seconds, MAX_HINT)
+
+
 @attr.s(auto_exc=True)
 class RequestTimeout(defer.CancelledError):
     timeout = attr.ib()
@@ -518,16 +897,96 @@ class ResponseTimeout(defer.CancelledError):
         return result
 
 
+#: Default limit on the size of a feed, in bytes.
+MAX_SIZE = 64 * 1024 * 1024
+
+
+class _BodyTooLarge(Exception):
+    """
+    Raised by :class:`_BodyReader` to abandon reading a response body.
+    """
+
+
+class _BodyReader(object):
+    """
+    Collect a response body as it arrives, hashing it as it goes.
+
+    :ivar int max_size: Limit on the size of the body.
+    :ivar int size: Number of bytes received so far.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._hash = hashlib.sha256()
+        self._chunks = []
+        self._failed = False
+        self.size = 0
+
+    def __call__(self, data):
+        if self._failed:
+            # A decoder may deliver the rest of a chunk after we have failed.
+            return
+        self.size += len(data)
+        if self.size > self.max_size:
+            self._failed = True
+            self._chunks = []
+            raise _BodyTooLarge()
+        self._hash.update(data)
+        self._chunks.append(data)
+
+    def digest(self):
+        """
+        :returns: SHA-256 digest of the body
+        """
+        return self._hash.digest()
+
+    def getvalue(self):
+        """
+        :returns: the body as :class:`bytes`
+        """
+        return b"".join(self._chunks)
+
+
 @defer.inlineCallbacks
-def poll_feed(feed, clock, treq=treq):
+def poll_feed(feed, clock, treq=treq, max_size=MAX_SIZE):
     """
     Do the parts of updating the feed which don't involve the database: fetch
     the feed content and parse it.
 
     :param feed: The :class:`~yarrharr.models.Feed` to poll
     :param clock: :class:`twisted.internet.interfaces.IReactorTime`
-    :param str url: URL to retrieve
+    :param treq: treq-alike used to issue the request
+    :param int max_size:
+        Limit on the size of the (decompressed) body in bytes. Reading the
+        body is abandoned once it is exceeded.
+
+    :returns:
+        :class:`Deferred` which fires with the outcome, its ``stats``
+        attribute set to the :class:`FetchStats` of the fetch
+    """
+    body = _BodyReader(max_size)
+    start = clock.seconds()
+    responses = []
+    outcome = yield _fetch(feed, clock, treq, body, responses.append)
+    if responses:
+        ttfb = responses[0][0] - start
+        wire_bytes = _wire_bytes(responses[0][1], body.size)
+    else:
+        ttfb = None
+        wire_bytes = 0
+    return attr.evolve(outcome, stats=FetchStats(wire_bytes, body.size, ttfb))
+
+
+@defer.inlineCallbacks
+def _fetch(feed, clock, treq, body, received):
     """
+    Implementation of :func:`poll_feed()`.
+
+    :param body: :class:`_BodyReader` which collects the response body
+    :param received: Callable passed a (time, response) tuple when the
+        response headers arrive.
+    """
+    max_size = body.max_size
     headers = {
         b"user-agent": [USER_AGENT_HEADER],
         b"accept": [ACCEPT_HEADER],
@@ -543,8 +1002,11 @@ def poll_feed(feed, clock, treq=treq):
         conditional_get = BadStatus(304)
 
     try:
-        response = yield treq.get(feed.url, headers=headers).addTimeout(30, clock, RequestTimeout.onTimeoutCancel)
-        raw_bytes = yield response.content().addTimeout(30, clock, ResponseTimeout.onTimeoutCancel)
+        response = yield treq.get(feed.url, headers=headers, unbuffered=True).addTimeout(30, clock, RequestTimeout.onTimeoutCancel)
+        received((clock.seconds(), response))
+        yield response.collect(body).addTimeout(30, clock, ResponseTimeout.onTimeoutCancel)
+    except _BodyTooLarge:
+        return TooLarge(max_size)
     except (
         # One of the timeouts above expired.
         RequestTimeout,
@@ -578,23 +1040,31 @@ def poll_feed(feed, clock, treq=treq):
     if response.code == 410:
         return Gone()
 
+    if response.code in (429, 503):
+        return Throttled(response.code, extract_retry_after(response.headers, clock.seconds()))
+
+    max_age = extract_max_age(response.headers, clock.seconds())
+
     if response.code == 304:
+        if isinstance(conditional_get, Unchanged):
+            return attr.evolve(conditional_get, max_age=max_age)
         return conditional_get
 
     if response.code != 200:
         return BadStatus(response.code)
 
-    if not raw_bytes:
+    if not body.size:
         return EmptyBody(
             code=response.code,
             content_type=", ".join(response.headers.getRawHeaders("content-type", [])),
         )
 
-    digest = hashlib.sha256(raw_bytes).digest()
+    digest = body.digest()
     # NOTE: the feed.digest attribute is buffer (on Python 2) which means that
     # it doesn't implement __eq__(), hence the conversion.
     if feed.digest is not None and bytes(feed.digest) == digest:
-        return Unchanged("digest")
+        return Unchanged("digest", max_age)
+    raw_bytes = body.getvalue()
 
     # Convert headers to the format expected by feedparser.
     h = {"content-location": response.request.absoluteURI.decode("ascii")}
@@ -645,30 +1115,438 @@ def poll_feed(feed, clock, treq=treq):
             etag=extract_etag(response.headers),
             last_modified=extract_last_modified(response.headers),
             digest=digest,
+            max_age=max_age,
             articles=articles,
         )
 
 
+class _CountingConnectionPool(client.HTTPConnectionPool):
+    """
+    Connection pool which counts how often it reuses a cached connection
+    rather than opening a new one.
+
+    :ivar int opened: Number of connections opened.
+    :ivar int reused: Number of requests which used a cached connection.
+    """
+
+    opened = 0
+    reused = 0
+
+    def getConnection(self, key, endpoint):
+        opened = self.opened
+        d = super().getConnection(key, endpoint)
+        if self.opened == opened:
+            self.reused += 1
+        return d
+
+    def _newConnection(self, key, endpoint):
+        self.opened += 1
+        return super()._newConnection(key, endpoint)
+
+
+class _BoundedGzipProtocol(client._GzipProtocol):
+    """
+    Decompress a gzip-encoded body in pieces of bounded size, so that a small
+    chunk of a compression bomb can't expand into a huge string before the
+    wrapped protocol sees it and has the chance to give up.
+    """
+
+    chunk_size = 64 * 1024
+
+    def dataReceived(self, data):
+        while data:
+            try:
+                raw = self._zlibDecompress.decompress(data, self.chunk_size)
+            except zlib.error:
+                raise client.ResponseFailed([Failure()], self._response)
+            if not raw:
+                break
+            self.original.dataReceived(raw)
+            data = self._zlibDecompress.unconsumed_tail
+
+
+class _BoundedGzipDecoder(client.GzipDecoder):
+    def deliverBody(self, protocol):
+        self.original.deliverBody(_BoundedGzipProtocol(protocol, self.original))
+
+
+class _BrotliProtocol(proxyForInterface(IProtocol)):
+    """
+    Decompress a brotli-encoded body.
+
+    The decompressor can't bound its output like zlib can, so the input is
+    fed to it in small slices instead to limit what each can expand to
+    before the wrapped protocol sees it.
+    """
+
+    slice_size = 1024
+
+    def __init__(self, protocol, response):
+        self.original = protocol
+        self._response = response
+        self._decompressor = brotli.Decompressor()
+
+    def dataReceived(self, data):
+        for i in range(0, len(data), self.slice_size):
+            try:
+                raw = self._decompressor.process(data[i : i + self.slice_size])
+            except brotli.error:
+                raise client.ResponseFailed([Failure()], self._response)
+            if raw:
+                self.original.dataReceived(raw)
+
+    def connectionLost(self, reason):
+        if reason.check(client.ResponseDone) and not self._decompressor.is_finished():
+            reason = Failure(client.ResponseFailed([Failure(brotli.error("Truncated brotli stream"))], self._response))
+        self.original.connectionLost(reason)
+
+
+class _BrotliDecoder(proxyForInterface(IResponse)):
+    def __init__(self, response):
+        self.original = response
+        self.length = client.UNKNOWN_LENGTH
+
+    def deliverBody(self, protocol):
+        self.original.deliverBody(_BrotliProtocol(protocol, self.original))
+
+
+class _CountingProtocol(proxyForInterface(IProtocol)):
+    def __init__(self, protocol, response):
+        self.original = protocol
+        self._response = response
+
+    def dataReceived(self, data):
+        self._response.wire_bytes += len(data)
+        self.original.dataReceived(data)
+
+
+class _MeteredResponse(proxyForInterface(IResponse)):
+    """
+    Count the bytes of a response body as received, before it is decoded.
+
+    :ivar int wire_bytes: Number of bytes received so far.
+    """
+
+    def __init__(self, response):
+        self.original = response
+        self.wire_bytes = 0
+
+    def deliverBody(self, protocol):
+        self.original.deliverBody(_CountingProtocol(protocol, self))
+
+
+def _wire_bytes(response, default):
+    """
+    Find how many bytes of *response* were received.
+
+    :param response: :class:`IResponse` which may wrap
+        a :class:`_MeteredResponse`
+    :param int default: Value returned when it doesn't, as when the
+        response didn't come through a :class:`_DecoderAgent`
+    """
+    while response is not None:
+        if isinstance(response, _MeteredResponse):
+            return response.wire_bytes
+        response = getattr(response, "original", None)
+    return default
+
+
+class _DecoderAgent(client.ContentDecoderAgent):
+    """
+    Decode gzip-encoded responses with :class:`_BoundedGzipDecoder` and, when
+    the optional :mod:`brotli` module is installed, brotli-encoded responses
+    with :class:`_BrotliDecoder`. The size of each body as received is
+    counted (see :func:`_wire_bytes()`).
+
+    treq's :class:`HTTPClient` wraps its agent in a `ContentDecoderAgent`
+    which declares gzip support and decodes with Twisted's unbounded
+    decoder. This agent goes underneath it, so responses arrive there already
+    decoded, and only declares the encodings that one doesn't.
+    """
+
+    def __init__(self, agent):
+        decoders = [(b"gzip", _BoundedGzipDecoder)]
+        if brotli is not None:
+            decoders.append((b"br", _BrotliDecoder))
+        super().__init__(agent, decoders)
+        self._extra = [name for name, _ in decoders if name != b"gzip"]
+
+    def request(self, method, uri, headers=None, bodyProducer=None):
+        if self._extra:
+            headers = headers.copy() if headers is not None else Headers()
+            headers.addRawHeader(b"accept-encoding", b",".join(self._extra))
+        d = self._agent.request(method, uri, headers, bodyProducer)
+        return d.addCallback(_MeteredResponse).addCallback(self._handleResponse)
+
+
+@attr.s
+class _Host(object):
+    """
+    Politeness state for one host.
+
+    :ivar slots: :class:`DeferredSemaphore` limiting the fetches in flight
+    :ivar gate: :class:`DeferredLock` serializing the start of fetches
+    :ivar float next_start: Earliest time the next fetch may start
+    """
+
+    slots = attr.ib()
+    gate = attr.ib(factory=defer.DeferredLock)
+    next_start = attr.ib(default=0.0)
+
+
+class Fetcher(object):
+    """
+    The fetcher polls feeds over persistent HTTP connections while limiting
+    the load placed on any one host.
+
+    Feeds are grouped by host. Fetches from the same host are capped at
+    *per_host* in flight and their starts are spaced by at least
+    *host_spacing* seconds, so feeds that share a host (feed services,
+    blogging platforms) take turns on a few kept-alive connections instead
+    of each doing a fresh TLS handshake. A fetch only takes one of the
+    global *concurrency* slots once its host is ready for it, so a busy
+    host doesn't hold up the rest.
+
+    When an *executor* is given the content of fetched articles is sanitized
+    there, once the fetch has given up its slots, so that persisting the
+    outcome only writes precomputed fields.
+
+    The fetcher should live as long as the process so that connections are
+    reused between polling passes.
+
+    :ivar pool:
+        :class:`HTTPConnectionPool` with counters ``opened`` and ``reused``,
+        or `None` when a *treq* was supplied.
+    """
+
+    def __init__(self, clock, concurrency, per_host, host_spacing, treq=None, executor=None, max_size=MAX_SIZE, known=None):
+        """
+        :param clock: :class:`twisted.internet.interfaces.IReactorTime`
+            (and, unless *treq* is given, ``IReactorTCP`` et al.)
+        :param int concurrency: Maximum number of fetches in flight at once.
+        :param int per_host: Maximum number of fetches in flight to one host.
+        :param float host_spacing: Minimum seconds between the start of two
+            fetches from the same host.
+        :param treq: treq-alike used to issue requests. Tests pass
+            :class:`treq.testing.StubTreq` here. By default a client is
+            built on a persistent connection pool.
+        :param executor:
+            :class:`concurrent.futures.Executor` which runs
+            :func:`~yarrharr.sanitize.sanitize_article()`, generally
+            a :class:`~concurrent.futures.ProcessPoolExecutor`. The fetcher
+            takes ownership of it. If `None`, content is sanitized as it is
+            persisted. *clock* must also provide ``IReactorThreads``.
+        :param int max_size: Limit on the size of a feed, in bytes.
+        :param known:
+            Callable which takes a :class:`~yarrharr.models.Feed` and
+            a list of entry fingerprints and returns a :class:`Deferred`
+            which fires with the :class:`set` of those which match existing
+            articles (see :func:`known_fingerprints()`). Those entries are
+            unchanged, so they aren't sanitized. If `None`, every entry is.
+        """
+        self._clock = clock
+        self._executor = executor
+        self._max_size = max_size
+        self._known = known
+        self._semaphore = defer.DeferredSemaphore(concurrency)
+        self._per_host = per_host
+        self._host_spacing = host_spacing
+        self._hosts = {}
+        if treq is None:
+            self.pool = _CountingConnectionPool(clock, persistent=True)
+            self.pool.maxPersistentPerHost = per_host
+            treq = HTTPClient(_DecoderAgent(client.Agent(clock, pool=self.pool)))
+        else:
+            self.pool = None
+        self._treq = treq
+
+    def poll_feeds(self, feeds):
+        """
+        Poll a batch of feeds.
+
+        :param feeds: Sequence of :class:`~yarrharr.models.Feed` to poll
+
+        :returns:
+            :class:`Deferred` which fires with a :class:`list` of
+            (:class:`~yarrharr.models.Feed`, outcome) tuples in the same order
+            as *feeds* once all have been polled. This never fails: an
+            unexpected exception polling a feed produces a :class:`PollError`
+            outcome.
+        """
+
+        def polled(outcome, feed):
+            log.debug("Polled {feed} -> {outcome}", feed=feed, outcome=outcome)
+            return (feed, outcome)
+
+        def failed(failure, feed):
+            log.failure("Failed to poll {feed}", failure, feed=feed)
+            return (feed, PollError(failure))
+
+        ds = []
+        for feed in feeds:
+            d = self._poll_feed(feed)
+            d.addCallbacks(polled, failed, callbackArgs=(feed,), errbackArgs=(feed,))
+            ds.append(d)
+        return defer.gatherResults(ds)
+
+    def _host(self, url):
+        hostname = urlsplit(url).hostname or ""
+        try:
+            return self._hosts[hostname]
+        except KeyError:
+            host = self._hosts[hostname] = _Host(defer.DeferredSemaphore(self._per_host))
+            return host
+
+    @defer.inlineCallbacks
+    def _poll_feed(self, feed):
+        host = self._host(feed.url)
+        yield host.slots.acquire()
+        try:
+            # Only one fetch per host waits for its turn to start at a time,
+            # and it doesn't take a global slot until that turn comes.
+            yield host.gate.acquire()
+            try:
+                delay = host.next_start - self._clock.seconds()
+                if delay > 0:
+                    yield task.deferLater(self._clock, delay, lambda: None)
+                yield self._semaphore.acquire()
+                host.next_start = self._clock.seconds() + self._host_spacing
+            finally:
+                host.gate.release()
+            try:
+                outcome = yield poll_feed(feed, self._clock, self._treq, self._max_size)
+            finally:
+                self._semaphore.release()
+        finally:
+            host.slots.release()
+        if self._executor is not None and isinstance(outcome, MaybeUpdated):
+            outcome = yield self._sanitize(feed, outcome)
+        return outcome
+
+    @defer.inlineCallbacks
+    def _sanitize(self, feed, outcome):
+        """
+        Sanitize the articles of a :class:`MaybeUpdated` outcome in the
+        executor.
+
+        :returns: :class:`Deferred` which fires with a copy of *outcome*
+            with the ``sanitized`` attribute set on each upsert which doesn't
+            match an existing article
+        """
+        if self._known is None:
+            known = set()
+        else:
+            known = yield self._known(feed, [upsert.fingerprint for upsert in outcome.articles])
+        upserts = [upsert for upsert in outcome.articles if upsert.fingerprint not in known]
+        results = yield defer.gatherResults(
+            [self._submit(sanitize_article, upsert.raw_title, upsert.raw_content) for upsert in upserts],
+            consumeErrors=True,
+        ).addErrback(lambda f: f.value.subFailure)
+        sanitized = {id(upsert): result for upsert, result in zip(upserts, results)}
+        return attr.evolve(
+            outcome,
+            articles=[attr.evolve(upsert, sanitized=sanitized.get(id(upsert))) for upsert in outcome.articles],
+        )
+
+    def _submit(self, fn, *args):
+        """
+        Call *fn* in the executor.
+
+        :returns: :class:`Deferred` which fires with the result in the
+            reactor thread
+        """
+        d = defer.Deferred()
+
+        def done(future):
+            try:
+                result = future.result()
+            except BaseException:
+                self._clock.callFromThread(d.errback, Failure())
+            else:
+                self._clock.callFromThread(d.callback, result)
+
+        self._executor.submit(fn, *args).add_done_callback(done)
+        return d
+
+    def close(self):
+        """
+        Close any cached connections and shut down the executor.
+
+        :returns: :class:`Deferred` which fires when they have closed
+        """
+        ds = []
+        if self.pool is not None:
+            ds.append(self.pool.closeCachedConnections())
+        if self._executor is not None:
+            ds.append(deferToThread(self._executor.shutdown))
+        return defer.gatherResults(ds).addCallback(lambda _: None)
+
+
 def persist_outcomes(outcomes):
     """
-    This function is called in a thread to update the database after a poll.
+    Update the database after a poll. This function is run by the
+    `~yarrharr.writequeue.write_queue`, so all of the outcomes are written in
+    one transaction. Each feed gets a savepoint: an exception raised while
+    persisting one feed is logged and rolls back that feed alone, unless it
+    is an :exc:`~django.db.OperationalError`, which rolls back the lot. The
+    failure is then recorded in the feed's `error` in a second savepoint, and
+    its next check scheduled as usual.
 
     :param outcomes:
         :class:`list` of (:class:`~yarrharr.models.Feed`, outcome) tuples,
         where each `outcome` is an object with a ``persist(feed)`` method.
+        The :class:`FetchStats` in its ``stats`` attribute, if any, are
+        added to the feed's totals.
 
         The :class:`~yarrharr.models.Feed` objects are not reused, as they may
-        be stale.
+        be stale. Fresh copies are loaded with one query.
+
+    :returns:
+        :class:`dict` mapping the ID of each feed to its new
+        :attr:`~yarrharr.models.Feed.next_check`, which is `None` if the feed
+        has been disabled or deleted
     """
+    feeds = Feed.objects.in_bulk([feed.id for feed, _ in outcomes])
+    next_checks = {}
     for feed, outcome in outcomes:
-        with transaction.atomic():
+        try:
+            feed = feeds[feed.id]
+        except KeyError:
+            # The feed was deleted while we were polling it. Discard
+            # any update as it doesn't matter any more.
+            next_checks[feed.id] = None
+            continue
+        next_check = feed.next_check
+        try:
+            with transaction.atomic():
+                stats = getattr(outcome, "stats", None)
+                if stats is not None:
+                    feed.record_fetch(stats.wire_bytes, stats.body_bytes, stats.ttfb)
+                outcome.persist(feed)
+        except OperationalError:
+            # The connection may be unusable, so abandon the batch.
+            raise
+        except Exception:
+            log.failure("Failed to persist {outcome!r} for {feed}", outcome=outcome, feed=feed)
+            # Record the failure and schedule the next check as usual, lest
+            # the overdue feed be fetched again on every poll.
             try:
-                feed = Feed.objects.get(id=feed.id)
-            except Feed.DoesNotExist:
-                # The feed was deleted while we were polling it. Discard
-                # any update as it doesn't matter any more.
-                continue
-            outcome.persist(feed)
+                with transaction.atomic():
+                    feed.refresh_from_db()
+                    feed.last_checked = timezone.now()
+                    feed.error = "Failed to save the result of the check"
+                    feed.schedule()
+                    feed.save()
+            except OperationalError:
+                raise
+            except Exception:
+                log.failure("Failed to record the failure for {feed}", feed=feed)
+            else:
+                next_check = feed.next_check
+        else:
+            next_check = feed.next_check
+        next_checks[feed.id] = next_check
+    return next_checks
 
 
 def as_datetime(t):
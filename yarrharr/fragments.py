@@ -0,0 +1,109 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+"""
+Cache of rendered HTML fragments
+
+Rendering the rows of an article list through the template engine
+dominates the time to build the page once the articles have been queried,
+but most rows haven't changed since the last time the list was shown.
+`FragmentCache` keeps the HTML of each row so that only changed rows are
+rendered again.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache(object):
+    """
+    A least recently used cache of rendered fragments, bounded by their
+    total length.
+
+    Each entry holds the fragment rendered for one object, keyed by its ID,
+    along with a *stamp* of the values it was rendered from. A lookup with a
+    different stamp misses, so an entry is never stale: when the object
+    changes its fragment is rendered again and replaces the entry, without
+    any need to hook the code which changed it.
+
+    Fragments may be looked up and added from any thread.
+
+    :ivar max_size: Limit on the total length of the fragments.
+    :ivar hits: Number of lookups which found a fragment.
+    :ivar misses: Number of lookups which didn't.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, stamp):
+        """
+        Get the fragment for *key*, if one was rendered from values equal to
+        *stamp*.
+
+        :returns: :class:`str`, or `None` on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, stamp, fragment):
+        """
+        Add the *fragment* rendered for *key* from the values *stamp*,
+        replacing any previous fragment and evicting the least recently used
+        fragments as necessary to stay within `max_size`.
+        """
+        if len(fragment) > self.max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (stamp, fragment)
+            self._size += len(fragment)
+            while self._size > self.max_size:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        """
+        Drop all fragments.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,121 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from yarrharr.models import Article
+from yarrharr.sanitize import html_to_text
+
+
+class Command(BaseCommand):
+    help = "Fill in the text of articles which predate full-text search, and so index them"
+    requires_migration_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes which extract text (default: the number of CPUs)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of articles read, converted, and written together",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Rebuild the search index from scratch, as after restoring the article table",
+        )
+
+    def handle(self, *args, **options):
+        jobs = options["jobs"]
+        batch_size = options["batch_size"]
+        if jobs < 1:
+            raise CommandError("--jobs must be at least 1")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        if options["rebuild"]:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("INSERT INTO yarrharr_article_fts(yarrharr_article_fts) VALUES ('rebuild')")
+            self.stdout.write(self.style.SUCCESS("Rebuilt the search index"))
+
+        if jobs == 1:
+            executor = None
+            text_map = map
+        else:
+            executor = ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("spawn"))
+
+            def text_map(fn, contents):
+                return executor.map(fn, contents, chunksize=max(1, batch_size // (jobs * 4)))
+
+        last = Article.objects.aggregate(Max("pk"))["pk__max"] or 0
+        count = 0
+        start = time.monotonic()
+        try:
+            # Articles are read by ranges of primary key so that each query
+            # uses the primary key index.
+            for lo in range(0, last, batch_size):
+                batch = list(
+                    Article.objects.filter(pk__gt=lo, pk__lte=lo + batch_size, content_text="").exclude(content="").only("content").order_by("pk")
+                )
+                for article, text in zip(batch, text_map(html_to_text, [a.content for a in batch])):
+                    article.content_text = text
+                # The triggers update the index to match.
+                with transaction.atomic():
+                    # Skip articles that the poller or updatehtml changed
+                    # since the batch was read: they already have the text
+                    # of their new content.
+                    current = dict(Article.objects.filter(pk__in=[a.pk for a in batch], content_text="").values_list("pk", "content"))
+                    batch = [article for article in batch if current.get(article.pk) == article.content]
+                    Article.objects.bulk_update(batch, ["content_text"])
+                count += len(batch)
+                if batch:
+                    self.stdout.write(
+                        "Indexed {:,d} articles ({:.0%} through, {:,.0f}/s)".format(
+                            count,
+                            min(lo + batch_size, last) / last,
+                            count / max(time.monotonic() - start, 1e-6),
+                        )
+                    )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        # Merge the index segments written along the way so that searches
+        # read fewer of them.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("INSERT INTO yarrharr_article_fts(yarrharr_article_fts) VALUES ('optimize')")
+        self.stdout.write(self.style.SUCCESS("Finished: indexed the text of {:,d} articles".format(count)))
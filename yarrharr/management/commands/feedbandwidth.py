@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from yarrharr.models import Feed
+
+
+class Command(BaseCommand):
+    help = "List the feeds which use the most bandwidth"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Number of feeds to list (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        feeds = Feed.objects.filter(fetch_count__gt=0).order_by(F("wire_bytes").desc(), "pk")[: options["limit"]]
+        self.stdout.write("{:>8} {:>12} {:>12} {:>6} {:>7}  {}".format("Fetches", "Received", "Decoded", "Ratio", "TTFB", "Feed"))
+        for feed in feeds:
+            ratio = feed.body_bytes / feed.wire_bytes if feed.wire_bytes else 1.0
+            ttfb = "-" if feed.ttfb is None else "{:.2f}s".format(feed.ttfb)
+            self.stdout.write(
+                "{:>8,d} {:>12,d} {:>12,d} {:>5.1f}x {:>7}  {} (#{})".format(
+                    feed.fetch_count,
+                    feed.wire_bytes,
+                    feed.body_bytes,
+                    ratio,
+                    ttfb,
+                    feed,
+                    feed.pk,
+                )
+            )
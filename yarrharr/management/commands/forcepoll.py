@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.utils import timezone
@@ -10,11 +12,20 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("feed_id", nargs="*", type=int)
+        parser.add_argument(
+            "--spread",
+            type=float,
+            default=0,
+            metavar="SECONDS",
+            help="Spread the checks evenly over this many seconds rather than checking every feed at once",
+        )
 
     def handle(self, *args, **options):
-        next_check = timezone.now()
+        if options["spread"] < 0:
+            raise CommandError("--spread must not be negative")
         with transaction.atomic():
             if options["feed_id"]:
+                feeds = []
                 for feed_id in options["feed_id"]:
                     try:
                         feed = Feed.objects.get(pk=feed_id)
@@ -22,11 +33,15 @@ class Command(BaseCommand):
                         raise CommandError("Feed {} does not exist".format(feed_id))
                     if feed.next_check is None:
                         raise CommandError("Feed {} is disabled".format(feed_id))
-                    feed.next_check = next_check
-                    feed.save()
-                    self.stdout.write("Feed {} marked to be checked".format(feed))
-                count = len(options["feed_id"])
+                    feeds.append(feed)
             else:
-                feeds = Feed.objects.exclude(next_check=None)
-                count = feeds.update(next_check=next_check)
-            self.stdout.write(self.style.SUCCESS("Updated {} feeds".format(count)))
+                feeds = list(Feed.objects.exclude(next_check=None).order_by("next_check").only("pk", "next_check"))
+            now = timezone.now()
+            spread = timedelta(seconds=options["spread"])
+            for i, feed in enumerate(feeds):
+                feed.next_check = now + spread * i / len(feeds)
+            Feed.objects.bulk_update(feeds, ["next_check"], batch_size=500)
+            if options["feed_id"]:
+                for feed in feeds:
+                    self.stdout.write("Feed {} marked to be checked".format(feed))
+            self.stdout.write(self.style.SUCCESS("Updated {} feeds".format(len(feeds))))
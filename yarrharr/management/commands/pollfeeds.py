@@ -4,7 +4,8 @@ from django.core.management.base import BaseCommand
 from twisted.internet.task import react
 from twisted.logger import globalLogBeginner, textFileLogObserver
 
-from yarrharr.application import updateFeeds
+from yarrharr.application import makeFetcher, updateFeeds
+from yarrharr.writequeue import write_queue
 
 
 class Command(BaseCommand):
@@ -14,10 +15,24 @@ class Command(BaseCommand):
         parser.add_argument(
             "--max-fetch",
             type=int,
-            default=5,
+            default=None,
             help="Limit on the number of feeds to check",
         )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Limit on the number of feeds to fetch at once",
+        )
 
     def handle(self, *args, **options):
         globalLogBeginner.beginLoggingTo([textFileLogObserver(sys.stderr)], redirectStandardIO=False)
-        react(updateFeeds, (options["max_fetch"],))
+        react(self._poll, (options["max_fetch"], options["concurrency"]))
+
+    def _poll(self, reactor, max_fetch, concurrency):
+        write_queue.start(reactor)
+        fetcher = makeFetcher(reactor, concurrency)
+        d = updateFeeds(reactor, fetcher, max_fetch)
+        d.addBoth(lambda result: fetcher.close().addCallback(lambda _: result))
+        d.addBoth(lambda result: write_queue.stop().addCallback(lambda _: result))
+        return d
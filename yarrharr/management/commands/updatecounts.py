@@ -24,14 +24,16 @@
 # such a combination shall include the source code for the parts of
 # OpenSSL used as well as that of the covered work.
 
+from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Sum
 
-from yarrharr.models import Feed
+from yarrharr.models import Feed, Label, UserCounts
 
 
 class Command(BaseCommand):
-    help = "Audit feed article counts"
+    help = "Audit feed, label, and user article counts"
     requires_migration_checks = True
 
     def add_arguments(self, parser):
@@ -40,7 +42,7 @@ class Command(BaseCommand):
             "--dry-run",
             action="store_false",
             dest="mutate",
-            help="Don't actually modify the database, just list feeds with bad counters",
+            help="Don't actually modify the database, just list feeds, labels, and users with bad counters",
         )
 
     def handle(self, *args, **options):
@@ -51,15 +53,35 @@ class Command(BaseCommand):
             "unread": 0,
             "fave": 0,
         }
+        rollups = 0
         self.stdout.write("{:<7} {:<7} {:<7} {}".format("Counter", "Current", "Valid", "Feed"))
         with transaction.atomic():
             for feed in Feed.objects.all().order_by("feed_title").iterator():
                 feeds += 1
                 self._audit_feed(feed, mutate, counts)
 
+            # Repairs to the feed counts above propagate to the label and
+            # user counts by trigger, so these are audited against the feed
+            # counts rather than the articles.
+            self.stdout.write("{:<7} {:<7} {:<7} {}".format("Counter", "Current", "Valid", "Label"))
+            for label in Label.objects.all().order_by("text").iterator():
+                valid = label.feeds.aggregate(unread=Sum("unread_count"), fave=Sum("fave_count"))
+                rollups += self._audit_rollup(Label, label, valid, mutate)
+
+            self.stdout.write("{:<7} {:<7} {:<7} {}".format("Counter", "Current", "Valid", "User"))
+            for user in User.objects.all().order_by("username").iterator():
+                valid = Feed.objects.filter(user=user).aggregate(unread=Sum("unread_count"), fave=Sum("fave_count"))
+                if mutate:
+                    user_counts, _ = UserCounts.objects.get_or_create(user=user)
+                else:
+                    user_counts = UserCounts.for_user(user)
+                rollups += self._audit_rollup(UserCounts, user_counts, valid, mutate)
+
         self.stdout.write("{:,d} feeds were audited.".format(feeds))
         style = self.style.WARNING if sum(counts.values()) > 0 else self.style.SUCCESS
         self.stdout.write(style(("{all:,d} all, {unread:,d} unread," " {fave:,d} fave counters were off.").format_map(counts)))
+        style = self.style.WARNING if rollups > 0 else self.style.SUCCESS
+        self.stdout.write(style("{:,d} label and user counters were off.".format(rollups)))
 
     def _audit_feed(self, feed, mutate, counts):
         for name, count in (
@@ -75,3 +97,24 @@ class Command(BaseCommand):
             if mutate:
                 Feed.objects.filter(pk=feed.pk).update(**{attr: count})
             counts[name] += 1
+
+    def _audit_rollup(self, model, obj, valid, mutate):
+        """
+        Compare the counts of a `Label` or `UserCounts` to the sums of the
+        feed counts, *valid*.
+
+        :returns: the number of counters which were off
+        """
+        off = 0
+        for name in ("unread", "fave"):
+            attr = name + "_count"
+            current = getattr(obj, attr)
+            # Aggregations return NULL if there are no feeds.
+            count = valid[name] or 0
+            if current == count:
+                continue
+            self.stdout.write(self.style.WARNING("{:<7} {:<7,d} {:<7,d} pk={} {}".format(name, current, count, obj.pk, obj)))
+            if mutate:
+                model.objects.filter(pk=obj.pk).update(**{attr: count})
+            off += 1
+        return off
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-# Copyright © 2017, 2018 Tom Most <twm@freecog.net>
+# Copyright © 2017, 2018, 2026 Tom Most <twm@freecog.net>
 #
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -24,32 +24,159 @@
 # such a combination shall include the source code for the parts of
 # OpenSSL used as well as that of the covered work.
 
-from django.core.management.base import BaseCommand
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import Max
 
 from yarrharr.models import Article
-from yarrharr.sanitize import REVISION
-
+from yarrharr.sanitize import REVISION, sanitize_article
 
-def need_update():
-    return Article.objects.exclude(content_rev=REVISION).only("raw_content")
+#: Fields written back by the command.
+_FIELDS = ["title", "content", "content_snippet", "content_text", "content_rev"]
 
 
 class Command(BaseCommand):
     help = "Update article HTML for sanitizer changes"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes which sanitize articles (default: the number of CPUs)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of articles read, sanitized, and written together",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            metavar="FILE",
+            help=(
+                "Record progress in FILE after each batch and resume from it."
+                " Without a checkpoint an interrupted run starts over, but"
+                " still skips the articles which were already updated."
+            ),
+        )
+
     def handle(self, *args, **options):
+        jobs = options["jobs"]
+        batch_size = options["batch_size"]
+        if jobs < 1:
+            raise CommandError("--jobs must be at least 1")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        checkpoint = options["checkpoint"]
+
+        after = self._read_checkpoint(checkpoint) if checkpoint else 0
+        if after:
+            self.stdout.write("Resuming after article {}".format(after))
+        last = Article.objects.aggregate(Max("pk"))["pk__max"] or 0
+        estimate = Article.objects.filter(pk__gt=after).exclude(content_rev=REVISION).count()
+        self.stdout.write(self.style.SUCCESS("{:,d} articles need update".format(estimate)))
+
+        if jobs == 1:
+            executor = None
+            sanitize_map = map
+        else:
+            # The workers only need yarrharr.sanitize, so spawn them rather
+            # than fork a process with an open database connection.
+            executor = ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("spawn"))
+
+            def sanitize_map(fn, titles, contents):
+                return executor.map(fn, titles, contents, chunksize=max(1, batch_size // (jobs * 4)))
+
         count = 0
-        estimate = need_update().count()
-        self.stdout.write(self.style.SUCCESS("{} articles need update".format(estimate)))
-        while True:
-            with transaction.atomic():
-                batch = list(need_update()[:100])
-                if not batch:
-                    break
-                for article in batch:
-                    article.set_content(article.raw_title, article.raw_content)
-                    article.save()
-                count += len(batch)
-            self.stdout.write(self.style.SUCCESS("Updated {} articles".format(count)))
-        self.stdout.write(self.style.SUCCESS("Finished: updated {} articles".format(count)))
+        start = time.monotonic()
+        pending = None
+        try:
+            # Articles are read by ranges of primary key so that each query
+            # uses the primary key index instead of scanning the table for
+            # articles with an old content_rev.
+            for lo in range(after, last, batch_size):
+                hi = min(lo + batch_size, last)
+                batch = list(
+                    Article.objects.filter(pk__gt=lo, pk__lte=hi).exclude(content_rev=REVISION).only("raw_title", "raw_content").order_by("pk")
+                )
+                # Hand the batch to the workers, then write the previous
+                # batch while they are busy with this one.
+                results = sanitize_map(
+                    sanitize_article,
+                    [a.raw_title for a in batch],
+                    [a.raw_content for a in batch],
+                )
+                if pending is not None:
+                    count += self._write(*pending, checkpoint)
+                    self._progress(count, estimate, start)
+                pending = (batch, results, hi)
+            if pending is not None:
+                count += self._write(*pending, checkpoint)
+                self._progress(count, estimate, start)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS("Finished: updated {:,d} articles".format(count)))
+
+    def _write(self, batch, results, hi, checkpoint):
+        """
+        Write a batch of sanitized articles, then record that every article
+        up to *hi* is done.
+
+        The batch was read a batch earlier, outside of any transaction.
+        Articles which have been updated by the poller since then are
+        skipped, as their content may have changed. Those have the current
+        `REVISION` already.
+
+        :returns: the number of articles updated
+        """
+        for article, sanitized in zip(batch, results):
+            article.set_content(article.raw_title, article.raw_content, sanitized)
+        with transaction.atomic():
+            stale = set(Article.objects.filter(pk__in=[a.pk for a in batch]).exclude(content_rev=REVISION).values_list("pk", flat=True))
+            batch = [article for article in batch if article.pk in stale]
+            Article.objects.bulk_update(batch, _FIELDS)
+        if checkpoint:
+            self._write_checkpoint(checkpoint, hi)
+        return len(batch)
+
+    def _progress(self, count, estimate, start):
+        elapsed = time.monotonic() - start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        if rate > 0:
+            eta = str(timedelta(seconds=round(max(0, estimate - count) / rate)))
+        else:
+            eta = "?"
+        self.stdout.write("Updated {:,d} of {:,d} articles ({:,.0f}/s, ETA {})".format(count, estimate, rate, eta))
+
+    def _read_checkpoint(self, path):
+        """
+        Get the primary key of the last article done by a previous run, or
+        0 to start from the beginning.
+        """
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        if state.get("revision") != REVISION:
+            self.stdout.write(self.style.WARNING("Ignoring checkpoint for sanitizer revision {}".format(state.get("revision"))))
+            return 0
+        return state["pk"]
+
+    def _write_checkpoint(self, path, pk):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"revision": REVISION, "pk": pk}, f)
+        os.replace(tmp, path)
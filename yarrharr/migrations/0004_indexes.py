@@ -0,0 +1,36 @@
+# Generated by Django 4.2.15 on 2026-10-17 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0003_feed_sort_label_sort_allviewoptions"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(fields=["feed", "guid"], name="article_feed_guid"),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(fields=["feed", "url"], name="article_feed_url"),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(fields=["feed", "date", "id"], name="article_feed_date"),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(condition=models.Q(("read", False)), fields=["feed", "date", "id"], name="article_feed_date_unread"),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(condition=models.Q(("fave", True)), fields=["feed", "date", "id"], name="article_feed_date_fave"),
+        ),
+        migrations.AddIndex(
+            model_name="feed",
+            index=models.Index(condition=models.Q(("next_check__isnull", False)), fields=["next_check"], name="feed_next_check"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.15 on 2026-10-17 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0004_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(fields=["date", "id"], name="article_date"),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(condition=models.Q(("read", False)), fields=["date", "id"], name="article_date_unread"),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(condition=models.Q(("fave", True)), fields=["date", "id"], name="article_date_fave"),
+        ),
+    ]
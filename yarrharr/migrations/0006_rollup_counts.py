@@ -0,0 +1,77 @@
+# Generated by Django 4.2.15 on 2026-10-17 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+from ._0006_rollup_triggers import CREATE_ROLLUP_TRIGGERS, DROP_ROLLUP_TRIGGERS
+
+
+def init_rollup_counts(apps, schema_editor):
+    Feed = apps.get_model("yarrharr", "Feed")
+    Label = apps.get_model("yarrharr", "Label")
+    UserCounts = apps.get_model("yarrharr", "UserCounts")
+    db_alias = schema_editor.connection.alias
+
+    for label in Label.objects.using(db_alias).all():
+        counts = label.feeds.aggregate(unread=Sum("unread_count"), fave=Sum("fave_count"))
+        label.unread_count = counts["unread"] or 0
+        label.fave_count = counts["fave"] or 0
+        label.save()
+
+    for row in Feed.objects.using(db_alias).values("user_id").annotate(unread=Sum("unread_count"), fave=Sum("fave_count")):
+        UserCounts.objects.using(db_alias).create(
+            user_id=row["user_id"],
+            unread_count=row["unread"],
+            fave_count=row["fave"],
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("yarrharr", "0005_article_date_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserCounts",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL),
+                ),
+                ("unread_count", models.IntegerField(default=0)),
+                ("fave_count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="label",
+            name="fave_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="label",
+            name="unread_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name="label",
+            constraint=models.CheckConstraint(check=models.Q(("unread_count__gte", 0)), name="label_unread_count_nonneg"),
+        ),
+        migrations.AddConstraint(
+            model_name="label",
+            constraint=models.CheckConstraint(check=models.Q(("fave_count__gte", 0)), name="label_fave_count_nonneg"),
+        ),
+        migrations.AddConstraint(
+            model_name="usercounts",
+            constraint=models.CheckConstraint(check=models.Q(("unread_count__gte", 0)), name="user_unread_count_nonneg"),
+        ),
+        migrations.AddConstraint(
+            model_name="usercounts",
+            constraint=models.CheckConstraint(check=models.Q(("fave_count__gte", 0)), name="user_fave_count_nonneg"),
+        ),
+        migrations.RunPython(init_rollup_counts, migrations.RunPython.noop, elidable=True),
+        migrations.RunSQL(CREATE_ROLLUP_TRIGGERS, DROP_ROLLUP_TRIGGERS, elidable=True),
+    ]
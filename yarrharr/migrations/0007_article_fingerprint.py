@@ -0,0 +1,40 @@
+# Generated by Django 4.2.15 on 2026-10-17 19:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0006_rollup_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="fingerprint",
+            field=models.BinaryField(default=None, null=True),
+        ),
+        # Dropping the redundant foreign key index directly avoids
+        # rebuilding the article table, which is what AlterField does on
+        # SQLite.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS "yarrharr_article_feed_id_d0662f2e"',
+                    'CREATE INDEX "yarrharr_article_feed_id_d0662f2e" ON "yarrharr_article" ("feed_id")',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="article",
+                    name="feed",
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="articles", to="yarrharr.feed"),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(condition=models.Q(("fingerprint__isnull", False)), fields=["feed", "fingerprint"], name="article_feed_fingerprint"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.15 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0007_article_fingerprint"),
+    ]
+
+    operations = [
+        # AddField would rebuild the feed table on SQLite, as the column is
+        # NOT NULL. ALTER TABLE can add it given a default in the schema.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'ALTER TABLE "yarrharr_feed" ADD COLUMN "arrival_count" integer NOT NULL DEFAULT 0',
+                    'ALTER TABLE "yarrharr_feed" DROP COLUMN "arrival_count"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name="feed",
+                    name="arrival_count",
+                    field=models.IntegerField(default=0),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="feed",
+            name="arrival_interval",
+            field=models.DurationField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="feed",
+            name="last_arrival",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.15 on 2026-10-17 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0008_feed_arrival_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="feed",
+            name="not_before",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+    ]
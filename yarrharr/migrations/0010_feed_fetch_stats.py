@@ -0,0 +1,36 @@
+# Generated by Django 4.2.15 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+def _add_counter(name, sql_type, field):
+    # AddField would rebuild the feed table on SQLite, as the column is
+    # NOT NULL. ALTER TABLE can add it given a default in the schema.
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            migrations.RunSQL(
+                'ALTER TABLE "yarrharr_feed" ADD COLUMN "{}" {} NOT NULL DEFAULT 0'.format(name, sql_type),
+                'ALTER TABLE "yarrharr_feed" DROP COLUMN "{}"'.format(name),
+            ),
+        ],
+        state_operations=[
+            migrations.AddField(model_name="feed", name=name, field=field),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0009_feed_not_before"),
+    ]
+
+    operations = [
+        _add_counter("body_bytes", "bigint", models.BigIntegerField(default=0)),
+        _add_counter("fetch_count", "integer", models.IntegerField(default=0)),
+        migrations.AddField(
+            model_name="feed",
+            name="ttfb",
+            field=models.FloatField(default=None, null=True),
+        ),
+        _add_counter("wire_bytes", "bigint", models.BigIntegerField(default=0)),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.15 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+from ._0011_search import CREATE_SEARCH, DROP_SEARCH
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0010_feed_fetch_stats"),
+    ]
+
+    operations = [
+        # AddField would rebuild the article table on SQLite, as the column
+        # is NOT NULL. ALTER TABLE can add it given a default in the schema.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    """ALTER TABLE "yarrharr_article" ADD COLUMN "content_text" text NOT NULL DEFAULT ''""",
+                    'ALTER TABLE "yarrharr_article" DROP COLUMN "content_text"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name="article",
+                    name="content_text",
+                    field=models.TextField(blank=True, default=""),
+                ),
+            ],
+        ),
+        # The text of existing articles is filled in by the backfillsearch
+        # command, which keeps the index in sync through the triggers.
+        migrations.RunSQL(CREATE_SEARCH, DROP_SEARCH),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.15 on 2026-10-17 20:30
+
+from django.db import migrations, models
+
+from ._0012_change_seq import CREATE_CHANGE_TRIGGERS, DROP_CHANGE_TRIGGERS
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0011_article_search"),
+    ]
+
+    operations = [
+        # AddField would rebuild the usercounts table on SQLite, as the
+        # column is NOT NULL. ALTER TABLE can add it given a default in the
+        # schema.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'ALTER TABLE "yarrharr_usercounts" ADD COLUMN "change_seq" bigint NOT NULL DEFAULT 0',
+                    'ALTER TABLE "yarrharr_usercounts" DROP COLUMN "change_seq"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name="usercounts",
+                    name="change_seq",
+                    field=models.BigIntegerField(default=0),
+                ),
+            ],
+        ),
+        migrations.RunSQL(CREATE_CHANGE_TRIGGERS, DROP_CHANGE_TRIGGERS),
+    ]
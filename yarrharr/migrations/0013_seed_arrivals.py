@@ -0,0 +1,49 @@
+# Generated by Django 4.2.15 on 2026-10-17 21:40
+
+from django.db import migrations
+from django.utils import timezone
+
+# Frozen copies of Feed.ARRIVAL_WEIGHT and of seed_arrivals(), so that later
+# changes to them don't change what this migration does.
+ARRIVAL_WEIGHT = 0.25
+FIELDS = ["last_arrival", "arrival_interval", "arrival_count"]
+
+
+def seed(apps, schema_editor):
+    # Without statistics every existing feed would be checked daily until the
+    # backfillarrivals command was run.
+    Feed = apps.get_model("yarrharr", "Feed")
+    Article = apps.get_model("yarrharr", "Article")
+    db_alias = schema_editor.connection.alias
+    now = timezone.now()
+    updated = []
+    for feed in Feed.objects.using(db_alias).filter(arrival_interval=None).only("pk", *FIELDS).iterator():
+        dates = Article.objects.using(db_alias).filter(feed_id=feed.pk, date__lte=now).order_by("-date").values_list("date", flat=True)[:100]
+        feed.last_arrival = None
+        feed.arrival_interval = None
+        feed.arrival_count = 0
+        for date in sorted(dates):
+            if feed.last_arrival is None:
+                feed.last_arrival = date
+                continue
+            if date <= feed.last_arrival:
+                continue
+            interval = date - feed.last_arrival
+            feed.arrival_count += 1
+            if feed.arrival_interval is None:
+                feed.arrival_interval = interval
+            else:
+                feed.arrival_interval += (interval - feed.arrival_interval) * max(ARRIVAL_WEIGHT, 1 / feed.arrival_count)
+            feed.last_arrival = date
+        updated.append(feed)
+    Feed.objects.using(db_alias).bulk_update(updated, FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yarrharr", "0012_usercounts_change_seq"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
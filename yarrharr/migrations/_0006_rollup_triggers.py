@@ -0,0 +1,105 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+"""
+Triggers which roll the per-feed counts maintained by the triggers in
+`yarrharr.migrations._0008_triggers` up into `Label` and `UserCounts`.
+
+Changes to article flags update the feed counts, and these triggers
+propagate the change in the feed counts. Adding a feed to or removing one
+from a label adds or subtracts its counts.
+
+Like the feed count triggers these must be dropped before any migration
+which rebuilds the Feed or Label tables and created again afterward.
+"""
+
+CREATE_ROLLUP_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_feed_insert
+    AFTER INSERT ON yarrharr_feed FOR EACH ROW
+    BEGIN
+        INSERT OR IGNORE INTO yarrharr_usercounts (user_id, unread_count, fave_count)
+        VALUES (NEW.user_id, 0, 0);
+        UPDATE yarrharr_usercounts SET
+            unread_count = unread_count + NEW.unread_count,
+            fave_count = fave_count + NEW.fave_count
+        WHERE user_id = NEW.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_feed_delete
+    AFTER DELETE ON yarrharr_feed FOR EACH ROW
+    BEGIN
+        UPDATE yarrharr_usercounts SET
+            unread_count = unread_count - OLD.unread_count,
+            fave_count = fave_count - OLD.fave_count
+        WHERE user_id = OLD.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_feed_update_counts
+    AFTER UPDATE OF unread_count, fave_count ON yarrharr_feed FOR EACH ROW
+    WHEN NEW.unread_count != OLD.unread_count OR NEW.fave_count != OLD.fave_count
+    BEGIN
+        UPDATE yarrharr_usercounts SET
+            unread_count = unread_count + (NEW.unread_count - OLD.unread_count),
+            fave_count = fave_count + (NEW.fave_count - OLD.fave_count)
+        WHERE user_id = NEW.user_id;
+        UPDATE yarrharr_label SET
+            unread_count = unread_count + (NEW.unread_count - OLD.unread_count),
+            fave_count = fave_count + (NEW.fave_count - OLD.fave_count)
+        WHERE id IN (SELECT label_id FROM yarrharr_label_feeds WHERE feed_id = NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_label_feeds_insert
+    AFTER INSERT ON yarrharr_label_feeds FOR EACH ROW
+    BEGIN
+        UPDATE yarrharr_label SET
+            unread_count = unread_count + (SELECT unread_count FROM yarrharr_feed WHERE id = NEW.feed_id),
+            fave_count = fave_count + (SELECT fave_count FROM yarrharr_feed WHERE id = NEW.feed_id)
+        WHERE id = NEW.label_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS rollup_label_feeds_delete
+    AFTER DELETE ON yarrharr_label_feeds FOR EACH ROW
+    BEGIN
+        UPDATE yarrharr_label SET
+            unread_count = unread_count - (SELECT unread_count FROM yarrharr_feed WHERE id = OLD.feed_id),
+            fave_count = fave_count - (SELECT fave_count FROM yarrharr_feed WHERE id = OLD.feed_id)
+        WHERE id = OLD.label_id;
+    END
+    """,
+]
+
+
+DROP_ROLLUP_TRIGGERS = [
+    """DROP TRIGGER IF EXISTS rollup_feed_insert""",
+    """DROP TRIGGER IF EXISTS rollup_feed_delete""",
+    """DROP TRIGGER IF EXISTS rollup_feed_update_counts""",
+    """DROP TRIGGER IF EXISTS rollup_label_feeds_insert""",
+    """DROP TRIGGER IF EXISTS rollup_label_feeds_delete""",
+]
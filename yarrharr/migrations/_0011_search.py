@@ -0,0 +1,91 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+# Full-text search of articles. The index is an external content FTS5 table:
+# it holds only the index, and reads the indexed text back from
+# yarrharr_article by rowid, so the triggers below must keep the two exactly
+# in sync (https://sqlite.org/fts5.html#external_content_tables).
+#
+# The prefix indexes of two and three characters keep prefix queries like
+# "ab*" from merging the doclist of every matching term.
+#
+# NB: Any migration which remakes yarrharr_article drops these triggers, so
+# it must recreate them and rebuild the index.
+
+CREATE_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS yarrharr_article_fts USING fts5(
+        title,
+        author,
+        content_text,
+        content='yarrharr_article',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS article_fts_insert
+    AFTER INSERT ON yarrharr_article FOR EACH ROW
+    BEGIN
+        INSERT INTO yarrharr_article_fts(rowid, title, author, content_text)
+        VALUES (NEW.id, NEW.title, NEW.author, NEW.content_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS article_fts_delete
+    AFTER DELETE ON yarrharr_article FOR EACH ROW
+    BEGIN
+        INSERT INTO yarrharr_article_fts(yarrharr_article_fts, rowid, title, author, content_text)
+        VALUES ('delete', OLD.id, OLD.title, OLD.author, OLD.content_text);
+    END
+    """,
+    # Only changes to the indexed columns matter. Flag changes, which are by
+    # far the most frequent update, don't touch the index.
+    """
+    CREATE TRIGGER IF NOT EXISTS article_fts_update
+    AFTER UPDATE OF title, author, content_text ON yarrharr_article FOR EACH ROW
+    WHEN OLD.title IS NOT NEW.title
+        OR OLD.author IS NOT NEW.author
+        OR OLD.content_text IS NOT NEW.content_text
+    BEGIN
+        INSERT INTO yarrharr_article_fts(yarrharr_article_fts, rowid, title, author, content_text)
+        VALUES ('delete', OLD.id, OLD.title, OLD.author, OLD.content_text);
+        INSERT INTO yarrharr_article_fts(rowid, title, author, content_text)
+        VALUES (NEW.id, NEW.title, NEW.author, NEW.content_text);
+    END
+    """,
+    # Index the articles which already exist.
+    """
+    INSERT INTO yarrharr_article_fts(yarrharr_article_fts) VALUES ('rebuild')
+    """,
+]
+
+DROP_SEARCH = [
+    """DROP TRIGGER IF EXISTS article_fts_insert""",
+    """DROP TRIGGER IF EXISTS article_fts_delete""",
+    """DROP TRIGGER IF EXISTS article_fts_update""",
+    """DROP TABLE IF EXISTS yarrharr_article_fts""",
+]
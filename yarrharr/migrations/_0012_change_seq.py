@@ -0,0 +1,167 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+"""
+Triggers which bump `UserCounts.change_seq` whenever something shown on the
+user's article lists or in their inventory changes, so that those pages can
+be revalidated against it (see `yarrharr.views.change_etag`).
+
+Writes which change nothing visible don't bump the sequence. Most poll
+outcomes only touch the scheduling columns of the feed, and the upsert of
+articles which haven't changed rewrites the same values.
+
+Users without a `UserCounts` row have nothing to bump. The row is created
+by the rollup triggers when the user's first feed is added.
+
+Like the count triggers these must be dropped before any migration which
+rebuilds the tables they're on and created again afterward.
+"""
+
+
+def _bump(user_id):
+    return "UPDATE yarrharr_usercounts SET change_seq = change_seq + 1 WHERE user_id = {};".format(user_id)
+
+
+def _changed(*columns):
+    return " OR ".join("NEW.{0} IS NOT OLD.{0}".format(column) for column in columns)
+
+
+_ARTICLE_USER = "(SELECT user_id FROM yarrharr_feed WHERE id = {}.feed_id)"
+_LABEL_USER = "(SELECT user_id FROM yarrharr_label WHERE id = {}.label_id)"
+
+# Article columns which appear in lists or the JSON for an article.
+_ARTICLE_COLUMNS = ("read", "fave", "title", "author", "url", "date", "content", "content_snippet")
+
+# Feed columns which appear in lists or the inventory, except last_checked,
+# which changes on every poll (see `yarrharr.views.inventory_etag`).
+_FEED_COLUMNS = ("url", "feed_title", "user_title", "site_url", "last_changed", "error", "sort")
+
+CREATE_CHANGE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_article_insert
+    AFTER INSERT ON yarrharr_article FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump(_ARTICLE_USER.format("NEW"))),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_article_delete
+    AFTER DELETE ON yarrharr_article FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump(_ARTICLE_USER.format("OLD"))),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_article_update
+    AFTER UPDATE OF {} ON yarrharr_article FOR EACH ROW
+    WHEN {}
+    BEGIN
+        {}
+    END
+    """.format(", ".join(_ARTICLE_COLUMNS), _changed(*_ARTICLE_COLUMNS), _bump(_ARTICLE_USER.format("NEW"))),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_feed_insert
+    AFTER INSERT ON yarrharr_feed FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump("NEW.user_id")),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_feed_delete
+    AFTER DELETE ON yarrharr_feed FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump("OLD.user_id")),
+    # next_check is a timestamp, but only whether it is set (i.e. whether
+    # the feed is active) is shown.
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_feed_update
+    AFTER UPDATE OF {}, next_check ON yarrharr_feed FOR EACH ROW
+    WHEN {} OR (NEW.next_check IS NULL) != (OLD.next_check IS NULL)
+    BEGIN
+        {}
+    END
+    """.format(", ".join(_FEED_COLUMNS), _changed(*_FEED_COLUMNS), _bump("NEW.user_id")),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_label_insert
+    AFTER INSERT ON yarrharr_label FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump("NEW.user_id")),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_label_delete
+    AFTER DELETE ON yarrharr_label FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump("OLD.user_id")),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_label_update
+    AFTER UPDATE OF text, sort ON yarrharr_label FOR EACH ROW
+    WHEN {}
+    BEGIN
+        {}
+    END
+    """.format(_changed("text", "sort"), _bump("NEW.user_id")),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_label_feeds_insert
+    AFTER INSERT ON yarrharr_label_feeds FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump(_LABEL_USER.format("NEW"))),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_label_feeds_delete
+    AFTER DELETE ON yarrharr_label_feeds FOR EACH ROW
+    BEGIN
+        {}
+    END
+    """.format(_bump(_LABEL_USER.format("OLD"))),
+    """
+    CREATE TRIGGER IF NOT EXISTS change_seq_allviewoptions_update
+    AFTER UPDATE OF sort ON yarrharr_allviewoptions FOR EACH ROW
+    WHEN {}
+    BEGIN
+        {}
+    END
+    """.format(_changed("sort"), _bump("NEW.user_id")),
+]
+
+DROP_CHANGE_TRIGGERS = [
+    """DROP TRIGGER IF EXISTS change_seq_article_insert""",
+    """DROP TRIGGER IF EXISTS change_seq_article_delete""",
+    """DROP TRIGGER IF EXISTS change_seq_article_update""",
+    """DROP TRIGGER IF EXISTS change_seq_feed_insert""",
+    """DROP TRIGGER IF EXISTS change_seq_feed_delete""",
+    """DROP TRIGGER IF EXISTS change_seq_feed_update""",
+    """DROP TRIGGER IF EXISTS change_seq_label_insert""",
+    """DROP TRIGGER IF EXISTS change_seq_label_delete""",
+    """DROP TRIGGER IF EXISTS change_seq_label_update""",
+    """DROP TRIGGER IF EXISTS change_seq_label_feeds_insert""",
+    """DROP TRIGGER IF EXISTS change_seq_label_feeds_delete""",
+    """DROP TRIGGER IF EXISTS change_seq_allviewoptions_update""",
+]
@@ -23,8 +23,10 @@
 # the resulting work.  Corresponding Source for a non-source form of
 # such a combination shall include the source code for the parts of
 # OpenSSL used as well as that of the covered work.
+import random
 from datetime import timedelta
 
+from django.conf import settings
 from django.db import models
 from django.db.backends.signals import connection_created
 from django.dispatch import receiver
@@ -33,17 +35,24 @@ from django.utils import timezone
 from . import sanitize
 
 
-# Enable sqlite WAL mode so that readers don't block writers. See:
+# Enable sqlite WAL mode so that readers don't block writers, then apply the
+# tuning pragmas from the [db] section of the config. See:
 # https://www.sqlite.org/wal.html
 # https://code.djangoproject.com/ticket/24018
-@receiver(connection_created, dispatch_uid="set_sqlite_wal_mode")
-def _set_sqlite_wal_mode(sender, connection, **kwargs):
+@receiver(connection_created, dispatch_uid="configure_sqlite")
+def _configure_sqlite(sender, connection, **kwargs):
     assert connection.vendor == "sqlite"
     cursor = connection.cursor()
     cursor.execute("PRAGMA journal_mode=wal;")
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        cursor.execute("PRAGMA {}={};".format(name, value))
     cursor.close()
 
 
+#: Longest interval `Feed.schedule()` leaves between checks of a feed.
+MAX_CHECK_INTERVAL = timedelta(days=1)
+
+
 class Sort(models.TextChoices):
     ASC = "asc", "Ascending"
     DESC = "desc", "Descending"
@@ -92,6 +101,27 @@ class Feed(_ViewOptions):
         its bytes changed.  ``None`` if the feed has never been successfully
         checked.
     :ivar error: String error message from the last check.
+    :ivar last_arrival:
+        Date of the newest article found by a check, or ``None`` when no
+        articles have been found.
+    :ivar arrival_interval:
+        Moving average of the time between the dates of new articles (see
+        :meth:`record_arrivals()`). ``None`` until there is at least one
+        interval.
+    :ivar arrival_count: Number of intervals that have been averaged.
+    :ivar not_before:
+        Earliest time the server said a check is worthwhile, from the
+        freshness lifetime of its last response (``Cache-Control: max-age``
+        or ``Expires``) or the ``Retry-After`` of a throttling response.
+        ``None`` when no such hint was given.
+    :ivar fetch_count: Number of fetches recorded by :meth:`record_fetch()`.
+    :ivar wire_bytes:
+        Total bytes received over those fetches, as sent by the server (that
+        is, before decompression).
+    :ivar body_bytes: Total bytes of feed content after decompression.
+    :ivar ttfb:
+        Moving average of the time to first byte, in seconds. ``None`` until
+        a response is received.
     :ivar bytes etag:
         HTTP ETag from the last check. Empty when the feed does set the header.
 
@@ -128,6 +158,14 @@ class Feed(_ViewOptions):
     etag = models.BinaryField(default=b"", max_length=1024)
     last_modified = models.BinaryField(default=b"", max_length=45)
     digest = models.BinaryField(default=b"", max_length=32)
+    last_arrival = models.DateTimeField(null=True, default=None)
+    arrival_interval = models.DurationField(null=True, default=None)
+    arrival_count = models.IntegerField(default=0)
+    not_before = models.DateTimeField(null=True, default=None)
+    fetch_count = models.IntegerField(default=0)
+    wire_bytes = models.BigIntegerField(default=0)
+    body_bytes = models.BigIntegerField(default=0)
+    ttfb = models.FloatField(null=True, default=None)
 
     feed_title = models.TextField()
     user_title = models.TextField(default="", blank=True)
@@ -140,22 +178,86 @@ class Feed(_ViewOptions):
     fave_count = models.IntegerField(default=0)
 
     _now = staticmethod(timezone.now)
+    _random = staticmethod(random.random)
+
+    #: Weight of each new interval in `arrival_interval` once it averages
+    #: more than a few intervals. Until then it is a plain mean.
+    ARRIVAL_WEIGHT = 0.25
+
+    #: Weight of each new measurement in `ttfb`.
+    TTFB_WEIGHT = 0.25
 
     def __str__(self):
         return "{} <{}>".format(self.title, self.url)
 
+    def record_arrivals(self, dates):
+        """
+        Update the inter-arrival statistics (`last_arrival`,
+        `arrival_interval` and `arrival_count`) with the dates of new
+        articles. The caller must save the fields.
+
+        Only dates after `last_arrival` yield an interval: articles published
+        together count once, and backdated articles don't count at all. Dates
+        in the future are ignored.
+
+        :param dates: iterable of aware :class:`datetime.datetime`
+        """
+        now = self._now()
+        for date in sorted(dates):
+            if date > now:
+                break
+            if self.last_arrival is None:
+                self.last_arrival = date
+                continue
+            if date <= self.last_arrival:
+                continue
+            interval = date - self.last_arrival
+            self.arrival_count += 1
+            if self.arrival_interval is None:
+                self.arrival_interval = interval
+            else:
+                weight = max(self.ARRIVAL_WEIGHT, 1 / self.arrival_count)
+                self.arrival_interval += (interval - self.arrival_interval) * weight
+            self.last_arrival = date
+
+    def record_fetch(self, wire_bytes, body_bytes, ttfb):
+        """
+        Add a fetch to the bandwidth statistics (`fetch_count`, `wire_bytes`,
+        `body_bytes` and `ttfb`).
+
+        :param int wire_bytes: Bytes received.
+        :param int body_bytes: Bytes of content after decompression.
+        :param ttfb: Time to first byte in seconds, or ``None`` if no
+            response was received.
+        """
+        self.fetch_count += 1
+        self.wire_bytes += wire_bytes
+        self.body_bytes += body_bytes
+        if ttfb is not None:
+            if self.ttfb is None:
+                self.ttfb = ttfb
+            else:
+                self.ttfb += (ttfb - self.ttfb) * self.TTFB_WEIGHT
+
     def schedule(self):
         """
         Update the `next_check` timestamp.
 
         This has no effect when checking of the feed is disabled. Otherwise, it
-        attempts to guess how frequently the feed updates based on the dates of
-        articles from the last two weeks. This guess is the minimum time between
-        articles, clamped to between 15 minutes and 1 day.
+        guesses how frequently the feed updates from the average interval
+        between articles (see :meth:`record_arrivals()`), clamped to between
+        15 minutes and 1 day. This doesn't query the database.
 
-        Only inspecting recent articles allows a feed which goes dead to "age
-        out" to the default of 1 day. When no articles are known the default
-        interval is 1 day.
+        A feed which hasn't had a new article in two weeks "ages out" to the
+        default of 1 day, as does a feed with fewer than two articles.
+
+        The interval is then lengthened by a random fraction of up to the
+        ``POLL_JITTER`` setting, so that feeds checked together, like those
+        which have aged out, drift apart rather than coming due at once.
+
+        The check is never scheduled before `not_before`, as the server has
+        said the content won't have changed (or that it won't serve us) until
+        then.
         """
         if self.next_check is None:
             # The feed was disabled while we were checking it. Do not schedule
@@ -165,22 +267,19 @@ class Feed(_ViewOptions):
             return
 
         now = self._now()
-        article_dates = list(
-            self.articles.filter(date__gt=now - timedelta(weeks=2), date__lt=now).order_by("-date").values_list("date", flat=True)[:100],
-        )
-
-        if len(article_dates) >= 2:
-            delta = min(first - second for first, second in zip(article_dates[:-1], article_dates[1:]))
+        if self.arrival_interval is not None and self.last_arrival > now - timedelta(weeks=2):
+            delta = self.arrival_interval
         else:
             delta = timedelta(days=2)
 
         min_delta = timedelta(minutes=15)
         if delta < min_delta:
             delta = min_delta
-        max_delta = timedelta(days=1)
-        if delta > max_delta:
-            delta = max_delta
-        self.next_check = now + delta
+        if delta > MAX_CHECK_INTERVAL:
+            delta = MAX_CHECK_INTERVAL
+        self.next_check = now + delta + delta * (settings.POLL_JITTER * self._random())
+        if self.not_before is not None and self.not_before > self.next_check:
+            self.next_check = self.not_before
 
     class Meta:
         constraints = [
@@ -188,6 +287,33 @@ class Feed(_ViewOptions):
             models.CheckConstraint(check=models.Q(unread_count__gte=0), name="feed_unread_count_nonneg"),
             models.CheckConstraint(check=models.Q(fave_count__gte=0), name="feed_fave_count_nonneg"),
         ]
+        indexes = [
+            # Finding the feeds due for a check (see yarrharr.fetch.poll).
+            models.Index(fields=["next_check"], condition=models.Q(next_check__isnull=False), name="feed_next_check"),
+        ]
+
+
+def seed_arrivals(feeds, limit=100):
+    """
+    Compute the inter-arrival statistics of feeds afresh from the dates of
+    their most recent articles and save them.
+
+    :param feeds: :class:`QuerySet` of :class:`Feed`
+    :param int limit: Number of each feed's most recent articles to consider
+    :returns: the number of feeds updated
+    """
+    fields = ["last_arrival", "arrival_interval", "arrival_count"]
+    now = timezone.now()
+    updated = []
+    for feed in feeds.only("pk", *fields).iterator():
+        dates = feed.articles.filter(date__lte=now).order_by("-date").values_list("date", flat=True)[:limit]
+        feed.last_arrival = None
+        feed.arrival_interval = None
+        feed.arrival_count = 0
+        feed.record_arrivals(dates)
+        updated.append(feed)
+    feeds.bulk_update(updated, fields, batch_size=500)
+    return len(updated)
 
 
 class Article(models.Model):
@@ -216,13 +342,23 @@ class Article(models.Model):
     :ivar content_snippet:
         The first 500 characters of text in *content*. Displayed as a preview
         of the article in the list view.
+    :ivar content_text:
+        All of the text of *content*. This is indexed for full-text search
+        (see :mod:`yarrharr.search`).
     :ivar content_rev:
-        Revision number of the sanitizer which generated *content* and
-        *content_snippet*. This is used to migrate old HTML by comparison with
-        `yarrharr.sanitize.REVISION`.
+        Revision number of the sanitizer which generated *content*,
+        *content_snippet* and *content_text*. This is used to migrate old
+        HTML by comparison with `yarrharr.sanitize.REVISION`.
+    :ivar fingerprint:
+        Digest of the fields taken from the feed, as computed by
+        :func:`yarrharr.fetch.entry_fingerprint()`, so that unchanged entries can be
+        recognized without comparing each field. `None` for articles which
+        haven't been checked since this field was added.
     """
 
-    feed = models.ForeignKey(Feed, related_name="articles", on_delete=models.CASCADE)
+    # Every index in Meta.indexes which starts with the feed serves the
+    # foreign key, so it doesn't need an index of its own.
+    feed = models.ForeignKey(Feed, related_name="articles", on_delete=models.CASCADE, db_index=False)
     read = models.BooleanField()
     fave = models.BooleanField()
 
@@ -236,12 +372,14 @@ class Article(models.Model):
     title = models.TextField(blank=True)
     content = models.TextField()
     content_snippet = models.TextField(blank=True, default="")
+    content_text = models.TextField(blank=True, default="")
     content_rev = models.IntegerField(default=0)
+    fingerprint = models.BinaryField(null=True, default=None)
 
     def __str__(self):
         return "{} <{}>".format(self.title, self.url)
 
-    def set_content(self, raw_title, raw_content):
+    def set_content(self, raw_title, raw_content, sanitized=None):
         """
         Set article title and content.
 
@@ -251,17 +389,42 @@ class Article(models.Model):
           * `title` — plain text title
           * `content` — sanitized HTML
           * `content_snippet` — a short plain text prefix of the HTML
+          * `content_text` — all of the text of the HTML
           * `content_rev` — revision number of the sanitization scheme
+
+        :param sanitized:
+            The :class:`~yarrharr.sanitize.SanitizedArticle` for *raw_title*
+            and *raw_content*, if it has already been computed (e.g., in
+            a worker process). Otherwise it is computed here.
         """
+        if sanitized is None:
+            sanitized = sanitize.sanitize_article(raw_title, raw_content)
         self.raw_title = raw_title
         self.raw_content = raw_content
-        self.title = title = sanitize.html_to_text(raw_title)
-        self.content = content = sanitize.sanitize_html(raw_content)
-        text = sanitize.html_to_text(content)
-        if text.startswith(title):
-            text = text[len(title) :].lstrip()
-        self.content_snippet = text[:500]
-        self.content_rev = sanitize.REVISION
+        self.title = sanitized.title
+        self.content = sanitized.content
+        self.content_snippet = sanitized.snippet
+        self.content_text = sanitized.text
+        self.content_rev = sanitized.revision
+
+    class Meta:
+        indexes = [
+            # Matching entries to existing articles when a feed is checked.
+            models.Index(fields=["feed", "guid"], name="article_feed_guid"),
+            models.Index(fields=["feed", "url"], name="article_feed_url"),
+            models.Index(fields=["feed", "fingerprint"], condition=models.Q(fingerprint__isnull=False), name="article_feed_fingerprint"),
+            # Listing articles in (date, id) order. The partial indexes serve
+            # the unread and fave filters, which are usually a small fraction
+            # of all articles.
+            models.Index(fields=["feed", "date", "id"], name="article_feed_date"),
+            models.Index(fields=["feed", "date", "id"], condition=models.Q(read=False), name="article_feed_date_unread"),
+            models.Index(fields=["feed", "date", "id"], condition=models.Q(fave=True), name="article_feed_date_fave"),
+            # Paging through articles from many feeds walks these in order,
+            # checking the feed of each (see views.sort_and_filter_articles).
+            models.Index(fields=["date", "id"], name="article_date"),
+            models.Index(fields=["date", "id"], condition=models.Q(read=False), name="article_date_unread"),
+            models.Index(fields=["date", "id"], condition=models.Q(fave=True), name="article_date_fave"),
+        ]
 
 
 class Label(_ViewOptions):
@@ -272,14 +435,69 @@ class Label(_ViewOptions):
     :ivar user: User who owns the label.
     :ivar text: The text of the label set by the user.
     :ivar feeds: Feeds to which the label has been applied.
+
+    These counts are the sum of the counts of the labeled feeds. SQL triggers
+    maintain them (see `yarrharr.migrations._0006_rollup_triggers`):
+
+    :ivar unread_count: Number of unread articles in the feeds.
+    :ivar fave_count: Number of favorite articles in the feeds.
     """
 
     text = models.CharField(max_length=64)
     user = models.ForeignKey("auth.User", on_delete=models.CASCADE)
     feeds = models.ManyToManyField(Feed)
 
+    unread_count = models.IntegerField(default=0)
+    fave_count = models.IntegerField(default=0)
+
     def __str__(self):
         return self.text
 
     class Meta:
         unique_together = ("user", "text")
+        constraints = [
+            models.CheckConstraint(check=models.Q(unread_count__gte=0), name="label_unread_count_nonneg"),
+            models.CheckConstraint(check=models.Q(fave_count__gte=0), name="label_fave_count_nonneg"),
+        ]
+
+
+class UserCounts(models.Model):
+    """
+    Article counts summed over all of a user's feeds. SQL triggers maintain
+    these (see `yarrharr.migrations._0006_rollup_triggers`), creating the row
+    when the user's first feed is added.
+
+    :ivar user: User whose feeds are counted.
+    :ivar unread_count: Number of unread articles.
+    :ivar fave_count: Number of favorite articles.
+    :ivar change_seq:
+        Incremented by trigger on any change to what the user's article
+        lists and inventory show (see
+        `yarrharr.migrations._0012_change_seq`). Pages are revalidated
+        against it.
+    """
+
+    user = models.OneToOneField("auth.User", on_delete=models.CASCADE, primary_key=True)
+    unread_count = models.IntegerField(default=0)
+    fave_count = models.IntegerField(default=0)
+    change_seq = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Get the counts for a user. This is a zeroed, unsaved instance if the
+        user has never had any feeds.
+        """
+        try:
+            return cls.objects.get(user=user)
+        except cls.DoesNotExist:
+            return cls(user=user)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(unread_count__gte=0), name="user_unread_count_nonneg"),
+            models.CheckConstraint(check=models.Q(fave_count__gte=0), name="user_fave_count_nonneg"),
+        ]
@@ -0,0 +1,133 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+"""
+Re-sanitization of articles as they are read
+
+When the ``resanitize = on-read`` option is set, articles sanitized by an old
+`~yarrharr.sanitize.REVISION` are sanitized again when they are displayed,
+rather than all at once by the ``updatehtml`` command. The results are
+written back in batches by the server's background `writer` so that page
+loads don't wait on the database.
+
+Only the bundled server flushes the `writer` periodically. Under any other
+WSGI server the request which fills a batch writes it.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Article
+from .sanitize import REVISION
+from .writequeue import write_queue
+
+#: Fields written back to the database.
+_FIELDS = ["title", "content", "content_snippet", "content_text", "content_rev"]
+
+
+class ContentWriter(object):
+    """
+    Accumulates re-sanitized articles until they are written to the
+    database by :meth:`flush()`.
+
+    Articles may be added from any thread.
+    """
+
+    def __init__(self, batch_size=500):
+        self._batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def add(self, article):
+        """
+        Queue the derived fields of *article* to be written.
+        """
+        copy = Article(pk=article.pk)
+        for field in _FIELDS:
+            setattr(copy, field, getattr(article, field))
+        with self._lock:
+            self._pending[article.pk] = copy
+
+    @property
+    def full(self):
+        """
+        Whether a whole batch of articles is queued.
+        """
+        with self._lock:
+            return len(self._pending) >= self._batch_size
+
+    def flush(self):
+        """
+        Write the queued articles to the database.
+
+        Articles which have been updated by the poller or ``updatehtml`` since
+        they were queued are skipped, as their content may have changed. If
+        the write fails the articles stay queued for the next flush.
+
+        :returns: the number of articles written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        pks = sorted(pending)
+        written = 0
+        try:
+            with transaction.atomic():
+                for i in range(0, len(pks), self._batch_size):
+                    stale = Article.objects.filter(pk__in=pks[i : i + self._batch_size]).exclude(content_rev=REVISION)
+                    articles = [pending[pk] for pk in stale.values_list("pk", flat=True)]
+                    Article.objects.bulk_update(articles, _FIELDS)
+                    written += len(articles)
+        except BaseException:
+            with self._lock:
+                # Articles queued meanwhile are fresher.
+                pending.update(self._pending)
+                self._pending = pending
+            raise
+        return written
+
+
+writer = ContentWriter()
+
+
+def resanitize_stale(articles):
+    """
+    Sanitize again any of *articles* which were sanitized by an old
+    `~yarrharr.sanitize.REVISION` and queue the results with the `writer`.
+    This does nothing unless the ``RESANITIZE_ON_READ`` setting is true.
+
+    :param articles: iterable of :class:`~yarrharr.models.Article`
+    """
+    if not settings.RESANITIZE_ON_READ:
+        return
+    for article in articles:
+        if article.content_rev != REVISION:
+            article.set_content(article.raw_title, article.raw_content)
+            writer.add(article)
+    # The bundled server flushes the writer from a loop. Elsewhere nothing
+    # would, so write a full batch from the request lest it grow unbounded.
+    if not write_queue.running and writer.full:
+        write_queue.call(writer.flush)
@@ -27,6 +27,7 @@ import re
 import warnings
 from io import StringIO
 
+import attr
 import html5lib
 from html5lib.constants import namespaces, voidElements
 from html5lib.filters import sanitizer
@@ -147,12 +148,60 @@ def html_to_text(html: str) -> str:
     return _WHITESPACE_RE.sub(" ", buf.getvalue()).strip()
 
 
+@attr.s(slots=True, frozen=True)
+class SanitizedArticle(object):
+    """
+    The fields of an article derived from its raw title and content by
+    :func:`sanitize_article()`.
+
+    :ivar str title: Title as plain text.
+    :ivar str content: Sanitized HTML content.
+    :ivar str snippet:
+        The first 500 characters of the text of *content*, less the title if
+        the content repeats it.
+    :ivar str text: All of the text of *content*, which is indexed for
+        search.
+    :ivar int revision: The `REVISION` of the sanitizer which produced these.
+    """
+
+    title = attr.ib()
+    content = attr.ib()
+    snippet = attr.ib()
+    text = attr.ib(default="")
+    revision = attr.ib(default=REVISION)
+
+
+def sanitize_article(raw_title: str, raw_content: str) -> SanitizedArticle:
+    """
+    Sanitize the title and content of an article.
+
+    The content is parsed only once: the text is collected from the same
+    token stream that is serialized to produce the sanitized HTML, so it
+    matches what :func:`html_to_text()` would return for that HTML.
+
+    This is CPU-intensive and doesn't touch the database, so it may be run in
+    a worker process.
+    """
+    title = html_to_text(raw_title)
+    source = _TextFilter(_sanitize(raw_content))
+    content = html5lib.serializer.HTMLSerializer().render(source)
+    return SanitizedArticle(title=title, content=content, snippet=_snippet(source.text, title), text=source.text)
+
+
 def sanitize_html(html: str) -> str:
     """
     Make the given HTML string safe to display in a Yarrharr page.
     """
+    return html5lib.serializer.HTMLSerializer().render(_sanitize(html))
+
+
+def _sanitize(html):
+    """
+    Parse the given HTML string and filter it.
+
+    :returns: iterable of html5lib tokens
+    """
     tree = html5lib.parseFragment(html)
-    serializer = html5lib.serializer.HTMLSerializer()
     source = html5lib.getTreeWalker("etree")(tree)
     source = _strip_attrs(source)
     source = _drop_empty_tags(source)
@@ -179,7 +228,59 @@ def sanitize_html(html: str) -> str:
             ]
         ),
     )
-    return serializer.render(source)
+    return source
+
+
+class _TextFilter(BaseFilter):
+    """
+    Pass tokens through unchanged while accumulating their text the way
+    :func:`html_to_text()` would.
+
+    :ivar str text:
+        The text, which is available once the tokens have been consumed.
+    """
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.text = None
+
+    def __iter__(self):
+        buf = []
+        pending_ws = False
+        drop = 0
+        for token in BaseFilter.__iter__(self):
+            token_type = token["type"]
+            if token_type == "Characters" or token_type == "SpaceCharacters":
+                if not drop:
+                    if pending_ws:
+                        buf.append(" ")
+                        pending_ws = False
+                    buf.append(token["data"])
+            elif token_type in ("StartTag", "EndTag", "EmptyTag"):
+                # The whitespace that html_to_text() injects depends only
+                # on the tag which immediately precedes the text.
+                tag = "{%s}%s" % (token["namespace"], token["name"])
+                pending_ws = tag not in _NO_WHITESPACE_TAGS
+                if tag in _DROP_TAGS:
+                    if token_type == "StartTag":
+                        drop += 1
+                    elif token_type == "EndTag":
+                        drop -= 1
+                elif tag == _IMG_TAG and not drop:
+                    buf.append(token["data"].get((None, "alt"), "🖼️"))
+            yield token
+
+        self.text = _WHITESPACE_RE.sub(" ", "".join(buf)).strip()
+
+
+def _snippet(text: str, title: str, length: int = 500) -> str:
+    """
+    Produce a preview of an article from the text of its content: up to
+    *length* characters, less any prefix which matches *title*.
+    """
+    if text.startswith(title):
+        text = text[len(title) :].lstrip()
+    return text[:length]
 
 
 def _strip_attrs(source):
@@ -0,0 +1,200 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+"""
+The in-memory schedule of feed checks
+"""
+
+import heapq
+from datetime import timedelta
+
+from .models import Feed
+
+
+def load_schedule():
+    """
+    Read the schedule of feed checks from the database.
+
+    :returns: :class:`list` of (feed ID, next check) tuples for the feeds
+        which are due to be checked
+    """
+    return list(Feed.objects.filter(next_check__isnull=False).values_list("id", "next_check"))
+
+
+class FeedSchedule(object):
+    """
+    When each feed is next due to be checked, kept in a heap so that the
+    most overdue feeds are found without querying the database.
+
+    The schedule is loaded from the database at startup (see
+    :func:`load_schedule()`) and kept up to date as polls are persisted.
+    Changes made elsewhere, like adding a feed in the web interface, mark it
+    `stale` so that it is loaded again. It is also reloaded every
+    `RELOAD_INTERVAL` to pick up changes made by other processes, like the
+    ``forcepoll`` command.
+
+    When a *rate* is given, feeds are handed out no faster than that on
+    average, so that a cohort of feeds which come due together is spread out
+    rather than fetched all at once. Up to a minute's worth of feeds may be
+    handed out in a burst.
+
+    This class isn't thread-safe: use it from the reactor thread.
+
+    :ivar rate:
+        Maximum number of feeds handed out per minute, or `None` for no limit.
+    :ivar bool stale:
+        `True` when the schedule must be loaded from the database before
+        it is used.
+    :ivar lateness:
+        :class:`datetime.timedelta` by which the most overdue feed returned
+        by the last call to :meth:`pop_due()` was late, or `None` before the
+        first call.
+    """
+
+    RELOAD_INTERVAL = timedelta(minutes=15)
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._heap = []
+        self._next_checks = {}
+        self._loaded = None
+        self._tokens = 0.0
+        self._tokens_at = None
+        self.stale = True
+        self.lateness = None
+
+    def __len__(self):
+        return len(self._next_checks)
+
+    def needs_load(self, now):
+        """
+        Whether the schedule must be loaded from the database, because it is
+        `stale` or was loaded more than `RELOAD_INTERVAL` ago.
+        """
+        return self.stale or (self._loaded is not None and now - self._loaded >= self.RELOAD_INTERVAL)
+
+    def reset(self, entries, now=None):
+        """
+        Replace the content of the schedule.
+
+        :param entries: iterable of (feed ID, next check) tuples, as returned
+            by :func:`load_schedule()`
+        :param now: Aware :class:`datetime.datetime` at which the entries
+            were loaded, or `None` if they needn't be reloaded periodically.
+        """
+        self._next_checks = dict(entries)
+        self._heap = [(next_check, feed_id) for feed_id, next_check in self._next_checks.items()]
+        heapq.heapify(self._heap)
+        self._loaded = now
+        self.stale = False
+
+    def invalidate(self):
+        """
+        Note that the database has changed such that the schedule must be
+        loaded again.
+        """
+        self.stale = True
+
+    def set(self, feed_id, next_check):
+        """
+        Set when a feed is next due.
+
+        :param int feed_id: ID of the :class:`~yarrharr.models.Feed`
+        :param next_check: Aware :class:`datetime.datetime`, or `None` to
+            remove the feed from the schedule.
+        """
+        if next_check is None:
+            self._next_checks.pop(feed_id, None)
+        else:
+            self._next_checks[feed_id] = next_check
+            heapq.heappush(self._heap, (next_check, feed_id))
+        # Superseded entries are discarded lazily. Rebuild the heap should
+        # they come to dominate it.
+        if len(self._heap) > 2 * len(self._next_checks) + 64:
+            self._heap = [(next_check, feed_id) for feed_id, next_check in self._next_checks.items()]
+            heapq.heapify(self._heap)
+
+    def _discard_superseded(self):
+        while self._heap:
+            next_check, feed_id = self._heap[0]
+            if self._next_checks.get(feed_id) == next_check:
+                break
+            heapq.heappop(self._heap)
+
+    def _refill(self, now):
+        """
+        Add the feeds which may be handed out since the last call to the
+        token bucket, up to a minute's worth.
+        """
+        burst = max(1.0, self.rate)
+        if self._tokens_at is None:
+            self._tokens = burst
+        elif now > self._tokens_at:
+            self._tokens = min(burst, self._tokens + (now - self._tokens_at).total_seconds() * self.rate / 60)
+        self._tokens_at = max(now, self._tokens_at or now)
+
+    def next_check(self):
+        """
+        :returns: when :meth:`pop_due()` should next be called: when the next
+            feed is due and may be handed out, or when the schedule should
+            be reloaded, whichever is first. `None` if neither applies.
+        """
+        self._discard_superseded()
+        when = None
+        if self._heap:
+            when = self._heap[0][0]
+            if self.rate and self._tokens_at is not None and self._tokens < 1.0:
+                when = max(when, self._tokens_at + timedelta(seconds=(1.0 - self._tokens) * 60 / self.rate))
+        if self._loaded is not None:
+            reload = self._loaded + self.RELOAD_INTERVAL
+            when = reload if when is None else min(when, reload)
+        return when
+
+    def pop_due(self, now, limit):
+        """
+        Remove the feeds which are due, most overdue first. They should be
+        added back with :meth:`set()` once they are checked.
+
+        :param now: Aware :class:`datetime.datetime`
+        :param int limit: Maximum number of feeds to return. This is reduced
+            to respect the `rate`.
+        :returns: :class:`list` of feed IDs
+        """
+        if self.rate:
+            self._refill(now)
+            limit = min(limit, int(self._tokens))
+        feed_ids = []
+        self.lateness = timedelta(0)
+        while len(feed_ids) < limit:
+            self._discard_superseded()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            next_check, feed_id = heapq.heappop(self._heap)
+            del self._next_checks[feed_id]
+            feed_ids.append(feed_id)
+            self.lateness = max(self.lateness, now - next_check)
+        if self.rate:
+            self._tokens -= len(feed_ids)
+        return feed_ids
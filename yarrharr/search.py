@@ -0,0 +1,226 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+"""
+Full-text search of articles
+
+Articles are indexed by the ``yarrharr_article_fts`` FTS5 table, which is
+kept in sync with the article table by triggers (see the ``0011`` migration).
+Its columns are the title, author and `~yarrharr.models.Article.content_text`
+of each article.
+
+Results are ranked by BM25, with matches in the title weighted above the
+author and the author above the content. Ranking every match of a common
+word would take time proportional to the size of the database, so matches
+are ranked in windows of `SEARCH_DEPTH` rows of the index, newest first.
+FTS5 yields matches in descending rowid order without sorting them, and
+can start from a given rowid, so a page of results costs no more than one
+window no matter how many articles there are.
+
+The first pages of a search present the best matches of the newest window.
+Once those run out the next page starts on the next window, further back, and
+so on until every match has been seen. The window is taken before the feeds
+searched and the filter are applied, since the index covers the articles of
+every user, so a page may hold few results, or none, while older windows
+remain.
+"""
+
+import binascii
+import math
+import struct
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db import connection
+
+from .enums import ArticleFilter
+from .models import Article
+
+#: Number of results on a page.
+PAGE_SIZE = 100
+
+#: Number of matching rows of the index which are ranked together.
+SEARCH_DEPTH = 10000
+
+#: BM25 weights of the title, author and content columns.
+_WEIGHTS = (10.0, 5.0, 1.0)
+
+_CURSOR = struct.Struct(">Bqdq")
+_CURSOR_VERSION = 2
+
+_WINDOW_SQL = """
+SELECT count(*), min(rowid), max(rowid) FROM (
+    SELECT rowid
+    FROM yarrharr_article_fts
+    WHERE yarrharr_article_fts MATCH %s{below}
+    ORDER BY rowid DESC
+    LIMIT %s
+)
+"""
+
+_SQL = """
+SELECT rank, id FROM (
+    SELECT a.id AS id, m.rank AS rank
+    FROM (
+        SELECT rowid, bm25(yarrharr_article_fts, {weights}) AS rank
+        FROM yarrharr_article_fts
+        WHERE yarrharr_article_fts MATCH %s AND rowid < %s
+        ORDER BY rowid DESC
+        LIMIT %s
+    ) m
+    JOIN yarrharr_article a ON a.id = m.rowid
+    WHERE a.feed_id IN ({feeds}){filter}
+)
+{after}
+ORDER BY rank, id
+LIMIT %s
+"""
+
+_FILTER_SQL = {
+    ArticleFilter.unread: " AND a.read = 0",
+    ArticleFilter.fave: " AND a.fave = 1",
+    ArticleFilter.all: "",
+}
+
+
+def parse_query(query: str) -> str:
+    """
+    Translate a search entered by the user into an FTS5 query.
+
+    Each word in the search must match. A word which ends in ``*`` matches
+    any word with that prefix. Everything else is taken literally: the FTS5
+    query syntax isn't exposed, so no search is a syntax error.
+
+    :raises ValueError: when the search has no words
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"{}"{}'.format(word.replace('"', '""'), "*" if prefix else ""))
+    if not terms:
+        raise ValueError("Empty search")
+    return " ".join(terms)
+
+
+def encode_cursor(below: int, rank: float, id: int) -> str:
+    """
+    Encode a pagination cursor: the exclusive upper bound of the rowids of a
+    window of matches, and the sort key within it of the last result on the
+    page, (rank, id).
+    """
+    raw = _CURSOR.pack(_CURSOR_VERSION, below, rank, id)
+    return urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """
+    Decode a cursor produced by :func:`encode_cursor()`.
+
+    :returns: (:class:`int`, :class:`float`, :class:`int`) tuple
+    :raises ValueError: when the cursor is malformed
+    """
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, below, rank, id = _CURSOR.unpack(raw)
+    except (binascii.Error, struct.error) as e:
+        raise ValueError("Malformed cursor {!r}".format(cursor)) from e
+    if version != _CURSOR_VERSION:
+        raise ValueError("Unknown cursor version {}".format(version))
+    return below, rank, id
+
+
+def search_articles(feeds, query: str, filt: ArticleFilter, after=None, page_size=None):
+    """
+    Get a page of the articles which match a search.
+
+    Pages are fetched by keyset pagination on (rank, id) within a window of
+    matches (see the module docstring). Ranks depend on statistics of the
+    whole index, so they shift a little as articles are added. A page fetched
+    after such a change may repeat or skip a result from the previous page.
+
+    :param feeds: :class:`QuerySet` of the :class:`~yarrharr.models.Feed`
+        objects whose articles are searched
+    :param str query: The search, as entered by the user
+        (see :func:`parse_query()`)
+    :param filt: Which articles to include
+    :param str after: Cursor from a previous call, or `None` to get the first
+        page.
+    :param int page_size: Number of results, `PAGE_SIZE` by default.
+
+    :returns:
+        Two-tuple of a :class:`list` of articles and the cursor for the next
+        page, or `None` when this is the last page.
+    :raises ValueError: when *query* or *after* isn't valid
+    """
+    if page_size is None:
+        page_size = PAGE_SIZE
+    match = parse_query(query)
+    if after is None:
+        below = None
+        key = None
+    else:
+        below, *key = decode_cursor(after)
+
+    with connection.cursor() as cursor:
+        # Find the bounds of the window, and whether there are older matches.
+        cursor.execute(
+            _WINDOW_SQL.format(below="" if below is None else " AND rowid < %s"),
+            [match, SEARCH_DEPTH + 1] if below is None else [match, below, SEARCH_DEPTH + 1],
+        )
+        count, oldest, newest = cursor.fetchone()
+        if count == 0:
+            return [], None
+        if below is None:
+            below = newest + 1
+
+        feeds_sql, feeds_params = feeds.values("id").query.sql_with_params()
+        params = [match, below, SEARCH_DEPTH, *feeds_params]
+        if key is None:
+            after_sql = ""
+        else:
+            after_sql = "WHERE (rank, id) > (%s, %s)"
+            params.extend(key)
+        params.append(page_size + 1)
+        sql = _SQL.format(
+            weights=", ".join(str(w) for w in _WEIGHTS),
+            feeds=feeds_sql,
+            filter=_FILTER_SQL[filt],
+            after=after_sql,
+        )
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    if len(rows) > page_size:
+        rows.pop()
+        after = encode_cursor(below, *rows[-1])
+    elif count > SEARCH_DEPTH:
+        # The oldest row found is the first of the next window.
+        after = encode_cursor(oldest + 1, -math.inf, 0)
+    else:
+        after = None
+    articles = Article.objects.select_related("feed").in_bulk([id for _, id in rows])
+    # An article may have been deleted since the search.
+    return [articles[id] for _, id in rows if id in articles], after
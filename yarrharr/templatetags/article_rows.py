@@ -0,0 +1,83 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+"""
+A template tag that renders the rows of an article list through a cache.
+"""
+
+from django import template
+from django.template import Context
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from ..fragments import FragmentCache
+
+register = template.Library()
+
+#: Limit on the total length of the cached rows, in characters. Rows are
+#: around 1 KiB, so this holds several thousand.
+ROW_CACHE_SIZE = 8 * 1024 * 1024
+
+#: Rendered rows of article lists, keyed by article ID.
+row_cache = FragmentCache(ROW_CACHE_SIZE)
+
+
+def _stamp(article):
+    # Everything article_row.html shows. These are compared on each lookup,
+    # which is much cheaper than rendering.
+    return (
+        article.read,
+        article.url,
+        article.feed.title,
+        article.date,
+        article.author,
+        article.title,
+        article.content_snippet,
+    )
+
+
+@register.simple_tag
+def article_rows(articles):
+    """
+    Render ``article_row.html`` for each of the articles. Rows are cached
+    by `row_cache` until what they show changes, like when the article is
+    marked read, updated by a poll, or re-sanitized.
+
+    :param articles: :class:`~yarrharr.models.Article` instances with
+        their feeds loaded
+    """
+    # Render with the engine's Template and one Context for all the rows,
+    # as the backend's Template.render() makes a new Context each time.
+    row_template = get_template("article_row.html").template
+    context = Context()
+    rows = []
+    for article in articles:
+        stamp = _stamp(article)
+        row = row_cache.get(article.id, stamp)
+        if row is None:
+            with context.push(article=article):
+                row = row_template.render(context)
+            row_cache.put(article.id, stamp, row)
+        rows.append(row)
+    return mark_safe("".join(rows))
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-# Copyright © 2017, 2018, 2019, 2021 Tom Most <twm@freecog.net>
+# Copyright © 2017, 2018, 2019, 2021, 2026 Tom Most <twm@freecog.net>
 #
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -32,6 +32,7 @@ import os
 
 import attr
 from django import template
+from django.conf import settings
 from django.template.defaultfilters import stringfilter
 
 register = template.Library()
@@ -46,6 +47,77 @@ class NoStaticMatch(Exception):
         return "No file matches pattern {!r}".format(self.pattern)
 
 
+class _StaticIndex(object):
+    """
+    Index of the files in a static directory, so that patterns can be
+    matched without touching the filesystem.
+
+    The directory is scanned on first use. After that :meth:`refresh()`
+    scans it again if its mtime has changed, which happens whenever a file
+    is added, removed, or renamed. As the name of each static file
+    incorporates a hash of its content, that covers every change.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._mtime = None
+        self._files = []
+        self._newest = {}
+
+    def refresh(self):
+        """
+        Scan the directory if it has changed since the last scan.
+        """
+        mtime = os.stat(self._path).st_mtime_ns
+        if mtime != self._mtime:
+            self._scan(mtime)
+
+    def _scan(self, mtime):
+        files = []
+        for entry in os.scandir(self._path):
+            if entry.is_file():
+                files.append((entry.name, entry.stat().st_mtime))
+        self._files = files
+        self._newest = {}
+        self._mtime = mtime
+
+    def newest(self, pattern):
+        """
+        Find the newest file matching the pattern.
+
+        :returns: name of the file, or `None` when nothing matches
+        """
+        if self._mtime is None:
+            self.refresh()
+        try:
+            return self._newest[pattern]
+        except KeyError:
+            pass
+
+        name, mtime = None, None
+        for entry_name, entry_mtime in self._files:
+            if not (
+                fnmatch.fnmatchcase(entry_name, pattern)
+                or fnmatch.fnmatchcase(entry_name, pattern + ".gz")
+                or fnmatch.fnmatchcase(entry_name, pattern + ".br")
+            ):
+                continue
+
+            if mtime is None or entry_mtime > mtime:
+                if entry_name.endswith((".br", ".gz")):
+                    name = entry_name[:-3]
+                else:
+                    name = entry_name
+                mtime = entry_mtime
+
+        if name is not None:
+            self._newest[pattern] = name
+        return name
+
+
+_index = _StaticIndex(_static_dir)
+
+
 @register.filter
 @stringfilter
 def newest_static(pattern):
@@ -65,34 +137,19 @@ def newest_static(pattern):
     are stripped in the return value, as `yarrharr.application.Static` does not
     permit them.
 
+    The directory is only scanned once, so in production the server must be
+    restarted to pick up new files. In `DEBUG` mode it is scanned again
+    whenever its mtime changes.
+
     :param str pattern: fnmatch (glob) pattern -- see :mod:`fnmatch`
     :returns: name of the file with the greatest modification time in the directory
     :raises: :exc:`NoStaticMatch` when no file matching the pattern exists
     """
-    # TODO The result of this should be cached when not in DEBUG mode.
     assert "/" not in pattern  # don't support subdirectories
 
-    name, mtime = None, None
-    for entry in os.scandir(_static_dir):
-        if not entry.is_file():
-            continue
-
-        if not (
-            fnmatch.fnmatchcase(entry.name, pattern)
-            or fnmatch.fnmatchcase(entry.name, pattern + ".gz")
-            or fnmatch.fnmatchcase(entry.name, pattern + ".br")
-        ):
-            continue
-
-        s = entry.stat()
-        if mtime is None or s.st_mtime > mtime:
-            if entry.name.endswith((".br", ".gz")):
-                name = entry.name[:-3]
-            else:
-                name = entry.name
-            mtime = s.st_mtime
-
+    if settings.DEBUG:
+        _index.refresh()
+    name = _index.newest(pattern)
     if name is None:
         raise NoStaticMatch(pattern)
-
     return name
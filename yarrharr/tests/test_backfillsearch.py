@@ -0,0 +1,147 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ..enums import ArticleFilter
+from ..models import Article
+from ..sanitize import html_to_text
+from ..search import search_articles
+
+
+class BackfillSearchTests(TestCase):
+    """
+    Test the ``backfillsearch`` management command.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", email="user@mailhost.example", password="sesame")
+        self.feed = self.user.feed_set.create(url="https://feed.example/", added=timezone.now(), feed_title="Feed")
+
+    def add(self, i):
+        """
+        Add an article which predates full-text search.
+        """
+        return self.feed.articles.create(
+            read=False,
+            fave=False,
+            author="",
+            url="https://feed.example/{}".format(i),
+            date=timezone.now(),
+            raw_title="",
+            raw_content="",
+            title="Article {}".format(i),
+            content="<p>Word{}".format(i),
+            content_text="",
+        )
+
+    def backfillsearch(self, *args):
+        stdout = StringIO()
+        call_command("backfillsearch", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def search(self, query):
+        articles, _ = search_articles(self.user.feed_set.all(), query, ArticleFilter.all)
+        return [article.pk for article in articles]
+
+    def test_ranges(self):
+        """
+        The text of every article is filled in and indexed when the primary
+        keys have gaps that leave some batches empty.
+        """
+        articles = [self.add(i) for i in range(12)]
+        for article in articles[3:8]:
+            article.delete()
+        articles = articles[:3] + articles[8:]
+        self.assertEqual([], self.search("word0"))
+
+        output = self.backfillsearch("--jobs", "1", "--batch-size", "2")
+
+        for article in articles:
+            article.refresh_from_db()
+            self.assertEqual(html_to_text(article.content), article.content_text)
+            self.assertEqual([article.pk], self.search(article.content_text))
+        self.assertIn("Finished: indexed the text of 7 articles", output)
+
+    def test_pool(self):
+        """
+        Extracting text in a pool of worker processes gives the same result.
+        """
+        articles = [self.add(i) for i in range(5)]
+
+        output = self.backfillsearch("--jobs", "2", "--batch-size", "2")
+
+        for article in articles:
+            article.refresh_from_db()
+            self.assertEqual(html_to_text(article.content), article.content_text)
+        self.assertIn("Finished: indexed the text of 5 articles", output)
+
+    def test_rebuild(self):
+        """
+        ``--rebuild`` rebuilds the index from the article table.
+        """
+        article = self.add(0)
+
+        output = self.backfillsearch("--jobs", "1", "--rebuild")
+
+        self.assertIn("Rebuilt the search index", output)
+        self.assertEqual([article.pk], self.search("word0"))
+
+    def test_updated_meanwhile(self):
+        """
+        An article which the poller updates after it was read isn't
+        overwritten with the text of its old content.
+        """
+        article = self.add(0)
+
+        def to_text(html):
+            # The poller gets in between the read and the write.
+            fresh = Article.objects.get(pk=article.pk)
+            fresh.set_content("New", "<p>Fresh")
+            fresh.save()
+            return html_to_text(html)
+
+        with mock.patch("yarrharr.management.commands.backfillsearch.html_to_text", to_text):
+            self.backfillsearch("--jobs", "1")
+
+        article.refresh_from_db()
+        self.assertEqual("Fresh", article.content_text)
+        self.assertEqual([article.pk], self.search("fresh"))
+        self.assertEqual([], self.search("word0"))
+
+    def test_invalid(self):
+        """
+        ``--jobs`` and ``--batch-size`` must be positive.
+        """
+        for args in [("--jobs", "0"), ("--batch-size", "0"), ("--batch-size", "-1")]:
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                self.backfillsearch(*args)
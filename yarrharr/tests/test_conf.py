@@ -94,11 +94,27 @@ class ConfTests(unittest.TestCase):
                         "PASSWORD": "",
                         "HOST": "",
                         "PORT": "",
+                        "CONN_MAX_AGE": 600,
                     },
                 },
                 "DEFAULT_AUTO_FIELD": "django.db.models.AutoField",
+                "SQLITE_PRAGMAS": {
+                    "synchronous": "normal",
+                    "temp_store": "memory",
+                    "cache_size": -16000,
+                    "mmap_size": 268435456,
+                    "busy_timeout": 5000,
+                },
                 "ALLOWED_HOSTS": ["127.0.0.1"],
                 "SERVER_ENDPOINT": "tcp:8888:interface=127.0.0.1",
+                "POLL_MAX_FETCH": 50,
+                "POLL_CONCURRENCY": 10,
+                "POLL_PER_HOST": 2,
+                "POLL_HOST_SPACING": 1.0,
+                "POLL_SANITIZE_WORKERS": 2,
+                "POLL_MAX_SIZE": 67108864,
+                "POLL_RATE": 0.0,
+                "POLL_JITTER": 0.1,
                 "ROOT_URLCONF": "yarrharr.urls",
                 "LOGIN_URL": "login",
                 "LOGIN_REDIRECT_URL": "home",
@@ -107,6 +123,7 @@ class ConfTests(unittest.TestCase):
                 "USE_I18N": True,
                 "USE_TZ": True,
                 "USE_X_FORWARDED_HOST": False,
+                "RESANITIZE_ON_READ": False,
                 "TIME_ZONE": "UTC",
                 "STATIC_ROOT": "/var/lib/yarrharr/static/",
                 "STATIC_URL": "/static/",
@@ -172,12 +189,28 @@ class ConfTests(unittest.TestCase):
                         "PASSWORD": "",
                         "HOST": "",
                         "PORT": "",
+                        "CONN_MAX_AGE": 600,
                     },
                 },
                 "DEFAULT_AUTO_FIELD": "django.db.models.AutoField",
+                "SQLITE_PRAGMAS": {
+                    "synchronous": "normal",
+                    "temp_store": "memory",
+                    "cache_size": -16000,
+                    "mmap_size": 268435456,
+                    "busy_timeout": 5000,
+                },
                 "ALLOWED_HOSTS": ["127.0.0.1"],
                 "INTERNAL_IPS": ["127.0.0.1"],
                 "SERVER_ENDPOINT": "tcp:8888:interface=127.0.0.1",
+                "POLL_MAX_FETCH": 50,
+                "POLL_CONCURRENCY": 10,
+                "POLL_PER_HOST": 2,
+                "POLL_HOST_SPACING": 1.0,
+                "POLL_SANITIZE_WORKERS": 2,
+                "POLL_MAX_SIZE": 67108864,
+                "POLL_RATE": 0.0,
+                "POLL_JITTER": 0.1,
                 "ROOT_URLCONF": "yarrharr.urls",
                 "LOGIN_URL": "login",
                 "LOGIN_REDIRECT_URL": "home",
@@ -186,6 +219,7 @@ class ConfTests(unittest.TestCase):
                 "USE_I18N": True,
                 "USE_TZ": True,
                 "USE_X_FORWARDED_HOST": False,
+                "RESANITIZE_ON_READ": False,
                 "TIME_ZONE": "UTC",
                 "STATIC_ROOT": "yarrharr/static/",
                 "STATIC_URL": "/static/",
@@ -280,3 +314,57 @@ class ConfTests(unittest.TestCase):
                 read_yarrharr_conf([f.name], settings)
 
         self.assertEqual(str(c.exception), "external_url must not include path: remove '/foo/bar'")
+
+    def test_read_db_tuning(self):
+        """
+        The ``[db]`` tuning options set ``CONN_MAX_AGE`` and the SQLite
+        pragmas.
+        """
+        with NamedTemporaryFile() as f:
+            f.write(
+                b"[db]\n"
+                b"conn_max_age = 0\n"
+                b"synchronous = FULL\n"
+                b"cache_size = 2000\n"
+                b"mmap_size = 0\n"
+                b"temp_store = file\n"
+                b"busy_timeout = 100\n"
+                b"[secrets]\n"
+                b"secret_key = sarlona\n",
+            )
+            f.flush()
+
+            settings = {}
+            read_yarrharr_conf([f.name], settings)
+
+        self.assertEqual(0, settings["DATABASES"]["default"]["CONN_MAX_AGE"])
+        self.assertEqual(
+            {
+                "synchronous": "full",
+                "temp_store": "file",
+                "cache_size": 2000,
+                "mmap_size": 0,
+                "busy_timeout": 100,
+            },
+            settings["SQLITE_PRAGMAS"],
+        )
+
+    def test_read_db_tuning_invalid(self):
+        """
+        Invalid ``[db]`` tuning options are rejected.
+        """
+        for option, message in [
+            (b"synchronous = sometimes", "db synchronous must be one of extra, full, normal, off, not 'sometimes'"),
+            (b"temp_store = ram", "db temp_store must be one of default, file, memory, not 'ram'"),
+            (b"mmap_size = -1", "db mmap_size must not be negative, not -1"),
+            (b"busy_timeout = -1", "db busy_timeout must not be negative, not -1"),
+            (b"conn_max_age = -1", "db conn_max_age must not be negative, not -1"),
+        ]:
+            with self.subTest(option=option), NamedTemporaryFile() as f:
+                f.write(b"[db]\n" + option + b"\n[secrets]\nsecret_key = sarlona\n")
+                f.flush()
+
+                with self.assertRaises(ValueError) as c:
+                    read_yarrharr_conf([f.name], {})
+
+                self.assertEqual(message, str(c.exception))
@@ -23,29 +23,59 @@
 # such a combination shall include the source code for the parts of
 # OpenSSL used as well as that of the covered work.
 
+import gzip
 import hashlib
+from concurrent.futures import Future
 from datetime import datetime, timedelta
 from datetime import timezone as tz
 from importlib import resources
-from unittest import mock
+from unittest import mock, skipIf
 
 import attr
 from attr.validators import instance_of
 from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
 from django.test import TestCase as DjangoTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from treq.client import HTTPClient
 from treq.testing import RequestTraversalAgent, StubTreq
 from twisted.internet import defer, error, task
 from twisted.python.failure import Failure
 from twisted.trial.unittest import SynchronousTestCase
 from twisted.web import http, server
 from twisted.web.client import ResponseNeverReceived, readBody
+from twisted.web.http_headers import Headers
 from twisted.web.pages import errorPage
 from twisted.web.resource import IResource
 from zope.interface import implementer
 
-from ..fetch import ArticleUpsert, BadStatus, BozoError, EmptyBody, Gone, MaybeUpdated, NetworkError, Unchanged, poll_feed
-from ..models import Feed
+from ..fetch import (
+    ArticleUpsert,
+    BadStatus,
+    BozoError,
+    EmptyBody,
+    Fetcher,
+    FetchStats,
+    Gone,
+    MaybeUpdated,
+    NetworkError,
+    PollError,
+    Throttled,
+    TooLarge,
+    Unchanged,
+    _BoundedGzipProtocol,
+    _CountingConnectionPool,
+    _DecoderAgent,
+    brotli,
+    extract_max_age,
+    extract_retry_after,
+    persist_outcomes,
+    poll_feed,
+)
+from ..models import Article, Feed
+from ..sanitize import SanitizedArticle, sanitize_article
 
 EMPTY_RSS = resources.read_binary("yarrharr.examples", "empty.rss")
 SOME_HTML = resources.read_binary("yarrharr.examples", "nofeed.html")
@@ -74,10 +104,15 @@ class StaticResource:
 
     content = attr.ib()
     content_type = attr.ib(default=b"application/xml")
+    code = attr.ib(default=200)
+    headers = attr.ib(factory=dict)
 
     isLeaf = True
 
     def render(self, request):
+        request.setResponseCode(self.code)
+        for name, values in self.headers.items():
+            request.responseHeaders.setRawHeaders(name, values)
         if self.content_type is None:
             request.defaultContentType = None
             ct = []
@@ -87,6 +122,18 @@ class StaticResource:
         return self.content
 
 
+@attr.s
+class GzipResource(StaticResource):
+    """
+    `GzipResource` serves pre-compressed content with
+    ``Content-Encoding: gzip``.
+    """
+
+    def render(self, request):
+        request.responseHeaders.setRawHeaders(b"Content-Encoding", [b"gzip"])
+        return super().render(request)
+
+
 class StaticResourceTests(SynchronousTestCase):
     def test_content(self):
         client = StubTreq(StaticResource(content=b"abcd"))
@@ -196,11 +243,14 @@ class StaticEtagResource(object):
     content = attr.ib()
     etag = attr.ib()
     content_type = attr.ib(default="application/xml")
+    headers = attr.ib(factory=dict)
 
     isLeaf = True
 
     def render(self, request):
         request.responseHeaders.setRawHeaders(b"Content-Type", [self.content_type])
+        for name, values in self.headers.items():
+            request.responseHeaders.setRawHeaders(name, values)
         if request.setETag(self.etag) == http.CACHED:
             return b""
         return self.content
@@ -299,6 +349,292 @@ class ErrorTreq(object):
         return defer.fail(Failure(self._error))
 
 
+@attr.s
+class PendingTreq(object):
+    """
+    A treq-alike mock which only supports GET requests. Each call to
+    :meth:`.get()` returns an unfired Deferred, which is recorded along with
+    the URL in the `requests` list.
+    """
+
+    requests = attr.ib(factory=list)
+
+    def get(self, url, *a, **kw):
+        d = defer.Deferred()
+        self.requests.append((url, d))
+        return d
+
+
+class SynchronousExecutor(object):
+    """
+    An `Executor` which runs each call immediately.
+
+    :ivar calls: List of (function, args) submitted.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class ThreadClock(task.Clock):
+    """
+    A `Clock` which also provides ``IReactorThreads.callFromThread``. It
+    makes the call immediately, as it is only called from the test's thread.
+    """
+
+    def callFromThread(self, f, *args, **kwargs):
+        f(*args, **kwargs)
+
+
+class FetcherTests(SynchronousTestCase):
+    """
+    Test `yarrharr.fetch.Fetcher`.
+    """
+
+    def setUp(self):
+        self.clock = task.Clock()
+
+    def test_concurrency_limit(self):
+        """
+        No more than *concurrency* fetches are in flight at once. Another
+        fetch starts as soon as one completes.
+        """
+        feeds = [FetchFeed(url="http://{}.example/".format(i)) for i in range(3)]
+        client = PendingTreq()
+
+        d = Fetcher(self.clock, 2, 2, 1.0, client).poll_feeds(feeds)
+
+        self.assertEqual(["http://0.example/", "http://1.example/"], [url for url, _ in client.requests])
+        client.requests[1][1].errback(error.ConnectionRefusedError())
+        self.assertEqual(3, len(client.requests))
+        self.assertNoResult(d)
+
+        client.requests[0][1].errback(error.ConnectionRefusedError())
+        client.requests[2][1].errback(error.ConnectionRefusedError())
+        outcomes = self.successResultOf(d)
+
+        self.assertEqual(feeds, [feed for feed, _ in outcomes])
+        self.assertEqual(
+            [NetworkError("Connection was refused by other side.")] * 3,
+            [outcome for _, outcome in outcomes],
+        )
+
+    def test_slow_feed(self):
+        """
+        A feed which is slow to respond doesn't hold up the others.
+        """
+        feeds = [
+            FetchFeed(url="http://slow.example/feed.xml"),
+            FetchFeed(url="http://an.example/1"),
+            FetchFeed(url="http://an.example/2"),
+        ]
+        stub = StubTreq(StaticResource(EMPTY_RSS))
+        client = PendingTreq()
+        client.get = mock.Mock(side_effect=lambda url, **kw: PendingTreq.get(client, url) if "slow" in url else stub.get(url, **kw))
+
+        d = Fetcher(self.clock, 2, 2, 0.0, client).poll_feeds(feeds)
+        self.assertEqual(3, client.get.call_count)
+        self.clock.advance(30 + 1)
+        outcomes = self.successResultOf(d)
+
+        self.assertEqual(NetworkError("Request timed out after 30 seconds"), outcomes[0][1])
+        self.assertIsInstance(outcomes[1][1], MaybeUpdated)
+        self.assertIsInstance(outcomes[2][1], MaybeUpdated)
+
+    def test_unexpected_error(self):
+        """
+        An unexpected exception while polling a feed produces a `PollError`
+        outcome for that feed alone.
+        """
+        feeds = [FetchFeed(url="http://an.example/1"), FetchFeed(url="http://an.example/2")]
+        client = ErrorTreq(ZeroDivisionError())
+
+        outcomes = self.successResultOf(Fetcher(self.clock, 5, 2, 0.0, client).poll_feeds(feeds))
+
+        self.assertEqual(feeds, [feed for feed, _ in outcomes])
+        for _, outcome in outcomes:
+            self.assertIsInstance(outcome, PollError)
+            outcome.failure.trap(ZeroDivisionError)
+        self.assertEqual(2, len(self.flushLoggedErrors(ZeroDivisionError)))
+
+    def test_per_host_limit(self):
+        """
+        No more than *per_host* fetches to the same host are in flight at once,
+        and they don't occupy global slots while they wait, so other hosts
+        proceed.
+        """
+        feeds = [
+            FetchFeed(url="https://same.example/1"),
+            FetchFeed(url="https://same.example/2"),
+            FetchFeed(url="https://same.example/3"),
+            FetchFeed(url="https://other.example/"),
+        ]
+        client = PendingTreq()
+
+        d = Fetcher(self.clock, 3, 2, 0.0, client).poll_feeds(feeds)
+
+        self.assertEqual(
+            ["https://same.example/1", "https://same.example/2", "https://other.example/"],
+            [url for url, _ in client.requests],
+        )
+        client.requests[0][1].errback(error.ConnectionRefusedError())
+        self.assertEqual("https://same.example/3", client.requests[3][0])
+        for _, rd in client.requests[1:]:
+            rd.errback(error.ConnectionRefusedError())
+        self.assertEqual(feeds, [feed for feed, _ in self.successResultOf(d)])
+
+    def test_host_spacing(self):
+        """
+        Fetches from the same host start at least *host_spacing* seconds
+        apart, while other hosts aren't delayed.
+        """
+        feeds = [
+            FetchFeed(url="https://same.example/1"),
+            FetchFeed(url="https://same.example/2"),
+            FetchFeed(url="https://other.example/"),
+        ]
+        client = PendingTreq()
+
+        Fetcher(self.clock, 5, 2, 3.0, client).poll_feeds(feeds)
+
+        self.assertEqual(["https://same.example/1", "https://other.example/"], [url for url, _ in client.requests])
+        self.clock.advance(2.9)
+        self.assertEqual(2, len(client.requests))
+        self.clock.advance(0.1)
+        self.assertEqual("https://same.example/2", client.requests[2][0])
+
+    def test_close_no_pool(self):
+        """
+        There is nothing to close when a treq is supplied.
+        """
+        fetcher = Fetcher(self.clock, 1, 1, 0.0, PendingTreq())
+        self.assertIs(None, fetcher.pool)
+        self.assertIs(None, self.successResultOf(fetcher.close()))
+
+    def test_sanitize_executor(self):
+        """
+        When an executor is given the articles of a `MaybeUpdated` outcome are
+        sanitized there.
+        """
+        xml = resources.read_binary("yarrharr.examples", "html-script.rss")
+        executor = SynchronousExecutor()
+        fetcher = Fetcher(ThreadClock(), 1, 1, 0.0, StubTreq(StaticResource(xml)), executor)
+
+        [(_, outcome)] = self.successResultOf(fetcher.poll_feeds([FetchFeed()]))
+
+        [upsert] = outcome.articles
+        self.assertEqual([(sanitize_article, (upsert.raw_title, upsert.raw_content))], executor.calls)
+        self.assertEqual(sanitize_article(upsert.raw_title, upsert.raw_content), upsert.sanitized)
+        self.assertEqual("I have <script>", upsert.sanitized.title)
+        self.assertNotIn("<script>", upsert.sanitized.content)
+
+    def test_sanitize_error(self):
+        """
+        An exception raised by sanitization produces a `PollError` outcome.
+        """
+        xml = resources.read_binary("yarrharr.examples", "html-script.rss")
+        executor = SynchronousExecutor()
+        fetcher = Fetcher(ThreadClock(), 1, 1, 0.0, StubTreq(StaticResource(xml)), executor)
+
+        with mock.patch("yarrharr.fetch.sanitize_article", side_effect=ZeroDivisionError()):
+            [(_, outcome)] = self.successResultOf(fetcher.poll_feeds([FetchFeed()]))
+
+        self.assertIsInstance(outcome, PollError)
+        outcome.failure.trap(ZeroDivisionError)
+        self.assertEqual(1, len(self.flushLoggedErrors(ZeroDivisionError)))
+
+    def test_sanitize_known(self):
+        """
+        Entries which the *known* callable reports match existing articles
+        aren't sanitized.
+        """
+        xml = resources.read_binary("yarrharr.examples", "html-script.rss")
+        executor = SynchronousExecutor()
+        calls = []
+
+        def known(feed, fingerprints):
+            calls.append((feed, fingerprints))
+            return defer.succeed(set(fingerprints))
+
+        feed = FetchFeed()
+        fetcher = Fetcher(ThreadClock(), 1, 1, 0.0, StubTreq(StaticResource(xml)), executor, known=known)
+
+        [(_, outcome)] = self.successResultOf(fetcher.poll_feeds([feed]))
+
+        [upsert] = outcome.articles
+        self.assertEqual([(feed, [upsert.fingerprint])], calls)
+        self.assertEqual([], executor.calls)
+        self.assertIs(None, upsert.sanitized)
+
+
+class BoundedGzipProtocolTests(SynchronousTestCase):
+    """
+    Test `yarrharr.fetch._BoundedGzipProtocol`.
+    """
+
+    def test_bomb(self):
+        """
+        Data is decompressed in pieces no larger than *chunk_size*.
+        """
+        data = b"\0" * (1024 * 1024)
+        received = []
+        protocol = _BoundedGzipProtocol(mock.Mock(dataReceived=received.append), None)
+
+        protocol.dataReceived(gzip.compress(data))
+
+        self.assertEqual(data, b"".join(received))
+        self.assertEqual(16, len(received))
+        self.assertEqual({_BoundedGzipProtocol.chunk_size}, {len(piece) for piece in received})
+
+
+@attr.s(eq=False)
+class FakeConnection(object):
+    """
+    Just enough of `HTTP11ClientProtocol` to sit in a connection pool.
+    """
+
+    state = attr.ib(default="QUIESCENT")
+    transport = attr.ib(default=None)
+
+
+class CountingConnectionPoolTests(SynchronousTestCase):
+    """
+    Test `yarrharr.fetch._CountingConnectionPool`.
+    """
+
+    def test_count(self):
+        """
+        Each request for a connection is counted as either a new connection
+        or reuse of a cached one.
+        """
+        key = ("https", b"an.example", 443)
+        endpoint = mock.Mock()
+        endpoint.connect.return_value = defer.Deferred()
+        pool = _CountingConnectionPool(task.Clock())
+
+        pool.getConnection(key, endpoint)
+        pool._putConnection(key, FakeConnection())
+        connection = self.successResultOf(pool.getConnection(key, endpoint))
+        pool.getConnection(key, endpoint)
+
+        self.assertEqual("QUIESCENT", connection._clientProtocol.state)
+        self.assertEqual(2, endpoint.connect.call_count)
+        self.assertEqual(2, pool.opened)
+        self.assertEqual(1, pool.reused)
+
+
 class FetchTests(SynchronousTestCase):
     """
     Test `yarrharr.fetch.poll_feed()`.
@@ -514,6 +850,53 @@ class FetchTests(SynchronousTestCase):
 
         self.assertEqual(BadStatus(404), result)
 
+    def test_429_retry_after(self):
+        """
+        A 429 HTTP status code translates to a Throttled result which carries
+        the delay given by the ``Retry-After`` header.
+        """
+        feed = FetchFeed()
+        client = StubTreq(StaticResource(b"", code=429, headers={b"Retry-After": [b"120"]}))
+
+        result = self.successResultOf(poll_feed(feed, self.clock, client))
+
+        self.assertEqual(Throttled(429, timedelta(seconds=120)), result)
+
+    def test_503_unavailable(self):
+        """
+        A 503 HTTP status code also translates to a Throttled result, even
+        without a ``Retry-After`` header.
+        """
+        feed = FetchFeed()
+        client = StubTreq(StaticResource(b"", code=503))
+
+        result = self.successResultOf(poll_feed(feed, self.clock, client))
+
+        self.assertEqual(Throttled(503, None), result)
+
+    def test_max_age(self):
+        """
+        The freshness lifetime of a successful response is part of the
+        result.
+        """
+        feed = FetchFeed()
+        client = StubTreq(StaticResource(EMPTY_RSS, headers={b"Cache-Control": [b"public, max-age=3600"]}))
+
+        result = self.successResultOf(poll_feed(feed, self.clock, client))
+
+        self.assertEqual(timedelta(hours=1), result.max_age)
+
+    def test_etag_304_max_age(self):
+        """
+        A 304 Not Modified response may refresh the freshness lifetime.
+        """
+        feed = FetchFeed(etag=b'"abcd"')
+        client = StubTreq(StaticEtagResource(EMPTY_RSS, b'"abcd"', headers={b"Cache-Control": [b"max-age=600"]}))
+
+        result = self.successResultOf(poll_feed(feed, self.clock, client))
+
+        self.assertEqual(Unchanged("etag", timedelta(minutes=10)), result)
+
     def test_content_unchanged(self):
         """
         If the bytes of the response don't change, the feed is considered Unchanged.
@@ -637,6 +1020,92 @@ class FetchTests(SynchronousTestCase):
 
         self.assertEqual(EmptyBody(code=200, content_type=""), outcome)
 
+    def test_max_size(self):
+        """
+        Reading a body larger than *max_size* is abandoned with a `TooLarge`
+        outcome. A body of exactly *max_size* bytes is fine.
+        """
+        client = StubTreq(StaticResource(EMPTY_RSS))
+
+        too_large = self.successResultOf(poll_feed(FetchFeed(), self.clock, client, max_size=len(EMPTY_RSS) - 1))
+        ok = self.successResultOf(poll_feed(FetchFeed(), self.clock, client, max_size=len(EMPTY_RSS)))
+
+        self.assertEqual(TooLarge(len(EMPTY_RSS) - 1), too_large)
+        self.assertIsInstance(ok, MaybeUpdated)
+        self.assertEqual(hashlib.sha256(EMPTY_RSS).digest(), ok.digest)
+
+    def test_gzip(self):
+        """
+        A gzip-encoded body is decoded by the `Fetcher`'s agent, and its
+        decoded size is subject to *max_size*.
+        """
+        gz = gzip.compress(EMPTY_RSS)
+        agent = _DecoderAgent(RequestTraversalAgent(GzipResource(gz)))
+        client = HTTPClient(agent)
+
+        outcome = self.successResultOf(poll_feed(FetchFeed(), self.clock, client))
+        too_large = self.successResultOf(poll_feed(FetchFeed(), self.clock, client, max_size=len(gz)))
+
+        self.assertEqual(hashlib.sha256(EMPTY_RSS).digest(), outcome.digest)
+        self.assertEqual(FetchStats(wire_bytes=len(gz), body_bytes=len(EMPTY_RSS), ttfb=0.0), outcome.stats)
+        self.assertEqual(TooLarge(len(gz)), too_large)
+
+    def test_accept_encoding(self):
+        """
+        The `Fetcher`'s agent declares the encodings it can decode.
+        """
+        resource = StaticResource(EMPTY_RSS)
+        client = HTTPClient(_DecoderAgent(RequestTraversalAgent(resource)))
+        requests = []
+        resource.render = lambda request: requests.append(request) or EMPTY_RSS
+
+        self.successResultOf(poll_feed(FetchFeed(), self.clock, client))
+
+        [request] = requests
+        encodings = b",".join(request.requestHeaders.getRawHeaders(b"accept-encoding"))
+        expected = {b"gzip", b"br"} if brotli else {b"gzip"}
+        self.assertEqual(expected, {e.strip() for e in encodings.split(b",")})
+
+    @skipIf(brotli is None, "brotli is not installed")
+    def test_brotli(self):
+        """
+        A brotli-encoded body is decoded when the optional :mod:`brotli`
+        module is installed.
+        """
+        br = brotli.compress(EMPTY_RSS)
+        resource = StaticResource(br, headers={b"Content-Encoding": [b"br"]})
+        client = HTTPClient(_DecoderAgent(RequestTraversalAgent(resource)))
+
+        outcome = self.successResultOf(poll_feed(FetchFeed(), self.clock, client))
+
+        self.assertEqual(hashlib.sha256(EMPTY_RSS).digest(), outcome.digest)
+        self.assertEqual(FetchStats(wire_bytes=len(br), body_bytes=len(EMPTY_RSS), ttfb=0.0), outcome.stats)
+
+    @skipIf(brotli is None, "brotli is not installed")
+    def test_brotli_truncated(self):
+        """
+        A brotli stream which ends early is an error, not a short body.
+        """
+        br = brotli.compress(EMPTY_RSS)
+        resource = StaticResource(br[: len(br) // 2], headers={b"Content-Encoding": [b"br"]})
+        client = HTTPClient(_DecoderAgent(RequestTraversalAgent(resource)))
+
+        outcome = self.successResultOf(poll_feed(FetchFeed(), self.clock, client))
+
+        self.assertEqual(NetworkError("Truncated brotli stream"), outcome)
+
+    def test_stats_network_error(self):
+        """
+        A fetch which fails to get a response records no bytes and no time to
+        first byte.
+        """
+        client = StubTreq(BlackHoleResource())
+
+        d = poll_feed(FetchFeed(), self.clock, client)
+        self.clock.advance(30 + 1)
+
+        self.assertEqual(FetchStats(0, 0, None), self.successResultOf(d).stats)
+
     def test_updated_only(self):
         """
         An Atom feed which only has entry dates from ``<updated>`` tags is
@@ -659,6 +1128,148 @@ class FetchTests(SynchronousTestCase):
         )
 
 
+class ExtractHintTests(SynchronousTestCase):
+    """
+    Test `extract_max_age()` and `extract_retry_after()`
+    """
+
+    #: Tue, 07 Feb 2017 10:25:00 GMT
+    now = 1486463100.0
+
+    def test_max_age(self):
+        headers = Headers({b"Cache-Control": [b"public, max-age=600"], b"Age": [b"100"]})
+        self.assertEqual(timedelta(seconds=500), extract_max_age(headers, self.now))
+
+    def test_max_age_precedence(self):
+        """
+        ``max-age`` takes precedence over ``Expires``.
+        """
+        headers = Headers(
+            {
+                b"Cache-Control": [b"max-age=60"],
+                b"Date": [b"Tue, 07 Feb 2017 10:25:00 GMT"],
+                b"Expires": [b"Tue, 07 Feb 2017 11:25:00 GMT"],
+            }
+        )
+        self.assertEqual(timedelta(seconds=60), extract_max_age(headers, self.now))
+
+    def test_expires(self):
+        """
+        ``Expires`` is relative to the ``Date`` of the response, or the
+        current time if there is none.
+        """
+        headers = Headers(
+            {
+                b"Date": [b"Tue, 07 Feb 2017 10:00:00 GMT"],
+                b"Expires": [b"Tue, 07 Feb 2017 11:00:00 GMT"],
+            }
+        )
+        self.assertEqual(timedelta(hours=1), extract_max_age(headers, self.now))
+        headers.removeHeader(b"date")
+        self.assertEqual(timedelta(minutes=35), extract_max_age(headers, self.now))
+
+    def test_expired(self):
+        for expires in [b"0", b"-1", b"Tue, 07 Feb 2017 10:00:00 GMT"]:
+            headers = Headers({b"Expires": [expires]})
+            self.assertIs(None, extract_max_age(headers, self.now), expires)
+
+    def test_no_cache(self):
+        for cc in [b"no-cache", b"max-age=600, no-store", b"max-age=0", b"max-age=bogus"]:
+            headers = Headers({b"Cache-Control": [cc]})
+            self.assertIs(None, extract_max_age(headers, self.now), cc)
+
+    def test_max_age_limit(self):
+        """
+        Freshness lifetimes are cut to the longest interval the scheduler
+        would pick, as CDNs send long lifetimes for content which changes.
+        """
+        for headers in [
+            Headers({b"Cache-Control": [b"max-age=31536000"]}),
+            Headers({b"Expires": [b"Wed, 07 Feb 2018 10:25:00 GMT"], b"Date": [b"Tue, 07 Feb 2017 10:25:00 GMT"]}),
+        ]:
+            self.assertEqual(timedelta(days=1), extract_max_age(headers, self.now))
+
+    def test_retry_after_seconds(self):
+        headers = Headers({b"Retry-After": [b"3600"]})
+        self.assertEqual(timedelta(hours=1), extract_retry_after(headers, self.now))
+
+    def test_retry_after_date(self):
+        headers = Headers({b"Retry-After": [b"Tue, 07 Feb 2017 12:25:00 GMT"]})
+        self.assertEqual(timedelta(hours=2), extract_retry_after(headers, self.now))
+
+    def test_retry_after_limit(self):
+        """
+        Retry-After may ask for more than a day, up to a week.
+        """
+        headers = Headers({b"Retry-After": [b"259200"]})
+        self.assertEqual(timedelta(days=3), extract_retry_after(headers, self.now))
+        headers = Headers({b"Retry-After": [b"31536000"]})
+        self.assertEqual(timedelta(days=7), extract_retry_after(headers, self.now))
+
+    def test_retry_after_invalid(self):
+        for value in [b"", b"soon", b"-5", b"Tue, 07 Feb 2017 10:00:00 GMT"]:
+            headers = Headers({b"Retry-After": [value]})
+            self.assertIs(None, extract_retry_after(headers, self.now), value)
+        self.assertIs(None, extract_retry_after(Headers(), self.now))
+
+
+class ThrottledTests(DjangoTestCase):
+    """
+    Test `Throttled.persist()`
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user",
+            email="someone@example.net",
+            password="sesame",
+        )
+        self.now = timezone.now()
+        self.feed = Feed.objects.create(
+            user=self.user,
+            url="https://example.com/feed",
+            added=self.now,
+            next_check=self.now,
+            last_checked=self.now - timedelta(hours=4),
+            feed_title="Feed",
+        )
+
+    def test_retry_after(self):
+        """
+        The next check waits out the ``Retry-After`` delay.
+        """
+        Throttled(429, timedelta(days=3)).persist(self.feed)
+
+        self.feed.refresh_from_db()
+        self.assertEqual("Fetch throttled: HTTP status 429", self.feed.error)
+        self.assertEqual(self.feed.last_checked + timedelta(days=3), self.feed.not_before)
+        self.assertEqual(self.feed.not_before, self.feed.next_check)
+
+    def test_backoff(self):
+        """
+        Without ``Retry-After`` the interval since the last check is doubled.
+        """
+        self.feed.last_checked = self.now - timedelta(days=1)
+
+        Throttled(503).persist(self.feed)
+
+        self.assertEqual("Fetch throttled: HTTP status 503", self.feed.error)
+        self.assertAlmostEqual(timedelta(days=2), self.feed.not_before - self.now, delta=timedelta(minutes=1))
+        self.assertEqual(self.feed.not_before, self.feed.next_check)
+
+    def test_backoff_limit(self):
+        """
+        The back-off is at least an hour and at most two days.
+        """
+        self.feed.last_checked = self.now - timedelta(days=3)
+        Throttled(429).persist(self.feed)
+        self.assertAlmostEqual(timedelta(days=2), self.feed.not_before - self.now, delta=timedelta(minutes=1))
+
+        self.feed.last_checked = self.now
+        Throttled(429).persist(self.feed)
+        self.assertAlmostEqual(timedelta(hours=1), self.feed.not_before - self.now, delta=timedelta(minutes=1))
+
+
 class MaybeUpdatedTests(DjangoTestCase):
     """
     `fetch()` returns `MaybeUpdated` when it successfully retrieves a feed. Its
@@ -756,6 +1367,42 @@ class MaybeUpdatedTests(DjangoTestCase):
             content="<p>Hello, world!",
         )
 
+    def test_persist_sanitized(self):
+        """
+        Content already sanitized by the fetcher is written as-is.
+        """
+        mu = MaybeUpdated(
+            feed_title="Example",
+            site_url="https://example.com/",
+            articles=[
+                ArticleUpsert(
+                    author="Joe Bloggs",
+                    raw_title="Blah Blah",
+                    url="https://example.com/blah-blah",
+                    date=timezone.now(),
+                    guid="doesnotexist",
+                    raw_content="<p>Hello, world!</p>",
+                    sanitized=SanitizedArticle(title="Title", content="<p>Content", snippet="Snippet", revision=1),
+                ),
+            ],
+            etag=b'"etag"',
+            last_modified=b"Tue, 15 Nov 1994 12:45:26 GMT",
+            digest=b"aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+        )
+
+        mu.persist(self.feed)
+
+        [article] = self.feed.articles.all()
+        self.assertFields(
+            article,
+            raw_title="Blah Blah",
+            raw_content="<p>Hello, world!</p>",
+            title="Title",
+            content="<p>Content",
+            content_snippet="Snippet",
+            content_rev=1,
+        )
+
     def test_persist_article_lacking_date(self):
         """
         The current date is assigned to articles which did not include one in
@@ -1015,6 +1662,371 @@ class MaybeUpdatedTests(DjangoTestCase):
             content="<p>Hello, world!",
         )
 
+    def test_persist_bulk(self):
+        """
+        Upserts are matched against the existing articles with one query and
+        written with one insert and one update, regardless of the number of
+        articles. The feed counts maintained by triggers remain correct.
+        """
+        for i in range(10):
+            self.feed.articles.create(
+                read=True,
+                fave=False,
+                author="",
+                raw_title="Old {}".format(i),
+                title="Old {}".format(i),
+                date=datetime(2000, 1, 2, 3, 4, 5, tzinfo=tz.utc),
+                url="http://example.com/{}".format(i),
+                guid="",
+                raw_content="",
+                content="",
+            )
+        upserts = [
+            ArticleUpsert(
+                author="",
+                raw_title="New {}".format(i),
+                url="https://example.com/{}".format(i),
+                date=None,
+                guid="",
+                raw_content="",
+            )
+            for i in range(5, 15)
+        ]
+        mu = MaybeUpdated(
+            feed_title="Example",
+            site_url="https://example.com/",
+            articles=upserts,
+            etag=b"",
+            last_modified=b"",
+            digest=b"aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+        )
+
+        # Match, insert, and update articles, then save the feed.
+        with self.assertNumQueries(5):
+            mu.persist(self.feed)
+
+        self.assertEqual(
+            ["Old {}".format(i) for i in range(5)] + ["New {}".format(i) for i in range(5, 15)],
+            [a.raw_title for a in self.feed.articles.order_by("id")],
+        )
+        self.feed.refresh_from_db()
+        self.assertEqual(15, self.feed.all_count)
+        self.assertEqual(5, self.feed.unread_count)
+        self.assertEqual(0, self.feed.fave_count)
+
+    def test_persist_duplicate_in_batch(self):
+        """
+        When the same GUID appears twice in a feed, the second entry updates
+        the article created by the first.
+        """
+        mu = MaybeUpdated(
+            feed_title="Example",
+            site_url="https://example.com/",
+            articles=[
+                ArticleUpsert(
+                    author="",
+                    raw_title="First",
+                    url="https://example.com/1",
+                    date=None,
+                    guid="tag:example.com,2020:1",
+                    raw_content="",
+                ),
+                ArticleUpsert(
+                    author="",
+                    raw_title="Second",
+                    url="https://example.com/2",
+                    date=None,
+                    guid="tag:example.com,2020:1",
+                    raw_content="",
+                ),
+            ],
+            etag=b"",
+            last_modified=b"",
+            digest=b"aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+        )
+
+        mu.persist(self.feed)
+
+        [article] = self.feed.articles.all()
+        self.assertFields(article, raw_title="Second", url="https://example.com/2")
+        self.feed.refresh_from_db()
+        self.assertEqual(1, self.feed.all_count)
+        self.assertEqual(1, self.feed.unread_count)
+
+    @override_settings(POLL_JITTER=0)
+    def test_persist_arrivals(self):
+        """
+        The dates of new articles update the feed's inter-arrival statistics,
+        from which its next check is scheduled.
+        """
+        now = timezone.now()
+        mu = MaybeUpdated(
+            feed_title="Example",
+            site_url="https://example.com/",
+            articles=[
+                ArticleUpsert(
+                    author="",
+                    raw_title="Article {}".format(hours),
+                    url="https://example.com/{}".format(hours),
+                    date=now - timedelta(hours=hours),
+                    guid="",
+                    raw_content="",
+                )
+                for hours in (3, 2, 1)
+            ],
+            etag=b"",
+            last_modified=b"",
+            digest=b"aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+            check_time=now,
+        )
+
+        mu.persist(self.feed)
+
+        self.feed.refresh_from_db()
+        self.assertFields(
+            self.feed,
+            last_arrival=now - timedelta(hours=1),
+            arrival_interval=timedelta(hours=1),
+            arrival_count=2,
+        )
+        self.assertAlmostEqual(timedelta(hours=1), self.feed.next_check - now, delta=timedelta(minutes=1))
+
+    def test_persist_max_age(self):
+        """
+        The freshness lifetime of the response holds off the next check.
+        """
+        now = timezone.now()
+        mu = MaybeUpdated(
+            feed_title="Example",
+            site_url="https://example.com/",
+            articles=[],
+            etag=b"",
+            last_modified=b"",
+            digest=b"aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+            max_age=timedelta(days=3),
+            check_time=now,
+        )
+
+        mu.persist(self.feed)
+
+        self.feed.refresh_from_db()
+        self.assertFields(self.feed, not_before=now + timedelta(days=3), next_check=now + timedelta(days=3))
+
+    def test_persist_unchanged(self):
+        """
+        An entry whose fingerprint matches an article is skipped without
+        loading candidate matches, and doesn't mark the feed as changed.
+        """
+        upsert = ArticleUpsert(
+            author="",
+            raw_title="Same",
+            url="https://example.com/same",
+            date=timezone.now(),
+            guid="tag:example.com,2020:same",
+            raw_content="<p>Same",
+        )
+        mu = MaybeUpdated(
+            feed_title="Example",
+            site_url="https://example.com/",
+            articles=[upsert],
+            etag=b"",
+            last_modified=b"",
+            digest=b"aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+        )
+        mu.persist(self.feed)
+        first_changed = self.feed.last_changed
+
+        mu2 = attr.evolve(mu, digest=b"bbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb", check_time=mu.check_time + timedelta(hours=1))
+        with mock.patch.object(Article, "set_content") as set_content:
+            mu2.persist(self.feed)
+
+        set_content.assert_not_called()
+        self.assertEqual(first_changed, self.feed.last_changed)
+        [article] = self.feed.articles.all()
+        self.assertEqual(upsert.fingerprint, bytes(article.fingerprint))
+
+    def test_persist_fingerprint_legacy(self):
+        """
+        An article which lacks a fingerprint gets one when it is matched by
+        an unchanged entry, without changing its content.
+        """
+        upsert = ArticleUpsert(
+            author="",
+            raw_title="Old",
+            url="https://example.com/old",
+            date=timezone.now(),
+            guid="tag:example.com,2020:old",
+            raw_content="<p>Old",
+        )
+        article = self.feed.articles.create(
+            read=True,
+            fave=False,
+            author=upsert.author,
+            url=upsert.url,
+            date=upsert.date,
+            guid=upsert.guid,
+        )
+        article.set_content(upsert.raw_title, upsert.raw_content)
+        article.save()
+        mu = MaybeUpdated(
+            feed_title="Example",
+            site_url="https://example.com/",
+            articles=[upsert],
+            etag=b"",
+            last_modified=b"",
+            digest=b"aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+        )
+
+        mu.persist(self.feed)
+
+        article.refresh_from_db()
+        self.assertEqual(upsert.fingerprint, bytes(article.fingerprint))
+        self.assertTrue(article.read)
+
+
+@attr.s(frozen=True)
+class _RaisingOutcome(object):
+    """
+    An outcome which changes the feed, then raises.
+    """
+
+    exception = attr.ib()
+
+    def persist(self, feed):
+        feed.error = "Half done"
+        feed.save()
+        raise self.exception
+
+
+class PersistOutcomesTests(DjangoTestCase):
+    """
+    Test `yarrharr.fetch.persist_outcomes()`.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user",
+            email="someone@example.net",
+            password="sesame",
+        )
+        self.feeds = [
+            Feed.objects.create(
+                user=self.user,
+                url="https://example.com/{}".format(i),
+                site_url="",
+                added=timezone.now(),
+                next_check=timezone.now(),
+                feed_title="",
+                user_title="",
+                etag=b"",
+                last_modified=b"",
+                digest=b"",
+            )
+            for i in range(3)
+        ]
+
+    def test_savepoints(self):
+        """
+        The feeds are reloaded with one query and an exception persisting one
+        feed rolls back that feed alone. The failure is recorded on the feed,
+        which is reloaded for that, and its next check is scheduled.
+        """
+        outcomes = [
+            (self.feeds[0], Gone()),
+            (self.feeds[1], _RaisingOutcome(ZeroDivisionError())),
+            (self.feeds[2], Gone()),
+        ]
+
+        with mock.patch("yarrharr.fetch.log") as log, CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                next_checks = persist_outcomes(outcomes)
+
+        log.failure.assert_called_once()
+        self.assertEqual(2, sum(q["sql"].startswith("SELECT") for q in ctx.captured_queries))
+        self.assertIsNone(Feed.objects.get(id=self.feeds[0].id).next_check)
+        failed = Feed.objects.get(id=self.feeds[1].id)
+        self.assertEqual("Failed to save the result of the check", failed.error)
+        self.assertGreater(failed.next_check, self.feeds[1].next_check)
+        self.assertIsNone(Feed.objects.get(id=self.feeds[2].id).next_check)
+        self.assertEqual(
+            {self.feeds[0].id: None, self.feeds[1].id: failed.next_check, self.feeds[2].id: None},
+            next_checks,
+        )
+
+    def test_next_checks(self):
+        """
+        The new next check of each feed is returned.
+        """
+        outcomes = [(self.feeds[0], NetworkError("Oops"))]
+
+        next_checks = persist_outcomes(outcomes)
+
+        self.assertEqual({self.feeds[0].id: Feed.objects.get(id=self.feeds[0].id).next_check}, next_checks)
+        self.assertGreater(next_checks[self.feeds[0].id], self.feeds[0].next_check)
+
+    def test_stats(self):
+        """
+        The stats of each fetch are added to the feed's totals.
+        """
+        outcomes = [
+            (self.feeds[0], NetworkError("Oops", stats=FetchStats(0, 0, None))),
+            (self.feeds[1], Unchanged("digest", stats=FetchStats(100, 400, 0.5))),
+            (self.feeds[2], Unchanged("digest")),
+        ]
+
+        persist_outcomes(outcomes)
+
+        self.assertEqual(
+            [(1, 0, 0, None), (1, 100, 400, 0.5), (0, 0, 0, None)],
+            list(
+                Feed.objects.filter(id__in=[feed.id for feed in self.feeds])
+                .order_by("id")
+                .values_list("fetch_count", "wire_bytes", "body_bytes", "ttfb")
+            ),
+        )
+
+    def test_operational_error(self):
+        """
+        An `OperationalError` rolls back the whole batch.
+        """
+        outcomes = [
+            (self.feeds[0], Gone()),
+            (self.feeds[1], _RaisingOutcome(OperationalError("disk I/O error"))),
+        ]
+
+        with self.assertRaises(OperationalError):
+            with transaction.atomic():
+                persist_outcomes(outcomes)
+
+        self.assertIsNotNone(Feed.objects.get(id=self.feeds[0].id).next_check)
+        self.assertEqual("", Feed.objects.get(id=self.feeds[1].id).error)
+
+    def test_deleted(self):
+        """
+        Outcomes for feeds which have been deleted are discarded.
+        """
+        feed = Feed.objects.create(
+            user=self.user,
+            url="https://example.com/deleted",
+            site_url="",
+            added=timezone.now(),
+            next_check=timezone.now(),
+            feed_title="",
+            user_title="",
+            etag=b"",
+            last_modified=b"",
+            digest=b"",
+        )
+        feed_id = feed.id
+        feed.delete()
+        feed.id = feed_id
+
+        next_checks = persist_outcomes([(feed, Gone()), (self.feeds[0], Gone())])
+
+        self.assertFalse(Feed.objects.filter(id=feed_id).exists())
+        self.assertIsNone(next_checks[feed_id])
+        self.assertIsNone(Feed.objects.get(id=self.feeds[0].id).next_check)
+
 
 class BozoErrorTests(DjangoTestCase):
     def test_persist(self):
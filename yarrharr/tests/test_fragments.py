@@ -0,0 +1,167 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+from unittest import TestCase as SimpleTestCase
+
+from django.contrib.auth.models import User
+from django.template import engines
+from django.template.loader import get_template
+from django.test import TestCase
+from django.utils import timezone
+
+from ..fragments import FragmentCache
+from ..templatetags.article_rows import row_cache
+
+
+class FragmentCacheTests(SimpleTestCase):
+    """
+    Test `yarrharr.fragments.FragmentCache`.
+    """
+
+    def test_hit(self):
+        """
+        A fragment is found under its key when the stamp matches.
+        """
+        cache = FragmentCache(100)
+        cache.put(1, ("a",), "<p>a")
+
+        self.assertEqual("<p>a", cache.get(1, ("a",)))
+        self.assertIsNone(cache.get(2, ("a",)))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_stamp(self):
+        """
+        A lookup with a different stamp misses. Putting the new fragment
+        replaces the old one.
+        """
+        cache = FragmentCache(100)
+        cache.put(1, ("a",), "<p>a")
+
+        self.assertIsNone(cache.get(1, ("b",)))
+        cache.put(1, ("b",), "<p>b")
+
+        self.assertEqual("<p>b", cache.get(1, ("b",)))
+        self.assertIsNone(cache.get(1, ("a",)))
+        self.assertEqual(1, len(cache))
+
+    def test_evict(self):
+        """
+        The least recently used fragments are evicted to keep the total
+        length of the fragments within the limit.
+        """
+        cache = FragmentCache(10)
+        cache.put(1, (), "1234")
+        cache.put(2, (), "1234")
+        cache.get(1, ())
+        cache.put(3, (), "1234")
+
+        self.assertEqual("1234", cache.get(1, ()))
+        self.assertIsNone(cache.get(2, ()))
+        self.assertEqual("1234", cache.get(3, ()))
+
+    def test_too_big(self):
+        """
+        A fragment longer than the limit isn't cached.
+        """
+        cache = FragmentCache(10)
+        cache.put(1, (), "1234")
+        cache.put(2, (), "12345678901")
+
+        self.assertIsNone(cache.get(2, ()))
+        self.assertEqual("1234", cache.get(1, ()))
+
+    def test_clear(self):
+        cache = FragmentCache(10)
+        cache.put(1, (), "1234")
+
+        cache.clear()
+
+        self.assertEqual(0, len(cache))
+        self.assertIsNone(cache.get(1, ()))
+
+
+class ArticleRowsTests(TestCase):
+    """
+    Test the ``article_rows`` template tag.
+    """
+
+    def setUp(self):
+        row_cache.clear()
+        self.addCleanup(row_cache.clear)
+        user = User.objects.create_user(username="user", email="user@mailhost.example", password="sesame")
+        self.feed = user.feed_set.create(url="https://feed.example/", added=timezone.now(), feed_title="Feed")
+        self.article = self.feed.articles.create(
+            read=False,
+            fave=False,
+            author="Author",
+            title="Title",
+            url="https://feed.example/1",
+            date=timezone.now(),
+            raw_content="...",
+            content="...",
+            content_snippet="Snippet",
+        )
+        self.template = engines["django"].from_string("{% load article_rows %}{% article_rows articles %}")
+
+    def render(self):
+        articles = list(self.feed.articles.prefetch_related("feed"))
+        return self.template.render({"articles": articles})
+
+    def test_cached(self):
+        """
+        Rows are rendered once and then served from the cache.
+        """
+        hits, misses = row_cache.hits, row_cache.misses
+        first = self.render()
+        second = self.render()
+
+        self.assertEqual(first, second)
+        self.assertIn("Snippet", first)
+        self.assertEqual((1, 1), (row_cache.hits - hits, row_cache.misses - misses))
+
+    def test_changed(self):
+        """
+        A row is rendered again when what it shows changes.
+        """
+        for field, value in [("read", True), ("title", "Changed"), ("content_snippet", "Changed")]:
+            with self.subTest(field=field):
+                before = self.render()
+                setattr(self.article, field, value)
+                self.article.save()
+
+                after = self.render()
+
+                self.assertNotEqual(before, after)
+                self.assertEqual(get_template("article_row.html").render({"article": self.article}), after)
+
+    def test_feed_renamed(self):
+        """
+        Renaming the feed changes the rows of its articles.
+        """
+        self.render()
+        self.feed.user_title = "Renamed"
+        self.feed.save()
+
+        self.assertIn("Renamed", self.render())
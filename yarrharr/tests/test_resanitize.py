@@ -0,0 +1,163 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..resanitize import ContentWriter, resanitize_stale
+from ..sanitize import REVISION
+
+
+class ResanitizeTests(TestCase):
+    """
+    Test `yarrharr.resanitize`.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username="user")
+        self.feed = user.feed_set.create(
+            url="http://example.com/feed.xml",
+            feed_title="Feed",
+            added=timezone.now(),
+        )
+        self.article = self.feed.articles.create(
+            read=False,
+            fave=False,
+            author="",
+            title="Old",
+            url="http://example.com/1",
+            date=timezone.now(),
+            guid="1",
+            raw_title="New",
+            raw_content="<p>New<script>",
+            content="<p>Old<script></script>",
+            content_snippet="Old",
+            content_rev=REVISION - 1,
+        )
+
+    @override_settings(RESANITIZE_ON_READ=False)
+    def test_disabled(self):
+        """
+        Nothing happens unless the ``RESANITIZE_ON_READ`` setting is true.
+        """
+        resanitize_stale([self.article])
+
+        self.assertEqual("<p>Old<script></script>", self.article.content)
+
+    @override_settings(RESANITIZE_ON_READ=True)
+    def test_resanitize(self):
+        """
+        Stale articles are sanitized again, and written to the database when
+        the writer is flushed.
+        """
+        writer = ContentWriter()
+        with mock.patch("yarrharr.resanitize.writer", writer):
+            resanitize_stale([self.article])
+
+        self.assertEqual(("New", "<p>New", "", REVISION), self._fields(self.article))
+        self.article.refresh_from_db()
+        self.assertEqual("<p>Old<script></script>", self.article.content)
+
+        self.assertEqual(1, writer.flush())
+        self.article.refresh_from_db()
+        self.assertEqual(("New", "<p>New", "", REVISION), self._fields(self.article))
+        self.assertEqual(0, writer.flush())
+
+    def test_flush_skips_updated(self):
+        """
+        An article which was updated after it was queued is not overwritten.
+        """
+        writer = ContentWriter()
+        self.article.set_content("Queued", "Queued")
+        writer.add(self.article)
+        self.feed.articles.filter(pk=self.article.pk).update(content="Polled", content_rev=REVISION)
+
+        self.assertEqual(0, writer.flush())
+        self.article.refresh_from_db()
+        self.assertEqual("Polled", self.article.content)
+
+    def test_flush_error(self):
+        """
+        When the write fails the articles stay queued, unless they have been
+        queued again since.
+        """
+        writer = ContentWriter()
+        self.article.set_content("First", "First")
+        writer.add(self.article)
+
+        with mock.patch("yarrharr.resanitize.Article.objects.bulk_update", side_effect=OperationalError("database is locked")):
+            self.assertRaises(OperationalError, writer.flush)
+
+        self.assertEqual(1, writer.flush())
+        self.article.refresh_from_db()
+        self.assertEqual("First", self.article.content)
+
+    @override_settings(RESANITIZE_ON_READ=True)
+    def test_flush_full(self):
+        """
+        Without the server's write queue running, the request which fills a
+        batch writes it.
+        """
+        writer = ContentWriter(batch_size=2)
+        other = self.feed.articles.create(
+            read=False,
+            fave=False,
+            author="",
+            title="Old",
+            url="http://example.com/2",
+            date=timezone.now(),
+            guid="2",
+            raw_title="Other",
+            raw_content="<p>Other",
+            content="<p>Old",
+            content_rev=REVISION - 1,
+        )
+        with mock.patch("yarrharr.resanitize.writer", writer):
+            resanitize_stale([self.article])
+            self.assertEqual(2, self.feed.articles.exclude(content_rev=REVISION).count())
+            resanitize_stale([other])
+
+        self.assertEqual(0, self.feed.articles.exclude(content_rev=REVISION).count())
+        self.assertEqual(0, writer.flush())
+
+    @override_settings(RESANITIZE_ON_READ=True)
+    def test_flush_full_server(self):
+        """
+        The server's loop writes batches when its write queue is running.
+        """
+        writer = ContentWriter(batch_size=1)
+        with mock.patch("yarrharr.resanitize.writer", writer), mock.patch("yarrharr.resanitize.write_queue") as write_queue:
+            write_queue.running = True
+            resanitize_stale([self.article])
+
+        write_queue.call.assert_not_called()
+        self.assertEqual(1, writer.flush())
+
+    def _fields(self, article):
+        return (article.title, article.content, article.content_snippet, article.content_rev)
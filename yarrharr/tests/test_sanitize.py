@@ -28,7 +28,7 @@ from pprint import pprint
 
 import html5lib
 
-from ..sanitize import html_to_text, sanitize_html
+from ..sanitize import REVISION, SanitizedArticle, html_to_text, sanitize_article, sanitize_html
 
 VIDEO_ICON = "<svg width=1em height=1em class=icon><use href=#icon-video></use></svg>"
 
@@ -368,6 +368,64 @@ class SanitizeHtmlTests(unittest.TestCase):
         )
 
 
+class SanitizeArticleTests(unittest.TestCase):
+    maxDiff = None
+
+    def test_fields(self):
+        """
+        The content is sanitized and the text and snippet are its text, as
+        given by `html_to_text()`.
+        """
+        html = '<p>a<script>b</script><p>c<span>d</span><div>e<img alt=":)"> <img>'
+
+        result = sanitize_article("<b>Title</b>", html)
+
+        self.assertEqual(
+            SanitizedArticle(
+                title="Title",
+                content=sanitize_html(html),
+                snippet=html_to_text(sanitize_html(html)),
+                text=html_to_text(sanitize_html(html)),
+                revision=REVISION,
+            ),
+            result,
+        )
+        self.assertEqual("a cd e:) 🖼️", result.snippet)
+
+    def test_title_stripped(self):
+        """
+        When the text of the content begins with the title it is stripped from
+        the snippet.
+        """
+        result = sanitize_article("Title", "<h1>Title</h1><p>Body")
+
+        self.assertEqual("Body", result.snippet)
+
+    def test_snippet_length(self):
+        """
+        The snippet is limited to 500 characters, which don't count the title.
+        """
+        html = "<h1>Title</h1>" + "<p>word  \n  word</p>" * 500
+
+        result = sanitize_article("Title", html)
+
+        self.assertEqual(sanitize_html(html), result.content)
+        self.assertEqual(500, len(result.snippet))
+        self.assertEqual(html_to_text(html)[len("Title ") :][:500], result.snippet)
+        self.assertEqual(html_to_text(html), result.text)
+
+    def test_snippet_long_title(self):
+        """
+        A title longer than the snippet is still matched in full.
+        """
+        title = "title " * 100
+        html = "<p>{}</p><p>{}</p>".format(title, "body " * 200)
+
+        result = sanitize_article(title, html)
+
+        self.assertEqual("body " * 100, result.snippet)
+
+
 def print_tokens(html):
     tree = html5lib.parseFragment(html)
     w = html5lib.getTreeWalker("etree")
@@ -0,0 +1,162 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from twisted.trial.unittest import SynchronousTestCase
+
+from ..scheduler import FeedSchedule, load_schedule
+
+
+class FeedScheduleTests(SynchronousTestCase):
+    """
+    Test `yarrharr.scheduler.FeedSchedule`.
+    """
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.schedule = FeedSchedule()
+
+    def at(self, minutes):
+        return self.now + timedelta(minutes=minutes)
+
+    def test_stale(self):
+        """
+        A new schedule is stale until it is reset, and again once
+        invalidated.
+        """
+        self.assertTrue(self.schedule.stale)
+        self.schedule.reset([])
+        self.assertFalse(self.schedule.stale)
+        self.schedule.invalidate()
+        self.assertTrue(self.schedule.stale)
+
+    def test_empty(self):
+        """
+        An empty schedule has no next check and nothing due.
+        """
+        self.schedule.reset([])
+
+        self.assertIs(None, self.schedule.next_check())
+        self.assertEqual([], self.schedule.pop_due(self.now, 10))
+        self.assertEqual(timedelta(0), self.schedule.lateness)
+
+    def test_most_overdue_first(self):
+        """
+        `pop_due()` returns the due feeds most overdue first, up to the limit,
+        and records how late the most overdue was.
+        """
+        self.schedule.reset([(1, self.at(-5)), (2, self.at(-30)), (3, self.at(5)), (4, self.at(-10))])
+
+        self.assertEqual([2, 4], self.schedule.pop_due(self.now, 2))
+        self.assertEqual(timedelta(minutes=30), self.schedule.lateness)
+        self.assertEqual([1], self.schedule.pop_due(self.now, 2))
+        self.assertEqual(timedelta(minutes=5), self.schedule.lateness)
+        self.assertEqual(self.at(5), self.schedule.next_check())
+        self.assertEqual(1, len(self.schedule))
+
+    def test_set(self):
+        """
+        `set()` reschedules a feed, superseding its previous entry, or removes
+        it given `None`.
+        """
+        self.schedule.reset([(1, self.at(-5)), (2, self.at(10))])
+
+        self.schedule.set(1, self.at(20))
+        self.schedule.set(3, self.at(15))
+
+        self.assertEqual([], self.schedule.pop_due(self.now, 10))
+        self.assertEqual(self.at(10), self.schedule.next_check())
+
+        self.schedule.set(2, None)
+
+        self.assertEqual(self.at(15), self.schedule.next_check())
+        self.assertEqual([3, 1], self.schedule.pop_due(self.at(30), 10))
+
+    def test_compact(self):
+        """
+        Superseded entries don't accumulate without bound.
+        """
+        self.schedule.reset([(1, self.now)])
+
+        for i in range(1000):
+            self.schedule.set(1, self.at(i))
+
+        self.assertLess(len(self.schedule._heap), 100)
+        self.assertEqual([1], self.schedule.pop_due(self.at(1000), 10))
+
+    def test_reload(self):
+        """
+        A schedule loaded at a given time needs loading again after
+        `RELOAD_INTERVAL`, and its next check is no later than that.
+        """
+        self.schedule.reset([(1, self.at(60))], self.now)
+
+        self.assertFalse(self.schedule.needs_load(self.at(14)))
+        self.assertTrue(self.schedule.needs_load(self.at(15)))
+        self.assertEqual(self.at(15), self.schedule.next_check())
+
+    def test_rate(self):
+        """
+        With a *rate*, up to a minute's worth of due feeds are handed out at
+        once. The rest are handed out as the rate allows, and the next check
+        is when the next may be handed out.
+        """
+        self.schedule = FeedSchedule(rate=2)
+        self.schedule.reset([(feed_id, self.at(-1)) for feed_id in range(5)])
+
+        self.assertEqual([0, 1], self.schedule.pop_due(self.now, 10))
+        self.assertEqual(self.at(0.5), self.schedule.next_check())
+        self.assertEqual([], self.schedule.pop_due(self.at(0.25), 10))
+        self.assertEqual(self.at(0.5), self.schedule.next_check())
+        self.assertEqual([2], self.schedule.pop_due(self.at(0.5), 10))
+        self.assertEqual([3, 4], self.schedule.pop_due(self.at(10), 10))
+
+    def test_rate_burst(self):
+        """
+        Idle time accrues no more than a minute's worth of feeds.
+        """
+        self.schedule = FeedSchedule(rate=2)
+        self.schedule.reset([])
+        self.schedule.pop_due(self.now, 10)
+        self.schedule.reset([(feed_id, self.at(59)) for feed_id in range(5)])
+
+        self.assertEqual([0, 1], self.schedule.pop_due(self.at(60), 10))
+
+
+class LoadScheduleTests(TestCase):
+    def test_load(self):
+        """
+        `load_schedule()` returns the next check of each enabled feed.
+        """
+        user = User.objects.create_user(username="user", email="user@example.net", password="sesame")
+        now = timezone.now()
+        enabled = user.feed_set.create(url="https://example.com/1", added=now, next_check=now, feed_title="")
+        user.feed_set.create(url="https://example.com/2", added=now, next_check=None, feed_title="")
+
+        self.assertEqual([(enabled.id, now)], load_schedule())
@@ -0,0 +1,225 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+from datetime import timedelta
+from unittest import TestCase, mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase as DjangoTestCase
+from django.utils import timezone
+
+from ..enums import ArticleFilter
+from ..models import Article
+from ..search import decode_cursor, encode_cursor, parse_query, search_articles
+
+
+class ParseQueryTests(TestCase):
+    def test_words(self):
+        """
+        Each word is a quoted FTS5 string, so all must match.
+        """
+        self.assertEqual('"foo" "bar"', parse_query("  foo\tbar "))
+
+    def test_literal(self):
+        """
+        FTS5 query syntax is quoted, so it is matched literally.
+        """
+        self.assertEqual('"AND" "title:x" """quoted"""', parse_query('AND title:x "quoted"'))
+
+    def test_prefix(self):
+        self.assertEqual('"foo"* "bar"', parse_query("foo** bar"))
+
+    def test_empty(self):
+        for query in ["", " ", "*"]:
+            with self.subTest(query=query):
+                self.assertRaises(ValueError, parse_query, query)
+
+
+class CursorTests(TestCase):
+    def test_round_trip(self):
+        self.assertEqual((5678, -1.25, 1234), decode_cursor(encode_cursor(5678, -1.25, 1234)))
+
+    def test_malformed(self):
+        for cursor in ["", "abc", encode_cursor(3, 1.0, 2) + "AA"]:
+            with self.subTest(cursor=cursor):
+                self.assertRaises(ValueError, decode_cursor, cursor)
+
+
+class SearchArticlesTests(DjangoTestCase):
+    """
+    Test `search_articles()` and the triggers which maintain the index.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", email="user@mailhost.example", password="sesame")
+        self.feed = self.user.feed_set.create(url="https://feed.example/", added=timezone.now(), next_check=None, feed_title="Feed")
+        self.now = timezone.now()
+
+    def add_article(self, title, content_text="", author="", feed=None, **kwargs):
+        kwargs.setdefault("read", False)
+        kwargs.setdefault("fave", False)
+        self.now -= timedelta(minutes=1)
+        return (feed or self.feed).articles.create(
+            title=title,
+            author=author,
+            content_text=content_text,
+            url="",
+            date=self.now,
+            raw_content="",
+            content="",
+            **kwargs,
+        )
+
+    def search(self, query, filt=ArticleFilter.all, feeds=None, **kwargs):
+        articles, after = search_articles(feeds or self.user.feed_set.all(), query, filt, **kwargs)
+        return [article.title for article in articles], after
+
+    def test_columns(self):
+        """
+        The title, author and content are searched.
+        """
+        self.add_article("Pirate ships", "Yo ho ho")
+        self.add_article("Sailing", "Ships ahoy")
+        self.add_article("Parrots", "Polly", author="Ship's cat")
+        self.add_article("Landlubbers")
+
+        titles, after = self.search("ships")
+
+        self.assertEqual(["Pirate ships", "Sailing"], titles)
+        self.assertEqual((["Parrots"], None), self.search("cat"))
+        self.assertIsNone(after)
+
+    def test_rank(self):
+        """
+        Matches in the title rank above matches in the content.
+        """
+        self.add_article("Weather", "A storm rolled in")
+        self.add_article("Storm", "Weather")
+
+        self.assertEqual((["Storm", "Weather"], None), self.search("storm"))
+
+    def test_diacritics(self):
+        """
+        Diacritics and case are ignored.
+        """
+        self.add_article("Café Crème")
+
+        self.assertEqual((["Café Crème"], None), self.search("CAFE creme"))
+
+    def test_prefix(self):
+        self.add_article("Navigation")
+
+        self.assertEqual((["Navigation"], None), self.search("navig*"))
+        self.assertEqual(([], None), self.search("navig"))
+
+    def test_scope(self):
+        """
+        Only articles of the given feeds are found.
+        """
+        other = User.objects.create_user(username="other", email="other@mailhost.example", password="sesame")
+        other_feed = other.feed_set.create(url="https://feed.example/", added=timezone.now(), next_check=None, feed_title="Feed")
+        self.add_article("Treasure", feed=other_feed)
+        self.add_article("Treasure map")
+
+        self.assertEqual((["Treasure map"], None), self.search("treasure"))
+        self.assertEqual((["Treasure"], None), self.search("treasure", feeds=other.feed_set.all()))
+
+    def test_filter(self):
+        self.add_article("Rum", read=True)
+        self.add_article("Rum punch", fave=True)
+        self.add_article("Rum cake", read=True, fave=True)
+
+        self.assertEqual((["Rum punch"], None), self.search("rum", ArticleFilter.unread))
+        self.assertEqual(["Rum cake", "Rum punch"], sorted(self.search("rum", ArticleFilter.fave)[0]))
+
+    def test_windows(self):
+        """
+        Matches are ranked in windows of `SEARCH_DEPTH` rows of the index,
+        newest first. Pages continue into older windows, so the feeds
+        searched and the filter don't hide older matches.
+        """
+        other_feed = self.user.feed_set.create(url="https://other.example/", added=timezone.now(), next_check=None, feed_title="Other")
+        self.add_article("Parrot 0", read=True)
+        self.add_article("Parrot 1 parrot")
+        self.add_article("Parrot 2", feed=other_feed)
+        self.add_article("Parrot 3")
+        self.add_article("Parrot 4", read=True)
+
+        def pages(*args, **kwargs):
+            pages = []
+            after = None
+            while True:
+                page, after = self.search(*args, after=after, **kwargs)
+                pages.append(page)
+                if after is None:
+                    return pages
+
+        with mock.patch("yarrharr.search.SEARCH_DEPTH", 2):
+            self.assertEqual(
+                [["Parrot 3", "Parrot 4"], ["Parrot 1 parrot", "Parrot 2"], ["Parrot 0"]],
+                pages("parrot"),
+            )
+            self.assertEqual(
+                [["Parrot 3"], ["Parrot 4"], ["Parrot 1 parrot"], ["Parrot 0"]],
+                pages("parrot", page_size=1, feeds=self.user.feed_set.filter(pk=self.feed.pk)),
+            )
+            self.assertEqual(
+                [["Parrot 3"], ["Parrot 1 parrot", "Parrot 2"], []],
+                pages("parrot", ArticleFilter.unread),
+            )
+
+    def test_paginate(self):
+        """
+        Results are paginated by a cursor without skipping or repeating any.
+        """
+        for i in range(5):
+            self.add_article("Doubloon {}".format(i))
+
+        titles = []
+        after = None
+        for _ in range(3):
+            page, after = self.search("doubloon", page_size=2, after=after)
+            titles.extend(page)
+        self.assertIsNone(after)
+        self.assertEqual(["Doubloon {}".format(i) for i in range(5)], sorted(titles))
+        self.assertEqual(5, len(titles))
+
+    def test_update(self):
+        """
+        The index follows changes to the articles, and flags don't disturb
+        it.
+        """
+        article = self.add_article("Cutlass", "Sharp")
+        article.title = "Sabre"
+        article.read = True
+        article.save()
+        Article.objects.filter(pk=article.pk).update(fave=True)
+
+        self.assertEqual(([], None), self.search("cutlass"))
+        self.assertEqual((["Sabre"], None), self.search("sabre sharp"))
+
+        article.delete()
+
+        self.assertEqual(([], None), self.search("sabre"))
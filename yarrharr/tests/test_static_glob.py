@@ -0,0 +1,155 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from django.test import override_settings
+
+from ..templatetags.static_glob import NoStaticMatch, _StaticIndex, newest_static
+
+
+class StaticIndexTests(TestCase):
+    """
+    Test `yarrharr.templatetags.static_glob._StaticIndex`.
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.index = _StaticIndex(self.dir)
+
+    def touch(self, name, mtime):
+        path = os.path.join(self.dir, name)
+        with open(path, "w"):
+            pass
+        os.utime(path, (mtime, mtime))
+        # Step the directory's mtime explicitly, as a coarse filesystem
+        # timestamp might not change between the writes of a test.
+        os.utime(self.dir, ns=(0, os.stat(self.dir).st_mtime_ns + 1))
+
+    def test_newest(self):
+        """
+        The newest file matching the pattern is found. Compressed variants
+        count, but their extensions are stripped.
+        """
+        self.touch("main-aaa.css", 100)
+        self.touch("main-bbb.css.br", 300)
+        self.touch("main-bbb.css.gz", 300)
+        self.touch("main-ccc.css", 200)
+        self.touch("main-ddd.js", 400)
+
+        self.assertEqual("main-bbb.css", self.index.newest("main-*.css"))
+        self.assertIsNone(self.index.newest("fonts-*.css"))
+
+    def test_scanned_once(self):
+        """
+        The directory is scanned once. Later lookups don't touch the
+        filesystem.
+        """
+        self.touch("main-aaa.css", 100)
+        self.index.newest("main-*.css")
+
+        with mock.patch("os.scandir") as scandir, mock.patch("os.stat") as stat:
+            self.assertEqual("main-aaa.css", self.index.newest("main-*.css"))
+            self.assertIsNone(self.index.newest("icon-*.svg"))
+
+        scandir.assert_not_called()
+        stat.assert_not_called()
+
+    def test_refresh(self):
+        """
+        Refreshing the index picks up changes to the directory.
+        """
+        self.touch("main-aaa.css", 100)
+        self.assertEqual("main-aaa.css", self.index.newest("main-*.css"))
+        self.touch("main-bbb.css", 200)
+        self.assertEqual("main-aaa.css", self.index.newest("main-*.css"))
+
+        self.index.refresh()
+
+        self.assertEqual("main-bbb.css", self.index.newest("main-*.css"))
+
+    def test_refresh_unchanged(self):
+        """
+        Refreshing the index doesn't scan the directory unless it has
+        changed.
+        """
+        self.touch("main-aaa.css", 100)
+        self.index.newest("main-*.css")
+
+        with mock.patch("os.scandir") as scandir:
+            self.index.refresh()
+
+        scandir.assert_not_called()
+
+
+class NewestStaticTests(TestCase):
+    """
+    Test the ``newest_static`` filter.
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        patcher = mock.patch("yarrharr.templatetags.static_glob._index", _StaticIndex(self.dir))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, name):
+        open(os.path.join(self.dir, name), "w").close()
+        os.utime(self.dir, ns=(0, os.stat(self.dir).st_mtime_ns + 1))
+
+    def test_no_match(self):
+        with self.assertRaises(NoStaticMatch):
+            newest_static("main-*.css")
+
+    @override_settings(DEBUG=True)
+    def test_debug(self):
+        """
+        In DEBUG mode new files are found.
+        """
+        self.add("main-aaa.css")
+        self.assertEqual("main-aaa.css", newest_static("main-*.css"))
+
+        self.add("icon-aaa.svg")
+
+        self.assertEqual("icon-aaa.svg", newest_static("icon-*.svg"))
+
+    @override_settings(DEBUG=False)
+    def test_production(self):
+        """
+        Otherwise the directory is scanned only once.
+        """
+        self.add("main-aaa.css")
+        self.assertEqual("main-aaa.css", newest_static("main-*.css"))
+
+        self.add("icon-aaa.svg")
+
+        with self.assertRaises(NoStaticMatch):
+            newest_static("icon-*.svg")
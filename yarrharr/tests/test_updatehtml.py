@@ -0,0 +1,181 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Article
+from ..sanitize import REVISION, sanitize_article
+
+
+class UpdateHtmlTests(TestCase):
+    """
+    Test the ``updatehtml`` management command.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username="user", email="user@mailhost.example", password="sesame")
+        self.feed = user.feed_set.create(url="https://feed.example/", added=timezone.now(), feed_title="Feed")
+
+    def add(self, i, rev=REVISION - 1):
+        """
+        Add an article sanitized by revision *rev*.
+        """
+        return self.feed.articles.create(
+            read=False,
+            fave=False,
+            author="",
+            url="https://feed.example/{}".format(i),
+            date=timezone.now(),
+            raw_title="Title {}".format(i),
+            raw_content="<p>Article {}".format(i),
+            title="old",
+            content="old",
+            content_rev=rev,
+        )
+
+    def updatehtml(self, *args):
+        stdout = StringIO()
+        call_command("updatehtml", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def assertUpdated(self, articles, updated=True):
+        for article in articles:
+            article.refresh_from_db()
+            sanitized = sanitize_article(article.raw_title, article.raw_content)
+            expected = (sanitized.title, sanitized.content, REVISION) if updated else ("old", "old", REVISION - 1)
+            self.assertEqual(expected, (article.title, article.content, article.content_rev), article.pk)
+
+    def test_ranges(self):
+        """
+        Every stale article is updated when the primary keys have gaps that
+        leave some batches empty. Current articles are left alone.
+        """
+        articles = [self.add(i) for i in range(12)]
+        for article in articles[3:8]:
+            article.delete()
+        current = self.add(12, rev=REVISION)
+
+        output = self.updatehtml("--jobs", "1", "--batch-size", "2")
+
+        self.assertUpdated(articles[:3] + articles[8:])
+        current.refresh_from_db()
+        self.assertEqual("old", current.content)
+        self.assertIn("Finished: updated 7 articles", output)
+
+    def test_pool(self):
+        """
+        Sanitizing in a pool of worker processes gives the same result.
+        """
+        articles = [self.add(i) for i in range(5)]
+
+        output = self.updatehtml("--jobs", "2", "--batch-size", "2")
+
+        self.assertUpdated(articles)
+        self.assertIn("Finished: updated 5 articles", output)
+
+    def test_checkpoint(self):
+        """
+        A run resumes after the article recorded in the checkpoint file, and
+        removes the file when it finishes.
+        """
+        articles = [self.add(i) for i in range(6)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "checkpoint.json")
+            with open(path, "w") as f:
+                json.dump({"revision": REVISION, "pk": articles[2].pk}, f)
+
+            output = self.updatehtml("--jobs", "1", "--batch-size", "2", "--checkpoint", path)
+
+            self.assertFalse(os.path.exists(path))
+        self.assertIn("Resuming after article {}".format(articles[2].pk), output)
+        self.assertUpdated(articles[:3], updated=False)
+        self.assertUpdated(articles[3:])
+
+    def test_checkpoint_progress(self):
+        """
+        The checkpoint records the end of each batch written.
+        """
+        articles = [self.add(i) for i in range(4)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "checkpoint.json")
+            with mock.patch("os.remove"):
+                self.updatehtml("--jobs", "1", "--batch-size", "2", "--checkpoint", path)
+            with open(path) as f:
+                self.assertEqual({"revision": REVISION, "pk": articles[-1].pk}, json.load(f))
+
+    def test_checkpoint_revision(self):
+        """
+        A checkpoint written for another sanitizer revision is ignored, so
+        the run starts from the beginning.
+        """
+        articles = [self.add(i) for i in range(4)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "checkpoint.json")
+            with open(path, "w") as f:
+                json.dump({"revision": REVISION - 1, "pk": articles[-1].pk}, f)
+
+            output = self.updatehtml("--jobs", "1", "--checkpoint", path)
+
+        self.assertIn("Ignoring checkpoint for sanitizer revision {}".format(REVISION - 1), output)
+        self.assertUpdated(articles)
+
+    def test_updated_meanwhile(self):
+        """
+        An article which the poller updates after it was read isn't
+        overwritten with content sanitized from its old raw content.
+        """
+        article = self.add(0)
+
+        def sanitize(raw_title, raw_content):
+            # The poller gets in between the read and the write.
+            fresh = Article.objects.get(pk=article.pk)
+            fresh.set_content("New", "<p>New")
+            fresh.save()
+            return sanitize_article(raw_title, raw_content)
+
+        with mock.patch("yarrharr.management.commands.updatehtml.sanitize_article", sanitize):
+            output = self.updatehtml("--jobs", "1")
+
+        article.refresh_from_db()
+        self.assertEqual(("New", "<p>New", REVISION), (article.title, article.content, article.content_rev))
+        self.assertIn("Finished: updated 0 articles", output)
+
+    def test_invalid(self):
+        """
+        ``--jobs`` and ``--batch-size`` must be positive.
+        """
+        for args in [("--jobs", "0"), ("--batch-size", "0"), ("--batch-size", "-1")]:
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                self.updatehtml(*args)
@@ -31,13 +31,19 @@ from unittest.mock import patch
 
 import lxml.html
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from .. import views
 from ..enums import ArticleFilter
 from ..models import Feed, Label
+from ..resanitize import ContentWriter
+from ..sanitize import REVISION
 from ..signals import schedule_changed
+from ..views import LabelForm
 
 
 class dictwith(object):
@@ -268,6 +274,40 @@ class FeedListTests(TestCase):
         )
         self.assertEqual(1, len(schedule_changed_signals))
 
+    def test_inventory_query_count(self):
+        """
+        The number of queries needed to build the inventory doesn't depend on
+        the number of feeds and labels.
+        """
+
+        def add_feed_and_label(i):
+            feed = self.user.feed_set.create(
+                url=f"http://example.com/{i}.xml",
+                feed_title=f"Feed {i}",
+                added=timezone.now(),
+            )
+            label = self.user.label_set.create(text=f"Label {i}")
+            label.feeds.add(feed)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get("/api/inventory/")
+            self.assertEqual(200, response.status_code)
+            return len(ctx.captured_queries), response.json()
+
+        add_feed_and_label(0)
+        initial_count, _ = count_queries()
+        for i in range(1, 10):
+            add_feed_and_label(i)
+        count, data = count_queries()
+
+        self.assertEqual(initial_count, count)
+        self.assertEqual(10, len(data["feedsById"]))
+        self.assertEqual(10, len(data["labelsById"]))
+        for label in data["labelsById"].values():
+            [feed_id] = label["feeds"]
+            self.assertEqual([label["id"]], data["feedsById"][str(feed_id)]["labels"])
+
     def test_update_feed_title_and_url(self):
         """
         A feed's user title and feed URL are set by the update-feed action.
@@ -491,6 +531,42 @@ class FeedListTests(TestCase):
             response.json(),
         )
 
+    def test_update_label_counts(self):
+        """
+        The label's counts reflect the feeds set by the update-label action.
+        """
+        feed = self.user.feed_set.create(
+            url="http://example/a",
+            feed_title="A",
+            added=timezone.now(),
+        )
+        feed.articles.create(
+            read=False,
+            fave=True,
+            author="",
+            url="http://example/a/1",
+            date=timezone.now(),
+        )
+        label = self.user.label_set.create(text="A")
+
+        response = self.client.post(
+            "/api/inventory/",
+            {
+                "action": "update-label",
+                "label": label.id,
+                "feed": [feed.id],
+                "text": "A",
+            },
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            dictwith({"unreadCount": 1, "faveCount": 1}),
+            response.json()["labelsById"][str(label.id)],
+        )
+        label.refresh_from_db()
+        self.assertEqual((1, 1), (label.unread_count, label.fave_count))
+
     def test_update_label(self):
         """
         The update-label action sets the labels text and associated feeds.
@@ -664,6 +740,29 @@ class LabelsViewTests(TestCase):
         errors = [el.text_content() for el in form.cssselect(".errorlist li")]
         self.assertEqual(["Label text must be unique"], errors)
 
+    def test_edit_counts(self):
+        """
+        Editing a label doesn't overwrite the counts maintained by trigger
+        with those loaded before the edit.
+        """
+        feed = self.user.feed_set.create(
+            url="http://example/a",
+            feed_title="A Feed",
+            added=timezone.now(),
+        )
+        label = self.user.label_set.create(text="foo")
+        label.feeds.add(feed)
+        label = self.user.label_set.get(pk=label.pk)
+        form = LabelForm({"text": "bar", "feeds": [str(feed.id)]}, instance=label)
+        self.assertTrue(form.is_valid())
+
+        # The article arrives between loading the label and saving the form.
+        feed.articles.create(read=False, fave=True, author="", url="", date=timezone.now())
+        form.save()
+
+        label.refresh_from_db()
+        self.assertEqual(("bar", 1, 1), (label.text, label.unread_count, label.fave_count))
+
 
 class FeedShowTests(TestCase):
     """
@@ -736,6 +835,236 @@ class FeedShowTests(TestCase):
         # No more pages
         self.assertEqual([], page2.cssselect(".pagination a"))
 
+    @patch("yarrharr.views.PAGE_SIZE", new=3)
+    def test_paginate_same_date(self):
+        """
+        Articles which share a date aren't skipped when they fall on a page
+        boundary, as the cursor includes the article ID.
+        """
+        date = timezone.now()
+        for i in range(5):
+            self.feed.articles.create(
+                read=False,
+                fave=False,
+                author="",
+                title=f"Article {i}",
+                url=f"http://example.com/{i}",
+                date=date,
+                guid=str(i),
+                raw_content="...",
+                content="...",
+            )
+        url = reverse("feed-show", kwargs={"feed_id": self.feed.pk, "filter": ArticleFilter.all})
+
+        page1 = expect_html(self.client.get(url))
+        page1.make_links_absolute(url)
+        [next_link] = page1.cssselect(".pagination a")
+        page2 = expect_html(self.client.get(next_link.attrib["href"]))
+
+        self.assertEqual(
+            ["Article 4", "Article 3", "Article 2"],
+            [el.text_content() for el in page1.cssselect(".list-article .title")],
+        )
+        self.assertEqual(
+            ["Article 1", "Article 0"],
+            [el.text_content() for el in page2.cssselect(".list-article .title")],
+        )
+
+    def test_paginate_legacy_after(self):
+        """
+        An ``after`` parameter which is an article ID, as in links generated
+        by older versions, is still accepted.
+        """
+        now = timezone.now()
+        articles = [
+            self.feed.articles.create(
+                read=False,
+                fave=False,
+                author="",
+                title=f"Article {i}",
+                url=f"http://example.com/{i}",
+                date=now - timedelta(hours=i),
+                guid=str(i),
+                raw_content="...",
+                content="...",
+            )
+            for i in range(3)
+        ]
+        url = reverse("feed-show", kwargs={"feed_id": self.feed.pk, "filter": ArticleFilter.all})
+
+        page = expect_html(self.client.get(url, {"after": str(articles[0].pk)}))
+
+        self.assertEqual(
+            ["Article 1", "Article 2"],
+            [el.text_content() for el in page.cssselect(".list-article .title")],
+        )
+
+    def test_paginate_bad_after(self):
+        """
+        A malformed ``after`` parameter produces a 400 response.
+        """
+        url = reverse("feed-show", kwargs={"feed_id": self.feed.pk, "filter": ArticleFilter.all})
+
+        for after in ["AAAA", "Z!!", "12345"]:
+            with self.subTest(after=after):
+                self.assertEqual(400, self.client.get(url, {"after": after}).status_code)
+
+    @override_settings(RESANITIZE_ON_READ=True)
+    def test_resanitize_on_read(self):
+        """
+        With ``resanitize = on-read`` articles sanitized by an old revision
+        are sanitized again when listed, and queued to be written.
+        """
+        article = self.feed.articles.create(
+            read=False,
+            fave=False,
+            author="",
+            title="Old",
+            url="http://example.com/1",
+            date=timezone.now(),
+            guid="1",
+            raw_title="New",
+            raw_content="<p>Lorem ipsum",
+            content="<p>Lorem ipsum",
+            content_snippet="Old",
+            content_rev=REVISION - 1,
+        )
+        writer = ContentWriter()
+        url = reverse("feed-show", kwargs={"feed_id": self.feed.pk, "filter": ArticleFilter.all})
+
+        with patch("yarrharr.resanitize.writer", writer):
+            tree = expect_html(self.client.get(url))
+
+        self.assertEqual(["New"], [el.text_content() for el in tree.cssselect(".list-article .title")])
+        self.assertEqual(1, writer.flush())
+        article.refresh_from_db()
+        self.assertEqual(("New", "Lorem ipsum", REVISION), (article.title, article.content_snippet, article.content_rev))
+
+
+class SearchViewTests(TestCase):
+    """
+    Test the ``search`` view and its JSON counterpart.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="john",
+            email="john@mail.example",
+            password="sesame",
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.feeds = [
+            self.user.feed_set.create(
+                url=f"http://example.com/{i}.xml",
+                feed_title=f"Feed {i}",
+                added=timezone.now(),
+            )
+            for i in range(2)
+        ]
+        self.label = self.user.label_set.create(text="Label")
+        self.label.feeds.add(self.feeds[1])
+        for i in range(4):
+            self.feeds[i % 2].articles.create(
+                read=i == 3,
+                fave=False,
+                author="",
+                title=f"Ship {i}",
+                url=f"http://example.com/{i}",
+                date=timezone.now() - timedelta(hours=i),
+                raw_content="...",
+                content="...",
+                content_text="Ahoy",
+            )
+
+    def titles(self, page):
+        return sorted(el.text_content() for el in page.cssselect(".list-article .title"))
+
+    def test_empty(self):
+        """
+        Without a search the page is just the form.
+        """
+        page = expect_html(self.client.get(reverse("search", kwargs={"filter": ArticleFilter.all})))
+
+        self.assertEqual([], self.titles(page))
+        self.assertEqual(1, len(page.cssselect("form[name=search]")))
+
+    def test_search(self):
+        url = reverse("search", kwargs={"filter": ArticleFilter.unread})
+
+        page = expect_html(self.client.get(url, {"q": "ahoy"}))
+
+        self.assertEqual(["Ship 0", "Ship 1", "Ship 2"], self.titles(page))
+        self.assertIn("The newest 10000 matches are ranked first", page.text_content())
+
+    def test_scope(self):
+        """
+        The search is limited to a label or feed.
+        """
+        url = reverse("search", kwargs={"filter": ArticleFilter.all})
+
+        label_page = expect_html(self.client.get(url, {"q": "ship", "label": self.label.pk}))
+        feed_page = expect_html(self.client.get(url, {"q": "ship", "feed": self.feeds[0].pk}))
+
+        self.assertEqual(["Ship 1", "Ship 3"], self.titles(label_page))
+        self.assertEqual(["Ship 0", "Ship 2"], self.titles(feed_page))
+        self.assertEqual(400, self.client.get(url, {"q": "ship", "feed": "x"}).status_code)
+        self.assertEqual(404, self.client.get(url, {"q": "ship", "label": self.label.pk + 1}).status_code)
+
+    @patch("yarrharr.search.PAGE_SIZE", new=2)
+    def test_paginate(self):
+        """
+        The link to the next page keeps the search.
+        """
+        url = reverse("search", kwargs={"filter": ArticleFilter.all})
+
+        page1 = expect_html(self.client.get(url, {"q": "ship"}))
+        page1.make_links_absolute(url)
+        [next_link] = page1.cssselect(".pagination a")
+        page2 = expect_html(self.client.get(next_link.attrib["href"]))
+
+        self.assertEqual(
+            ["Ship 0", "Ship 1", "Ship 2", "Ship 3"],
+            sorted(self.titles(page1) + self.titles(page2)),
+        )
+        self.assertEqual([], page2.cssselect(".pagination a"))
+
+    def test_bad_cursor(self):
+        url = reverse("search", kwargs={"filter": ArticleFilter.all})
+
+        response = self.client.get(url, {"q": "ship", "after": "???"})
+
+        self.assertEqual(400, response.status_code)
+
+    def test_api(self):
+        response = self.client.get("/api/search/", {"q": "ship", "filter": "unread", "label": self.label.pk})
+
+        self.assertEqual(200, response.status_code)
+        data = response.json()
+        self.assertEqual(["Ship 1"], [article["title"] for article in data["articles"]])
+        self.assertIsNone(data["next"])
+        self.assertEqual(400, self.client.get("/api/search/", {"q": "ship", "filter": "bogus"}).status_code)
+
+
+class NonAtomicRequestsTests(TestCase):
+    def test_write_queue_views(self):
+        """
+        Views which write via the write queue don't run in a transaction of
+        their own, which would keep a stale snapshot open while the writer
+        thread changes the database.
+        """
+        for view in [
+            views.feed_edit,
+            views.feed_add,
+            views.label_edit,
+            views.label_delete,
+            views.label_add,
+            views.flags,
+            views.inventory,
+        ]:
+            with self.subTest(view=view.__name__):
+                self.assertEqual({"default"}, view._non_atomic_requests)
+
 
 class FlagsViewTests(TestCase):
     def setUp(self):
@@ -819,6 +1148,135 @@ class FlagsViewTests(TestCase):
         )
 
 
+class ConditionalGetTests(TestCase):
+    """
+    Test revalidation of article lists and the inventory against the
+    user's change sequence.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="john",
+            email="john@mail.example",
+            password="sesame",
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.feed = self.user.feed_set.create(
+            url="http://example.com/feed.xml",
+            feed_title="Feed A",
+            added=timezone.now(),
+            next_check=timezone.now(),
+        )
+        self.label = self.user.label_set.create(text="Label")
+        self.label.feeds.add(self.feed)
+        self.article = self.feed.articles.create(
+            read=False,
+            fave=False,
+            author="",
+            title="Article",
+            url="http://example.com/1",
+            date=timezone.now(),
+            raw_content="...",
+            content="...",
+        )
+        self.urls = [
+            reverse("all-show", kwargs={"filter": ArticleFilter.unread}),
+            reverse("feed-show", kwargs={"feed_id": self.feed.pk, "filter": ArticleFilter.unread}),
+            reverse("label-show", kwargs={"label_id": self.label.pk, "filter": ArticleFilter.unread}),
+            "/api/inventory/",
+        ]
+
+    def etags(self):
+        return [self.client.get(url)["ETag"] for url in self.urls]
+
+    def test_not_modified(self):
+        """
+        A request with a matching ``If-None-Match`` header gets a 304
+        response without querying articles or feeds.
+        """
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(200, response.status_code)
+                self.assertEqual("private, no-cache", response["Cache-Control"])
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+                self.assertEqual(304, response.status_code)
+                self.assertEqual(b"", response.content)
+                self.assertEqual(
+                    [],
+                    [q["sql"] for q in queries if "yarrharr_article" in q["sql"] or "yarrharr_label" in q["sql"]],
+                )
+
+    def test_url(self):
+        """
+        The ETag depends on the URL, including the query string.
+        """
+        url = reverse("all-show", kwargs={"filter": ArticleFilter.all})
+        etags = self.etags() + [self.client.get(url)["ETag"], self.client.get(url, {"after": "1"})["ETag"]]
+
+        self.assertEqual(len(etags), len(set(etags)))
+
+    def test_flags(self):
+        """
+        Changing the flags of an article changes every ETag.
+        """
+        before = self.etags()
+
+        self.client.post(reverse("api-flags"), {"read": "true", "article": [str(self.article.pk)]})
+
+        for old, new in zip(before, self.etags()):
+            self.assertNotEqual(old, new)
+
+    def test_inventory_edit(self):
+        """
+        Editing the inventory changes every ETag. No ETag is returned in
+        response to the POST.
+        """
+        before = self.etags()
+
+        response = self.client.post(
+            "/api/inventory/",
+            {"action": "update-label", "label": str(self.label.pk), "text": "Renamed", "feed": [str(self.feed.pk)]},
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn("ETag", response)
+        for old, new in zip(before, self.etags()):
+            self.assertNotEqual(old, new)
+
+    def test_poll(self):
+        """
+        A poll which only reschedules the feed leaves the ETags of the
+        article lists alone, but changes that of the inventory as it shows
+        when the feed was last checked.
+        """
+        before = self.etags()
+
+        self.feed.last_checked = timezone.now()
+        self.feed.next_check = timezone.now() + timedelta(hours=1)
+        self.feed.save()
+
+        after = self.etags()
+        self.assertEqual(before[:3], after[:3])
+        self.assertNotEqual(before[3], after[3])
+
+    def test_no_feeds(self):
+        """
+        A user who has never had any feeds gets no ETag.
+        """
+        user = User.objects.create_user(username="jane", email="jane@mail.example", password="sesame")
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("all-show", kwargs={"filter": ArticleFilter.unread}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn("ETag", response)
+
+
 class ManifestTests(TestCase):
     def test_get(self):
         """
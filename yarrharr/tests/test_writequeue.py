@@ -0,0 +1,239 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+import queue
+import threading
+from concurrent.futures import Future
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.test import TransactionTestCase
+
+from ..writequeue import BULK, INTERACTIVE, WriteQueue
+
+
+class ThreadReactor(object):
+    """
+    Stub of ``IReactorThreads`` whose calls are run by `pump()` in the test's
+    thread.
+    """
+
+    def __init__(self):
+        self._calls = queue.Queue()
+
+    def callFromThread(self, f, *args, **kwargs):
+        self._calls.put((f, args, kwargs))
+
+    def pump(self):
+        """
+        Wait for a call from another thread and run it.
+        """
+        f, args, kwargs = self._calls.get(timeout=10)
+        f(*args, **kwargs)
+
+
+class WriteQueueTests(TransactionTestCase):
+    """
+    Test `yarrharr.writequeue.WriteQueue`.
+    """
+
+    def setUp(self):
+        self.reactor = ThreadReactor()
+        self.queue = WriteQueue()
+        self.events = []
+
+    def tearDown(self):
+        if self.queue.running:
+            d = self.queue.stop()
+            while not d.called:
+                self.reactor.pump()
+
+    def job(self, name):
+        """
+        A job which records when it runs and when its transaction commits.
+        """
+        self.events.append(("run", name))
+        transaction.on_commit(lambda: self.events.append(("commit", name)))
+        return name
+
+    def block(self):
+        """
+        Queue a job which occupies the writer thread until the returned event
+        is set.
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(10)
+
+        self.queue.submit(blocker)
+        started.wait(10)
+        return release
+
+    def test_inline(self):
+        """
+        Until the queue is started jobs run in a transaction in the calling
+        thread.
+        """
+        result = self.queue.call(lambda: (threading.current_thread(), connection.in_atomic_block))
+
+        self.assertEqual((threading.current_thread(), True), result)
+
+    def test_call(self):
+        """
+        Once started, `WriteQueue.call()` runs the job in the writer thread
+        and returns its result.
+        """
+        self.queue.start(self.reactor)
+
+        name = self.queue.call(lambda: threading.current_thread().name)
+
+        self.assertEqual("yarrharr-writer", name)
+
+    def test_submit(self):
+        """
+        `WriteQueue.submit()` returns a `Deferred` which fires in the reactor
+        thread after the job's transaction has committed.
+        """
+        self.queue.start(self.reactor)
+
+        d = self.queue.submit(self.job, "a")
+        self.reactor.pump()
+
+        self.assertEqual("a", d.result)
+        self.assertEqual([("run", "a"), ("commit", "a")], self.events)
+
+    def test_priority_batch(self):
+        """
+        Interactive jobs run before bulk ones, and queued jobs of the same
+        priority share a transaction.
+        """
+        self.queue.start(self.reactor)
+        release = self.block()
+
+        self.queue.submit(self.job, "bulk1")
+        self.queue.submit(self.job, "bulk2", priority=BULK)
+        self.queue.submit(self.job, "interactive1", priority=INTERACTIVE)
+        self.queue.submit(self.job, "interactive2", priority=INTERACTIVE)
+        release.set()
+        for _ in range(5):
+            self.reactor.pump()
+
+        self.assertEqual(
+            [
+                ("run", "interactive1"),
+                ("run", "interactive2"),
+                ("commit", "interactive1"),
+                ("commit", "interactive2"),
+                ("run", "bulk1"),
+                ("run", "bulk2"),
+                ("commit", "bulk1"),
+                ("commit", "bulk2"),
+            ],
+            self.events,
+        )
+
+    def test_max_batch(self):
+        """
+        No more than *max_batch* jobs share a transaction.
+        """
+        self.queue.max_batch = 2
+        self.queue.start(self.reactor)
+        release = self.block()
+
+        for name in "abc":
+            self.queue.submit(self.job, name)
+        release.set()
+        for _ in range(4):
+            self.reactor.pump()
+
+        self.assertEqual(
+            [
+                ("run", "a"),
+                ("run", "b"),
+                ("commit", "a"),
+                ("commit", "b"),
+                ("run", "c"),
+                ("commit", "c"),
+            ],
+            self.events,
+        )
+
+    def test_error(self):
+        """
+        An exception raised by a job rolls back its changes alone, and fails
+        its `Deferred`.
+        """
+        self.queue.start(self.reactor)
+        release = self.block()
+
+        def fail():
+            User.objects.create(username="fail")
+            raise ZeroDivisionError()
+
+        d1 = self.queue.submit(lambda: User.objects.create(username="ok"))
+        d2 = self.queue.submit(fail)
+        release.set()
+        for _ in range(3):
+            self.reactor.pump()
+
+        self.assertEqual("ok", d1.result.username)
+        d2.addErrback(lambda f: f.trap(ZeroDivisionError))
+        self.assertEqual(["ok"], list(User.objects.values_list("username", flat=True)))
+
+    def test_transaction_error(self):
+        """
+        When the transaction fails every job of the batch fails, including
+        those which didn't get to run.
+        """
+        batch = [(BULK, i, Future(), self.job, (name,)) for i, name in enumerate("ab")]
+
+        with mock.patch("yarrharr.writequeue.transaction.atomic", side_effect=OperationalError("database is locked")):
+            self.queue._write(batch)
+
+        for _, _, future, _, _ in batch:
+            self.assertRaises(OperationalError, future.result, 0)
+        self.assertEqual([], self.events)
+
+    def test_stop(self):
+        """
+        Stopping the queue writes the jobs already queued. Later jobs run in
+        the calling thread.
+        """
+        self.queue.start(self.reactor)
+        release = self.block()
+
+        d = self.queue.submit(self.job, "queued")
+        stopped = self.queue.stop()
+        release.set()
+        while not stopped.called:
+            self.reactor.pump()
+
+        self.assertEqual("queued", d.result)
+        self.assertFalse(self.queue.running)
+        self.assertEqual(threading.current_thread(), self.queue.call(threading.current_thread))
@@ -55,6 +55,7 @@ urlpatterns = (
         name="feed-show",
     ),
     path("article/<int:article_id>/", yarrharr.views.article_show, name="article-show"),
+    path("search/<filter:filter>/", yarrharr.views.search, name="search"),
     # Old URLs
     re_path(
         R"^all/(?:unread|fave|all)/(?P<article_id>\d+)/$",
@@ -71,6 +72,7 @@ urlpatterns = (
     # API
     re_path(r"^api/flags/$", yarrharr.views.flags, name="api-flags"),
     re_path(r"^api/inventory/$", yarrharr.views.inventory),
+    re_path(r"^api/search/$", yarrharr.views.search_api, name="api-search"),
     re_path(
         r"^login/$",
         auth_views.LoginView.as_view(template_name="login.html"),
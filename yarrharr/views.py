@@ -22,26 +22,40 @@
 # the resulting work.  Corresponding Source for a non-source form of
 # such a combination shall include the source code for the parts of
 # OpenSSL used as well as that of the covered work.
+import binascii
+import hashlib
 import json
+import struct
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as tz
 
 import django
 import feedparser
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import BadRequest
 from django.db import connection, transaction
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, DateTimeField, F, Field, Func, IntegerField, Max, Q, Value
+from django.db.models.lookups import GreaterThan, LessThan
 from django.forms import CharField, ModelForm, ModelMultipleChoiceField, ValidationError
 from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from twisted.logger import Logger
 
 import yarrharr
 
 from .enums import ArticleFilter
-from .models import AllViewOptions, Article, Feed, Label, Sort
+from .models import AllViewOptions, Article, Feed, Label, Sort, UserCounts
+from .resanitize import resanitize_stale
+from .search import SEARCH_DEPTH, search_articles
 from .signals import schedule_changed
 from .sql import log_on_error
+from .writequeue import write_queue
 
 log = Logger()
 
@@ -96,7 +110,11 @@ def json_for_article(article):
     }
 
 
-def json_for_feed(feed):
+def json_for_feed(feed, label_ids):
+    """
+    :param feed: :class:`~yarrharr.models.Feed` to serialize
+    :param label_ids: Sorted IDs of the labels applied to the feed
+    """
     return {
         "id": feed.id,
         "title": feed.feed_title,
@@ -104,7 +122,7 @@ def json_for_feed(feed):
         "active": feed.next_check is not None,
         "unreadCount": feed.unread_count,
         "faveCount": feed.fave_count,
-        "labels": sorted(feed.label_set.all().values_list("id", flat=True)),
+        "labels": label_ids,
         "url": feed.url,
         "siteUrl": feed.site_url,
         "added": ms_timestamp(feed.added),
@@ -115,50 +133,59 @@ def json_for_feed(feed):
     }
 
 
-def feeds_for_user(user):
+def json_for_label(label, feed_ids):
+    """
+    :param label: :class:`~yarrharr.models.Label` to serialize
+    :param feed_ids: Sorted IDs of the feeds the label is applied to
+    """
+    return {
+        "id": label.id,
+        "text": label.text,
+        "feeds": feed_ids,
+        "unreadCount": label.unread_count,
+        "faveCount": label.fave_count,
+    }
+
+
+def inventory_for_user(user):
+    """
+    Build the feed and label metadata returned by the :func:`inventory` view.
+
+    This takes three queries no matter how many feeds and labels the user has:
+    one each for the feeds, the labels, and the links between them.
+    """
+    label_ids_by_feed = defaultdict(list)
+    feed_ids_by_label = defaultdict(list)
+    links = Label.feeds.through.objects.filter(label__user=user).order_by("label_id", "feed_id").values_list("label_id", "feed_id")
+    for label_id, feed_id in links:
+        label_ids_by_feed[feed_id].append(label_id)
+        feed_ids_by_label[label_id].append(feed_id)
+
     feeds_by_id = {}
     feed_order_decorated = []
     for feed in user.feed_set.all():
-        feeds_by_id[feed.id] = json_for_feed(feed)
+        feeds_by_id[feed.id] = json_for_feed(feed, label_ids_by_feed[feed.id])
         feed_order_decorated.append((human_sort_key(feed.title), feed.id))
     # XXX It would be nice to do this sorting in the database, but sqlite3 does
     # not ship with appropriate collations. Custom collations can be installed,
     # but there isn't much advantage to doing so right now given we always
     # query all feeds anyway.
     feed_order_decorated.sort()
-    return {
-        "feedsById": feeds_by_id,
-        "feedOrder": list(pk for _, pk in feed_order_decorated),
-    }
 
-
-def labels_for_user(user):
     labels_by_id = {}
     label_order_decorated = []
     for label in user.label_set.all():
-        labels_by_id[label.id] = json_for_label(label)
+        labels_by_id[label.id] = json_for_label(label, feed_ids_by_label[label.id])
         label_order_decorated.append((human_sort_key(label.text), label.id))
+
     return {
+        "feedsById": feeds_by_id,
+        "feedOrder": list(pk for _, pk in feed_order_decorated),
         "labelsById": labels_by_id,
         "labelOrder": list(pk for _, pk in label_order_decorated),
     }
 
 
-def json_for_label(label):
-    counts = label.feeds.all().aggregate(
-        unread=Sum("unread_count"),
-        fave=Sum("fave_count"),
-    )
-    return {
-        "id": label.id,
-        "text": label.text,
-        "feeds": list(label.feeds.all().order_by("id").values_list("id", flat=True)),
-        # Aggregations return NULL if there are no feeds; translate that into 0.
-        "unreadCount": counts["unread"] or 0,
-        "faveCount": counts["fave"] or 0,
-    }
-
-
 def entries_for_snapshot(user, params):
     """
     Return a queryset containing entries which match the given params.
@@ -229,26 +256,124 @@ def snapshot_params_from_query(query_dict, user_feeds):
     }
 
 
+class _Row(Func):
+    """
+    An SQL row value like ``(date, id)``. Row values compare
+    lexicographically, so a comparison can be served by a range scan of an
+    index on the same columns.
+    """
+
+    function = ""
+    template = "(%(expressions)s)"
+    output_field = Field()
+
+
+class _Unindexed(Func):
+    """
+    Wrap a column in SQLite's unary ``+`` operator, which leaves its value
+    unchanged but stops the query planner from using an index on it.
+    """
+
+    function = ""
+    template = "+%(expressions)s"
+
+
+def articles_in_feeds(feeds):
+    """
+    Query the articles of several feeds for :func:`sort_and_filter_articles()`.
+
+    The feed of each article is checked as it is read from one of the
+    (date, id) indexes, which yields articles in order. The query planner
+    would otherwise prefer the per-feed indexes, unless statistics gathered by
+    ``ANALYZE`` say otherwise, and sort every article after the cursor.
+
+    :param feeds: :class:`QuerySet` of :class:`~yarrharr.models.Feed`
+    """
+    return Article.objects.alias(unindexed_feed_id=_Unindexed(F("feed_id"), output_field=IntegerField())).filter(
+        unindexed_feed_id__in=feeds.values("id")
+    )
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=tz.utc)
+_CURSOR = struct.Struct(">Bqq")
+_CURSOR_VERSION = 1
+
+
+def encode_cursor(article) -> str:
+    """
+    Encode the sort key of an article, (date, id), as a pagination cursor.
+
+    The cursor is opaque to the client. It always starts with a letter so that
+    it can't be confused with the plain article ID used by older versions.
+    """
+    micros = (article.date - _EPOCH) // timedelta(microseconds=1)
+    raw = _CURSOR.pack(_CURSOR_VERSION, micros, article.id)
+    return urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """
+    Decode a cursor produced by :func:`encode_cursor()`.
+
+    :returns: (:class:`datetime.datetime`, :class:`int`) tuple
+    :raises ValueError: when the cursor is malformed
+    """
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, micros, id = _CURSOR.unpack(raw)
+    except (binascii.Error, struct.error) as e:
+        raise ValueError("Malformed cursor {!r}".format(cursor)) from e
+    if version != _CURSOR_VERSION:
+        raise ValueError("Unknown cursor version {}".format(version))
+    return _EPOCH + timedelta(microseconds=micros), id
+
+
 def sort_and_filter_articles(qs, viewoptions, filt: ArticleFilter, after=None):
-    if after is not None:
-        # FIXME: What we really want is to filter on (date, id) >=
-        # (after_article.date, after_article.id), but I haven't figured out how
-        # to express that in the Django ORM. Filtering only by date will work
-        # well enough in the usual case that articles don't have duplicate
-        # dates, but if a series of articles with identical dates fall at the
-        # page boundry it can skip past some.
-        after_date = qs.get(pk=after).date
+    """
+    Get a page of articles.
+
+    Pages are in (date, id) order and are fetched by keyset pagination: the
+    query for a page starts immediately after the sort key of the last article
+    on the previous page, so each page is a range scan of an index no matter
+    how deep it is.
+
+    :param qs: :class:`QuerySet` of articles to page through
+    :param viewoptions: :class:`~yarrharr.models._ViewOptions` giving the sort
+    :param filt: Which articles to include
+    :param str after:
+        Cursor from a previous call, or `None` to get the first page. For
+        compatibility with old links this may also be the ID of the last
+        article on the previous page.
+
+    :returns:
+        Two-tuple of a :class:`list` of articles and the cursor for the next
+        page, or `None` when this is the last page.
+    :raises BadRequest: when *after* isn't valid
+    """
+    if after is None:
+        key = None
+    elif after.isdigit():
+        try:
+            key = qs.values_list("date", "id").get(pk=after)
+        except Article.DoesNotExist:
+            raise BadRequest("Article {} not found".format(after))
     else:
-        after_date = None
+        try:
+            key = decode_cursor(after)
+        except ValueError as e:
+            raise BadRequest(str(e))
+
+    if key is not None:
+        key = _Row(Value(key[0], output_field=DateTimeField()), Value(key[1]))
 
     if viewoptions.sort == Sort.ASC:
         qs = qs.order_by("date", "id")
-        if after_date is not None:
-            qs = qs.filter(date__gt=after_date)
+        if key is not None:
+            qs = qs.filter(GreaterThan(_Row(F("date"), F("id")), key))
     elif viewoptions.sort == Sort.DESC:
         qs = qs.order_by("-date", "-id")
-        if after_date is not None:
-            qs = qs.filter(date__lt=after_date)
+        if key is not None:
+            qs = qs.filter(LessThan(_Row(F("date"), F("id")), key))
     else:
         assert 0
 
@@ -262,12 +387,62 @@ def sort_and_filter_articles(qs, viewoptions, filt: ArticleFilter, after=None):
     articles = list(qs.prefetch_related("feed")[: PAGE_SIZE + 1])
     if len(articles) > PAGE_SIZE:
         articles.pop()
-        after = articles[-1].pk
+        after = encode_cursor(articles[-1])
     else:
         after = None
+    resanitize_stale(articles)
     return articles, after
 
 
+def change_etag(request, *args, **kwargs):
+    """
+    Compute a weak ETag for a page of the user's articles or feeds from
+    `UserCounts.change_seq` and the URL of the request, for use with
+    :func:`~django.views.decorators.http.condition`.
+
+    This costs a single primary key lookup, so a request with a matching
+    ``If-None-Match`` gets a 304 without running any of the queries of the
+    view. The sequence is read before the view runs, so a change which races
+    the view can only make the ETag stale, never too new.
+
+    :returns:
+        The ETag, or `None` if the request isn't a GET or HEAD or the user
+        has never had any feeds.
+    """
+    seq = _change_seq(request)
+    if seq is None:
+        return None
+    return _etag(request, seq)
+
+
+def inventory_etag(request):
+    """
+    Compute the ETag for the :func:`inventory`. The inventory also includes
+    when each feed was last checked, which doesn't bump the change sequence
+    as it changes on every poll, so the most recent check is mixed in.
+    """
+    seq = _change_seq(request)
+    if seq is None:
+        return None
+    checked = request.user.feed_set.aggregate(checked=Max("last_checked"))["checked"]
+    return _etag(request, seq, ms_timestamp(checked))
+
+
+def _change_seq(request):
+    if request.method not in ("GET", "HEAD"):
+        return None
+    try:
+        return UserCounts.objects.values_list("change_seq", flat=True).get(user=request.user)
+    except UserCounts.DoesNotExist:
+        return None
+
+
+def _etag(request, *parts):
+    # The version covers changes to the templates.
+    key = "\0".join(str(part) for part in (yarrharr.__version__, request.user.pk, request.get_full_path(), *parts))
+    return 'W/"{}"'.format(hashlib.blake2b(key.encode(), digest_size=16).hexdigest())
+
+
 @login_required
 def home(request):
     """
@@ -284,21 +459,20 @@ def home(request):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=change_etag)
 def all_show(request, filter: ArticleFilter):
     """
     List the all articles
     """
     viewoptions, _ = AllViewOptions.objects.get_or_create(user=request.user)
     articles, next_page_after = sort_and_filter_articles(
-        Article.objects.filter(feed__id__in=request.user.feed_set.all()),
+        articles_in_feeds(request.user.feed_set.all()),
         viewoptions,
         filter,
         after=request.GET.get("after"),
     )
-    counts = request.user.feed_set.aggregate(
-        all_unread_count=Sum("unread_count"),
-        all_fave_count=Sum("fave_count"),
-    )
+    counts = UserCounts.for_user(request.user)
 
     return render(
         request,
@@ -307,12 +481,89 @@ def all_show(request, filter: ArticleFilter):
             "articles": articles,
             "next_page_after": next_page_after,
             "filter": filter,
-            **counts,
+            "all_unread_count": counts.unread_count,
+            "all_fave_count": counts.fave_count,
             "tabs_selected": {f"all-{filter.name}"},
         },
     )
 
 
+def _search_scope(request):
+    """
+    Determine which feeds a search covers: those with the label given by the
+    ``label`` query parameter, the feed given by ``feed``, or else all of the
+    user's feeds.
+
+    :returns: two-tuple of a :class:`QuerySet` of feeds and the
+        :class:`Label` or :class:`Feed` which scopes the search, if any
+    :raises BadRequest: when the parameter isn't an integer
+    """
+    for param, qs in (("label", request.user.label_set), ("feed", request.user.feed_set)):
+        value = request.GET.get(param)
+        if value is None:
+            continue
+        if not value.isdigit():
+            raise BadRequest("Invalid {} {!r}".format(param, value))
+        scope = get_object_or_404(qs, pk=value)
+        if param == "label":
+            return scope.feeds.all(), scope
+        return request.user.feed_set.filter(pk=scope.pk), scope
+    return request.user.feed_set.all(), None
+
+
+def _search(request, filter: ArticleFilter):
+    feeds, scope = _search_scope(request)
+    query = request.GET.get("q", "")
+    if not query.strip():
+        return [], None, scope, query
+    try:
+        articles, after = search_articles(feeds, query, filter, after=request.GET.get("after"))
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return articles, after, scope, query
+
+
+@login_required
+def search(request, filter: ArticleFilter):
+    """
+    Search the articles of the user's feeds.
+
+    Matches are ranked in windows, newest first, as explained under the form
+    (see :mod:`yarrharr.search`).
+
+    :query q: The search (see :func:`yarrharr.search.parse_query()`)
+    :query label: Optional ID of a label to search the feeds of
+    :query feed: Optional ID of a feed to search
+    :query after: Cursor for the next page of results
+    """
+    articles, next_page_after, scope, query = _search(request, filter)
+    resanitize_stale(articles)
+    scope_query = request.GET.copy()
+    scope_query.pop("after", None)
+    next_page_query = None
+    if next_page_after is not None:
+        next_page_query = scope_query.copy()
+        next_page_query["after"] = next_page_after
+        next_page_query = next_page_query.urlencode()
+
+    return render(
+        request,
+        "search.html",
+        {
+            "articles": articles,
+            "next_page_after": next_page_after,
+            "next_page_query": next_page_query,
+            "query": query,
+            "scope": scope,
+            "scope_param": "label" if isinstance(scope, Label) else "feed",
+            "scope_query": scope_query.urlencode(),
+            "search_depth": SEARCH_DEPTH,
+            "filter": filter,
+            "tabs_selected": {"global-search", f"search-{filter.name}"},
+        },
+    )
+
+
 @login_required
 def feed_list(request):
     """
@@ -336,6 +587,8 @@ def feed_list(request):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=change_etag)
 def feed_show(request, feed_id: int, filter: ArticleFilter):
     """
     List the articles in a feed
@@ -392,6 +645,7 @@ class FeedForm(ModelForm):
 
 
 @login_required
+@transaction.non_atomic_requests
 def feed_edit(request, feed_id: int):
     """
     Edit a feed.
@@ -400,7 +654,7 @@ def feed_edit(request, feed_id: int):
     if request.method == "POST":
         form = FeedForm(request.POST, instance=feed)
         if form.is_valid():
-            form.save()
+            write_queue.call(form.save)
             schedule_changed.send(None)
             return HttpResponseRedirect(
                 reverse("feed-edit", kwargs={"feed_id": feed.pk}),
@@ -429,6 +683,7 @@ class FeedAddForm(ModelForm):
 
 
 @login_required
+@transaction.non_atomic_requests
 def feed_add(request):
     """
     Add a new feed.
@@ -440,7 +695,7 @@ def feed_add(request):
             feed = form.save(commit=False)
             feed.added = timezone.now()
             feed.next_check = timezone.now()
-            feed.save()
+            write_queue.call(feed.save)
             schedule_changed.send(None)
             return HttpResponseRedirect(
                 reverse(
@@ -467,12 +722,7 @@ def label_list(request):
     """
     Display a list of labels
     """
-    labels = request.user.label_set.all().annotate(
-        feed_count=Count("feeds"),
-        # TODO: Verify these give the correct results.
-        unread_count=Sum("feeds__unread_count"),
-        fave_count=Sum("feeds__fave_count"),
-    )
+    labels = request.user.label_set.all().annotate(feed_count=Count("feeds"))
     return render(
         request,
         "label_list.html",
@@ -491,17 +741,15 @@ def label_list(request):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=change_etag)
 def label_show(request, label_id: int, filter: ArticleFilter):
     """
     List the articles in a feed.
     """
     label = get_object_or_404(request.user.label_set, pk=label_id)
-    counts = label.feeds.aggregate(
-        label_unread_count=Sum("unread_count"),
-        label_fave_count=Sum("fave_count"),
-    )
     articles, next_page_after = sort_and_filter_articles(
-        Article.objects.filter(feed__id__in=label.feeds.all()),
+        articles_in_feeds(label.feeds.all()),
         label,
         filter,
         after=request.GET.get("after"),
@@ -512,7 +760,6 @@ def label_show(request, label_id: int, filter: ArticleFilter):
         "label_show.html",
         {
             "label": label,
-            **counts,
             "articles": articles,
             "next_page_after": next_page_after,
             "filter": filter,
@@ -557,22 +804,28 @@ class LabelForm(ModelForm):
         data = self.cleaned_data["feeds"]
         return self.instance.user.feed_set.intersection(data)
 
+    def save(self, commit=True):
+        if self.instance.pk is None or not commit:
+            return super().save(commit)
+        # Only save the text. The counts are maintained by trigger, so the
+        # values loaded with the label may be stale by now.
+        self.instance.save(update_fields=["text"])
+        self._save_m2m()
+        return self.instance
+
 
 @login_required
+@transaction.non_atomic_requests
 def label_edit(request, label_id: int):
     """
     Edit a label.
     """
     # TODO: Display a form, handle POST. Generic view?
     label = get_object_or_404(request.user.label_set, pk=label_id)
-    counts = label.feeds.aggregate(
-        label_unread_count=Sum("unread_count"),
-        label_fave_count=Sum("fave_count"),
-    )
     if request.method == "POST":
         form = LabelForm(request.POST, instance=label)
         if form.is_valid():
-            form.save()
+            write_queue.call(form.save)
             return HttpResponseRedirect(
                 reverse("label-edit", kwargs={"label_id": label.pk}),
             )
@@ -584,13 +837,13 @@ def label_edit(request, label_id: int):
         {
             "label": label,
             "form": form,
-            **counts,
             "tabs_selected": {"global-label-list", "label-edit"},
         },
     )
 
 
 @login_required
+@transaction.non_atomic_requests
 def label_delete(request, label_id: int):
     """
     Delete a label.
@@ -598,7 +851,7 @@ def label_delete(request, label_id: int):
     label = get_object_or_404(request.user.label_set, pk=label_id)
 
     if request.method == "POST":
-        label.delete()
+        write_queue.call(label.delete)
     else:
         return HttpResponseNotAllowed(["POST"])
 
@@ -606,6 +859,7 @@ def label_delete(request, label_id: int):
 
 
 @login_required
+@transaction.non_atomic_requests
 def label_add(request):
     """
     Add a new label.
@@ -614,8 +868,7 @@ def label_add(request):
     if request.method == "POST":
         form = LabelForm(request.POST, instance=label)
         if form.is_valid():
-            label = form.save(commit=True)
-            label.save()
+            label = write_queue.call(form.save)
             return HttpResponseRedirect(
                 reverse(
                     "label-show",
@@ -645,6 +898,7 @@ def article_show(request, article_id: int):
         Article.objects.filter(feed__in=request.user.feed_set.all()),
         pk=article_id,
     )
+    resanitize_stale([article])
 
     return render(
         request,
@@ -689,10 +943,38 @@ def redirect_to_article(request, article_id: str):
 
 
 @login_required
+def search_api(request):
+    """
+    Search the articles of the user's feeds, returning JSON.
+
+    Takes the same parameters as :func:`search`, plus ``filter``, one of
+    "unread", "fave", or "all" (the default). The response is an object with
+    the members ``articles``, a list of articles in rank order, and
+    ``next``, the value of ``after`` to get the next page, or ``null``. A
+    page may be empty while ``next`` isn't ``null``: its window of matches
+    held none in the feeds searched.
+    """
+    try:
+        filter = ArticleFilter[request.GET.get("filter", "all")]
+    except KeyError:
+        raise BadRequest("Invalid filter")
+    articles, after, _, _ = _search(request, filter)
+    data = {
+        "articles": [json_for_article(article) for article in articles],
+        "next": after,
+    }
+    return HttpResponse(json.dumps(data), content_type="application/json")
+
+
+@login_required
+@transaction.non_atomic_requests
 def flags(request):
     """
     Change the flags of articles.
 
+    The change is made by the `~yarrharr.writequeue.write_queue`. The view
+    isn't atomic so that it reads back the result.
+
     :query read: One of "true" or "false".
     :query fave: One of "true" or "false".
     :query article: One or more article IDs.
@@ -712,8 +994,7 @@ def flags(request):
             updates["fave"] = False
     qs = articles_for_request(request)
     if updates:
-        with connection.execute_wrapper(log_on_error):
-            qs.update(**updates)
+        write_queue.call(_update_flags, qs, updates)
     data = {
         id_: {
             "fave": fave,
@@ -724,7 +1005,15 @@ def flags(request):
     return HttpResponse(json.dumps(data), content_type="application/json")
 
 
+def _update_flags(qs, updates):
+    with connection.execute_wrapper(log_on_error):
+        qs.update(**updates)
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=inventory_etag)
+@transaction.non_atomic_requests
 def inventory(request):
     """
     Manipulate feeds and labels.
@@ -755,62 +1044,75 @@ def inventory(request):
 
     POST returns the full feed and label metadata just like GET, in the
     ``"labelsById"`` and ``"feedsById"`` members of the JSON response body.
+    Changes are made by the `~yarrharr.writequeue.write_queue`, so the view
+    isn't atomic.
     """
     if request.method == "POST":
         action = request.POST["action"]
         data = {}
         if action == "create-feed":
-            feed_url = request.POST["url"]
-            with transaction.atomic():
-                feed = request.user.feed_set.create(
-                    feed_title=feed_url,
-                    url=feed_url,
-                    added=timezone.now(),
-                    next_check=timezone.now(),  # check ASAP
-                )
+            feed = write_queue.call(_create_feed, request.user, request.POST["url"])
             data["feedId"] = feed.id
             schedule_changed.send(None)
         elif action == "update-feed":
-            with transaction.atomic():
-                feed = request.user.feed_set.get(id=request.POST["feed"])
-                feed.url = request.POST["url"]
-                feed.user_title = request.POST["title"]
-                new_labels = request.user.label_set.filter(pk__in=request.POST.getlist("label"))
-                feed.label_set.set(new_labels)
-                if request.POST["active"] == "on":
-                    feed.next_check = timezone.now()
-                else:
-                    feed.next_check = None
-                feed.save()
+            write_queue.call(_update_feed, request.user, request.POST)
             schedule_changed.send(None)
         elif action == "update-label":
-            with transaction.atomic():
-                label = request.user.label_set.get(id=request.POST["label"])
-                label.text = request.POST["text"]
-                new_feeds = request.user.feed_set.filter(pk__in=request.POST.getlist("feed"))
-                label.feeds.set(new_feeds)
-                label.save()
+            write_queue.call(_update_label, request.user, request.POST)
         elif action == "remove":
-            with transaction.atomic():
-                for feed in request.user.feed_set.filter(pk__in=request.POST.getlist("feed")):
-                    feed.delete()
-                for label in request.user.label_set.filter(pk__in=request.POST.getlist("label")):
-                    label.delete()
+            write_queue.call(_remove, request.user, request.POST)
             schedule_changed.send(None)
         else:
             raise ValueError(action)
 
-        data.update(labels_for_user(request.user))
-        data.update(feeds_for_user(request.user))
+        data.update(inventory_for_user(request.user))
         return HttpResponse(json.dumps(data), content_type="application/json")
     elif request.method == "GET":
-        data = labels_for_user(request.user)
-        data.update(feeds_for_user(request.user))
+        data = inventory_for_user(request.user)
         return HttpResponse(json.dumps(data), content_type="application/json")
     else:
         return HttpResponseNotAllowed(["GET", "POST"])
 
 
+def _create_feed(user, feed_url):
+    return user.feed_set.create(
+        feed_title=feed_url,
+        url=feed_url,
+        added=timezone.now(),
+        next_check=timezone.now(),  # check ASAP
+    )
+
+
+def _update_feed(user, params):
+    feed = user.feed_set.get(id=params["feed"])
+    feed.url = params["url"]
+    feed.user_title = params["title"]
+    new_labels = user.label_set.filter(pk__in=params.getlist("label"))
+    feed.label_set.set(new_labels)
+    if params["active"] == "on":
+        feed.next_check = timezone.now()
+    else:
+        feed.next_check = None
+    feed.save()
+
+
+def _update_label(user, params):
+    label = user.label_set.get(id=params["label"])
+    label.text = params["text"]
+    new_feeds = user.feed_set.filter(pk__in=params.getlist("feed"))
+    label.feeds.set(new_feeds)
+    # Only save the text. The counts were changed by trigger when
+    # the feeds were set, so the values in memory are stale.
+    label.save(update_fields=["text"])
+
+
+def _remove(user, params):
+    for feed in user.feed_set.filter(pk__in=params.getlist("feed")):
+        feed.delete()
+    for label in user.label_set.filter(pk__in=params.getlist("label")):
+        label.delete()
+
+
 def manifest(request):
     """
     Generate a Web App Manifest for the application.
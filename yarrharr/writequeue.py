@@ -0,0 +1,231 @@
+# Copyright © 2026 Tom Most <twm@freecog.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Additional permission under GNU GPL version 3 section 7
+#
+# If you modify this Program, or any covered work, by linking or
+# combining it with OpenSSL (or a modified version of that library),
+# containing parts covered by the terms of the OpenSSL License, the
+# licensors of this Program grant you additional permission to convey
+# the resulting work.  Corresponding Source for a non-source form of
+# such a combination shall include the source code for the parts of
+# OpenSSL used as well as that of the covered work.
+
+"""
+The database write queue
+
+SQLite permits only one writer at a time. Rather than have threads contend
+for the lock, database writes are submitted to `write_queue`, which runs them
+one after another in a dedicated thread with its own long-lived connection.
+
+Queued jobs of the same priority are written in one transaction, each within
+a savepoint so that an exception raised by one job doesn't affect the others.
+Jobs with the `INTERACTIVE` priority, submitted on behalf of web requests,
+are run before those with the `BULK` priority, like the results of polling
+feeds.
+
+Until the queue is started jobs run in the thread which submits them. This is
+the case in tests.
+"""
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+from django.db import connection, transaction
+from twisted.internet import defer
+from twisted.internet.threads import deferToThread
+from twisted.logger import Logger
+from twisted.python.failure import Failure
+
+log = Logger()
+
+#: Priority of writes made on behalf of a web request.
+INTERACTIVE = 0
+
+#: Priority of background writes.
+BULK = 10
+
+
+class WriteQueue(object):
+    """
+    Runs database writes in a dedicated thread, in order of priority.
+
+    :ivar int max_batch:
+        Maximum number of jobs written in one transaction.
+    """
+
+    def __init__(self, max_batch=100):
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        """
+        Whether the writer thread has been started and not stopped.
+        """
+        return self._thread is not None
+
+    def start(self, reactor):
+        """
+        Start the writer thread.
+
+        :param reactor: ``IReactorThreads`` provider in which the
+            :class:`Deferred` results of :meth:`submit()` fire
+        """
+        if self._thread is not None:
+            raise RuntimeError("The write queue is already running")
+        self._reactor = reactor
+        self._stopping = False
+        self._stopped = defer.Deferred()
+        self._thread = threading.Thread(target=self._run, name="yarrharr-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the writer thread once the jobs already queued have been written.
+        Jobs submitted from then on run in the submitting thread.
+
+        :returns: :class:`Deferred` which fires when the thread has exited
+        """
+        if self._thread is None:
+            return defer.succeed(None)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        return self._stopped
+
+    def call(self, fn, *args, priority=INTERACTIVE):
+        """
+        Call *fn* in a transaction in the writer thread and wait for the
+        result. This must not be called from the reactor thread, nor from the
+        writer thread.
+
+        :returns: the return value of *fn*
+        :raises: whatever *fn* raises
+        """
+        future = self._put(priority, fn, args)
+        if future is None:
+            with transaction.atomic():
+                return fn(*args)
+        return future.result()
+
+    def submit(self, fn, *args, priority=BULK):
+        """
+        Call *fn* in a transaction in the writer thread. This must be called
+        from the reactor thread.
+
+        :returns: :class:`Deferred` which fires with the return value of *fn*
+        """
+        future = self._put(priority, fn, args)
+        if future is None:
+            return deferToThread(transaction.atomic()(fn), *args)
+
+        d = defer.Deferred()
+
+        def done(future):
+            try:
+                result = future.result()
+            except BaseException:
+                self._reactor.callFromThread(d.errback, Failure())
+            else:
+                self._reactor.callFromThread(d.callback, result)
+
+        future.add_done_callback(done)
+        return d
+
+    def _put(self, priority, fn, args):
+        """
+        Queue a job.
+
+        :returns: :class:`concurrent.futures.Future` for the result, or
+            `None` if the writer thread isn't running
+        """
+        with self._cond:
+            if self._thread is None or self._stopping:
+                return None
+            future = Future()
+            # The sequence number keeps jobs of the same priority in order,
+            # and means that the future is never compared.
+            heapq.heappush(self._heap, (priority, next(self._seq), future, fn, args))
+            self._cond.notify()
+        return future
+
+    def _take(self):
+        """
+        Wait for jobs to be queued, then remove a batch of them which share
+        the highest priority.
+
+        :returns: :class:`list` of jobs, empty when the thread should exit
+        """
+        with self._cond:
+            while not self._heap and not self._stopping:
+                self._cond.wait()
+            batch = []
+            while self._heap and len(batch) < self.max_batch and (not batch or self._heap[0][0] == batch[0][0]):
+                batch.append(heapq.heappop(self._heap))
+            return batch
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                self._write(batch)
+        finally:
+            connection.close()
+            with self._cond:
+                self._thread = None
+            self._reactor.callFromThread(self._stopped.callback, None)
+
+    def _write(self, batch):
+        """
+        Run a batch of jobs in one transaction and resolve their futures
+        once it has committed.
+        """
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for _, _, future, fn, args in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, fn(*args), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            log.failure("Failed to commit {count} writes", count=len(batch))
+            for future, _, exc in outcomes:
+                future.set_exception(exc or e)
+            # The transaction may have failed before all of the jobs ran.
+            for _, _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+write_queue = WriteQueue()